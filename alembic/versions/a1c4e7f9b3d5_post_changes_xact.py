@@ -0,0 +1,40 @@
+"""post_changes_xact
+
+Revision ID: a1c4e7f9b3d5
+Revises: f7b3d9e2a6c4
+Create Date: 2025-12-01 09:14:52.207419
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c4e7f9b3d5'
+down_revision: Union[str, None] = 'f7b3d9e2a6c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Los ids de post_changes se asignan al insertar y no al confirmar: cada fila
+# guarda la transacción que la escribió y el xmin de su snapshot (toda
+# transacción anterior ya había terminado y notificado). Las filas existentes
+# quedan con xact_id 0 y xact_horizon 1: no se repiten al reanudar desde ellas.
+XACT_ID = "(pg_current_xact_id()::text::bigint)"
+XACT_HORIZON = "(pg_snapshot_xmin(pg_current_snapshot())::text::bigint)"
+
+
+def upgrade() -> None:
+    op.add_column('post_changes', sa.Column('xact_id', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('post_changes', sa.Column('xact_horizon', sa.BigInteger(), server_default='1', nullable=False))
+    op.alter_column('post_changes', 'xact_id', server_default=sa.text(XACT_ID))
+    op.alter_column('post_changes', 'xact_horizon', server_default=sa.text(XACT_HORIZON))
+    op.create_index('ix_post_changes_xact_id', 'post_changes', ['xact_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_post_changes_xact_id', table_name='post_changes')
+    op.drop_column('post_changes', 'xact_horizon')
+    op.drop_column('post_changes', 'xact_id')
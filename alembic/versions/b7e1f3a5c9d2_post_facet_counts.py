@@ -0,0 +1,245 @@
+"""post_facet_counts
+
+Revision ID: b7e1f3a5c9d2
+Revises: 9c2d4e6f8a10
+Create Date: 2025-11-12 11:05:47.902131
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e1f3a5c9d2'
+down_revision: Union[str, None] = '9c2d4e6f8a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Bucket de visibilidad de un post; NULL si está eliminado (no cuenta)
+BUCKET_FUNCTION = """
+CREATE OR REPLACE FUNCTION post_facet_bucket(p_visible boolean, p_paid boolean, p_deleted boolean)
+RETURNS text LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE
+        WHEN coalesce(p_deleted, false) THEN NULL
+        WHEN NOT coalesce(p_visible, false) THEN 'hidden'
+        WHEN coalesce(p_paid, false) THEN 'paid'
+        ELSE 'public'
+    END
+$$;
+"""
+
+# Los triggers son por sentencia con tablas de transición: una inserción
+# masiva en posts_tags hace un único upsert agregado por tag.
+TRIGGER_FUNCTIONS = ["""
+CREATE OR REPLACE FUNCTION posts_tags_counts_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO tag_post_counts AS c (tag_id, public_count, paid_count, hidden_count)
+    SELECT l.tag_id,
+           count(*) FILTER (WHERE b.bucket = 'public'),
+           count(*) FILTER (WHERE b.bucket = 'paid'),
+           count(*) FILTER (WHERE b.bucket = 'hidden')
+    FROM new_links l
+    JOIN posts p ON p.id = l.post_id
+    CROSS JOIN LATERAL (SELECT post_facet_bucket(p.is_visible, p.is_paid, p.is_deleted) AS bucket) b
+    WHERE b.bucket IS NOT NULL
+    GROUP BY l.tag_id
+    ON CONFLICT (tag_id) DO UPDATE SET
+        public_count = c.public_count + EXCLUDED.public_count,
+        paid_count = c.paid_count + EXCLUDED.paid_count,
+        hidden_count = c.hidden_count + EXCLUDED.hidden_count;
+    RETURN NULL;
+END $$;
+""", """
+CREATE OR REPLACE FUNCTION posts_tags_counts_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE tag_post_counts c SET
+        public_count = c.public_count - d.public_count,
+        paid_count = c.paid_count - d.paid_count,
+        hidden_count = c.hidden_count - d.hidden_count
+    FROM (
+        SELECT l.tag_id,
+               count(*) FILTER (WHERE b.bucket = 'public') AS public_count,
+               count(*) FILTER (WHERE b.bucket = 'paid') AS paid_count,
+               count(*) FILTER (WHERE b.bucket = 'hidden') AS hidden_count
+        FROM old_links l
+        JOIN posts p ON p.id = l.post_id
+        CROSS JOIN LATERAL (SELECT post_facet_bucket(p.is_visible, p.is_paid, p.is_deleted) AS bucket) b
+        WHERE b.bucket IS NOT NULL
+        GROUP BY l.tag_id
+    ) d
+    WHERE c.tag_id = d.tag_id;
+    RETURN NULL;
+END $$;
+""", """
+CREATE OR REPLACE FUNCTION posts_counts_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO category_post_counts AS c (category, public_count, paid_count, hidden_count)
+    SELECT p.category,
+           count(*) FILTER (WHERE b.bucket = 'public'),
+           count(*) FILTER (WHERE b.bucket = 'paid'),
+           count(*) FILTER (WHERE b.bucket = 'hidden')
+    FROM new_posts p
+    CROSS JOIN LATERAL (SELECT post_facet_bucket(p.is_visible, p.is_paid, p.is_deleted) AS bucket) b
+    WHERE b.bucket IS NOT NULL AND p.category IS NOT NULL
+    GROUP BY p.category
+    ON CONFLICT (category) DO UPDATE SET
+        public_count = c.public_count + EXCLUDED.public_count,
+        paid_count = c.paid_count + EXCLUDED.paid_count,
+        hidden_count = c.hidden_count + EXCLUDED.hidden_count;
+    RETURN NULL;
+END $$;
+""", """
+CREATE OR REPLACE FUNCTION posts_counts_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE category_post_counts c SET
+        public_count = c.public_count - d.public_count,
+        paid_count = c.paid_count - d.paid_count,
+        hidden_count = c.hidden_count - d.hidden_count
+    FROM (
+        SELECT p.category,
+               count(*) FILTER (WHERE b.bucket = 'public') AS public_count,
+               count(*) FILTER (WHERE b.bucket = 'paid') AS paid_count,
+               count(*) FILTER (WHERE b.bucket = 'hidden') AS hidden_count
+        FROM old_posts p
+        CROSS JOIN LATERAL (SELECT post_facet_bucket(p.is_visible, p.is_paid, p.is_deleted) AS bucket) b
+        WHERE b.bucket IS NOT NULL AND p.category IS NOT NULL
+        GROUP BY p.category
+    ) d
+    WHERE c.category = d.category;
+    RETURN NULL;
+END $$;
+""", """
+-- Soft delete, restore, cambios de visibilidad/pago y de categoría
+CREATE OR REPLACE FUNCTION posts_counts_update() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    WITH changes AS (
+        SELECT o.category AS old_category, n.category AS new_category,
+               post_facet_bucket(o.is_visible, o.is_paid, o.is_deleted) AS old_bucket,
+               post_facet_bucket(n.is_visible, n.is_paid, n.is_deleted) AS new_bucket
+        FROM old_posts o
+        JOIN new_posts n ON n.id = o.id
+    ), deltas AS (
+        SELECT old_category AS category, old_bucket AS bucket, -1 AS delta FROM changes
+        WHERE (old_category, old_bucket) IS DISTINCT FROM (new_category, new_bucket)
+        UNION ALL
+        SELECT new_category, new_bucket, 1 FROM changes
+        WHERE (old_category, old_bucket) IS DISTINCT FROM (new_category, new_bucket)
+    )
+    INSERT INTO category_post_counts AS c (category, public_count, paid_count, hidden_count)
+    SELECT d.category,
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'public'), 0),
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'paid'), 0),
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'hidden'), 0)
+    FROM deltas d
+    WHERE d.category IS NOT NULL AND d.bucket IS NOT NULL
+    GROUP BY d.category
+    ON CONFLICT (category) DO UPDATE SET
+        public_count = c.public_count + EXCLUDED.public_count,
+        paid_count = c.paid_count + EXCLUDED.paid_count,
+        hidden_count = c.hidden_count + EXCLUDED.hidden_count;
+
+    WITH changes AS (
+        SELECT n.id,
+               post_facet_bucket(o.is_visible, o.is_paid, o.is_deleted) AS old_bucket,
+               post_facet_bucket(n.is_visible, n.is_paid, n.is_deleted) AS new_bucket
+        FROM old_posts o
+        JOIN new_posts n ON n.id = o.id
+    ), deltas AS (
+        SELECT id, old_bucket AS bucket, -1 AS delta FROM changes
+        WHERE old_bucket IS DISTINCT FROM new_bucket
+        UNION ALL
+        SELECT id, new_bucket, 1 FROM changes
+        WHERE old_bucket IS DISTINCT FROM new_bucket
+    )
+    INSERT INTO tag_post_counts AS c (tag_id, public_count, paid_count, hidden_count)
+    SELECT l.tag_id,
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'public'), 0),
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'paid'), 0),
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'hidden'), 0)
+    FROM deltas d
+    JOIN posts_tags l ON l.post_id = d.id
+    WHERE d.bucket IS NOT NULL
+    GROUP BY l.tag_id
+    ON CONFLICT (tag_id) DO UPDATE SET
+        public_count = c.public_count + EXCLUDED.public_count,
+        paid_count = c.paid_count + EXCLUDED.paid_count,
+        hidden_count = c.hidden_count + EXCLUDED.hidden_count;
+
+    RETURN NULL;
+END $$;
+"""]
+
+TRIGGERS = [
+    "CREATE TRIGGER posts_tags_counts_insert AFTER INSERT ON posts_tags REFERENCING NEW TABLE AS new_links FOR EACH STATEMENT EXECUTE FUNCTION posts_tags_counts_insert()",
+    "CREATE TRIGGER posts_tags_counts_delete AFTER DELETE ON posts_tags REFERENCING OLD TABLE AS old_links FOR EACH STATEMENT EXECUTE FUNCTION posts_tags_counts_delete()",
+    "CREATE TRIGGER posts_counts_insert AFTER INSERT ON posts REFERENCING NEW TABLE AS new_posts FOR EACH STATEMENT EXECUTE FUNCTION posts_counts_insert()",
+    "CREATE TRIGGER posts_counts_delete AFTER DELETE ON posts REFERENCING OLD TABLE AS old_posts FOR EACH STATEMENT EXECUTE FUNCTION posts_counts_delete()",
+    "CREATE TRIGGER posts_counts_update AFTER UPDATE ON posts REFERENCING OLD TABLE AS old_posts NEW TABLE AS new_posts FOR EACH STATEMENT EXECUTE FUNCTION posts_counts_update()",
+]
+
+BACKFILL = ["""
+INSERT INTO tag_post_counts (tag_id, public_count, paid_count, hidden_count)
+SELECT l.tag_id,
+       count(*) FILTER (WHERE b.bucket = 'public'),
+       count(*) FILTER (WHERE b.bucket = 'paid'),
+       count(*) FILTER (WHERE b.bucket = 'hidden')
+FROM posts_tags l
+JOIN posts p ON p.id = l.post_id
+CROSS JOIN LATERAL (SELECT post_facet_bucket(p.is_visible, p.is_paid, p.is_deleted) AS bucket) b
+WHERE b.bucket IS NOT NULL
+GROUP BY l.tag_id
+""", """
+INSERT INTO category_post_counts (category, public_count, paid_count, hidden_count)
+SELECT p.category,
+       count(*) FILTER (WHERE b.bucket = 'public'),
+       count(*) FILTER (WHERE b.bucket = 'paid'),
+       count(*) FILTER (WHERE b.bucket = 'hidden')
+FROM posts p
+CROSS JOIN LATERAL (SELECT post_facet_bucket(p.is_visible, p.is_paid, p.is_deleted) AS bucket) b
+WHERE b.bucket IS NOT NULL AND p.category IS NOT NULL
+GROUP BY p.category
+"""]
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('tag_post_counts',
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.Column('public_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('paid_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('hidden_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('tag_id')
+    )
+    op.create_table('category_post_counts',
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('public_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('paid_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('hidden_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.PrimaryKeyConstraint('category')
+    )
+    # ### end Alembic commands ###
+    op.execute(BUCKET_FUNCTION)
+    for statement in TRIGGER_FUNCTIONS + BACKFILL + TRIGGERS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS posts_counts_update ON posts")
+    op.execute("DROP TRIGGER IF EXISTS posts_counts_delete ON posts")
+    op.execute("DROP TRIGGER IF EXISTS posts_counts_insert ON posts")
+    op.execute("DROP TRIGGER IF EXISTS posts_tags_counts_delete ON posts_tags")
+    op.execute("DROP TRIGGER IF EXISTS posts_tags_counts_insert ON posts_tags")
+    op.execute("DROP FUNCTION IF EXISTS posts_counts_update()")
+    op.execute("DROP FUNCTION IF EXISTS posts_counts_delete()")
+    op.execute("DROP FUNCTION IF EXISTS posts_counts_insert()")
+    op.execute("DROP FUNCTION IF EXISTS posts_tags_counts_delete()")
+    op.execute("DROP FUNCTION IF EXISTS posts_tags_counts_insert()")
+    op.execute("DROP FUNCTION IF EXISTS post_facet_bucket(boolean, boolean, boolean)")
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('category_post_counts')
+    op.drop_table('tag_post_counts')
+    # ### end Alembic commands ###
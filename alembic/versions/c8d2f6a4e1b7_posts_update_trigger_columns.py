@@ -0,0 +1,207 @@
+"""posts_update_trigger_columns
+
+Revision ID: c8d2f6a4e1b7
+Revises: a1c4e7f9b3d5
+Create Date: 2025-12-02 16:27:08.931546
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8d2f6a4e1b7'
+down_revision: Union[str, None] = 'a1c4e7f9b3d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Los triggers de UPDATE de posts solo se disparan si la sentencia asigna
+# alguna de estas columnas: los volcados del contador de visitas (view_count y
+# updated_at) y el toque de updated_at al cambiar tags no los ejecutan. Postgres
+# no admite lista de columnas con tablas de transición, así que pasan a ser por
+# fila con OLD/NEW; las actualizaciones de posts son casi siempre de una fila.
+CONTENT_COLUMNS = "title, description, content, category, owner_id, is_visible, is_paid, is_deleted"
+FACET_COLUMNS = "category, is_visible, is_paid, is_deleted"
+
+TRIGGER_FUNCTIONS = ["""
+-- updated_at viaja con cualquier cambio del ORM; no es un campo cambiado
+CREATE OR REPLACE FUNCTION post_changes_notify_update() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    changed_fields text[] := ARRAY(
+        SELECT e.key FROM jsonb_each(to_jsonb(NEW)) e
+        WHERE e.key NOT IN ('updated_at', 'view_count') AND e.value IS DISTINCT FROM to_jsonb(OLD) -> e.key
+        ORDER BY e.key
+    );
+    change post_changes;
+BEGIN
+    IF cardinality(changed_fields) > 0 THEN
+        INSERT INTO post_changes (post_id, op, owner_id, is_visible, is_paid, is_deleted,
+                                  was_visible, was_paid, was_deleted, fields)
+        VALUES (NEW.id, 'update', NEW.owner_id, NEW.is_visible, NEW.is_paid, NEW.is_deleted,
+                OLD.is_visible, OLD.is_paid, OLD.is_deleted, changed_fields)
+        RETURNING * INTO change;
+        PERFORM pg_notify('post_changes', row_to_json(change)::text);
+    END IF;
+    RETURN NULL;
+END $$;
+""", """
+-- Soft delete, restore, cambios de visibilidad/pago y de categoría
+CREATE OR REPLACE FUNCTION posts_counts_update() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    old_bucket text := post_facet_bucket(OLD.is_visible, OLD.is_paid, OLD.is_deleted);
+    new_bucket text := post_facet_bucket(NEW.is_visible, NEW.is_paid, NEW.is_deleted);
+BEGIN
+    INSERT INTO category_post_counts AS c (category, public_count, paid_count, hidden_count)
+    SELECT d.category,
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'public'), 0),
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'paid'), 0),
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'hidden'), 0)
+    FROM (VALUES (OLD.category, old_bucket, -1), (NEW.category, new_bucket, 1)) AS d(category, bucket, delta)
+    WHERE d.category IS NOT NULL AND d.bucket IS NOT NULL
+    GROUP BY d.category
+    ON CONFLICT (category) DO UPDATE SET
+        public_count = c.public_count + EXCLUDED.public_count,
+        paid_count = c.paid_count + EXCLUDED.paid_count,
+        hidden_count = c.hidden_count + EXCLUDED.hidden_count;
+
+    IF old_bucket IS DISTINCT FROM new_bucket THEN
+        INSERT INTO tag_post_counts AS c (tag_id, public_count, paid_count, hidden_count)
+        SELECT l.tag_id,
+               coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'public'), 0),
+               coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'paid'), 0),
+               coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'hidden'), 0)
+        FROM (VALUES (old_bucket, -1), (new_bucket, 1)) AS d(bucket, delta)
+        CROSS JOIN posts_tags l
+        WHERE l.post_id = NEW.id AND d.bucket IS NOT NULL
+        GROUP BY l.tag_id
+        ON CONFLICT (tag_id) DO UPDATE SET
+            public_count = c.public_count + EXCLUDED.public_count,
+            paid_count = c.paid_count + EXCLUDED.paid_count,
+            hidden_count = c.hidden_count + EXCLUDED.hidden_count;
+    END IF;
+
+    RETURN NULL;
+END $$;
+"""]
+
+TRIGGERS = [
+    f"CREATE TRIGGER post_changes_notify_update AFTER UPDATE OF {CONTENT_COLUMNS} ON posts "
+    "FOR EACH ROW EXECUTE FUNCTION post_changes_notify_update()",
+    f"CREATE TRIGGER posts_counts_update AFTER UPDATE OF {FACET_COLUMNS} ON posts FOR EACH ROW "
+    "WHEN ((OLD.category, OLD.is_visible, OLD.is_paid, OLD.is_deleted) "
+    "IS DISTINCT FROM (NEW.category, NEW.is_visible, NEW.is_paid, NEW.is_deleted)) "
+    "EXECUTE FUNCTION posts_counts_update()",
+]
+
+# Versión anterior (por sentencia, con tablas de transición), para el downgrade
+PREVIOUS_TRIGGER_FUNCTIONS = ["""
+CREATE OR REPLACE FUNCTION post_changes_notify_update() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    notified integer;
+BEGIN
+    WITH changed AS (
+        SELECT n.id, n.owner_id, n.is_visible, n.is_paid, n.is_deleted,
+               o.is_visible AS was_visible, o.is_paid AS was_paid, o.is_deleted AS was_deleted,
+               ARRAY(
+                   SELECT e.key FROM jsonb_each(to_jsonb(n)) e
+                   WHERE e.key NOT IN ('updated_at', 'view_count') AND e.value IS DISTINCT FROM to_jsonb(o) -> e.key
+                   ORDER BY e.key
+               ) AS fields
+        FROM old_posts o
+        JOIN new_posts n ON n.id = o.id
+    ), c AS (
+        INSERT INTO post_changes (post_id, op, owner_id, is_visible, is_paid, is_deleted,
+                                  was_visible, was_paid, was_deleted, fields)
+        SELECT id, 'update', owner_id, is_visible, is_paid, is_deleted,
+               was_visible, was_paid, was_deleted, fields
+        FROM changed
+        WHERE cardinality(fields) > 0
+        ORDER BY id
+        RETURNING *
+    )
+    SELECT count(pg_notify('post_changes', row_to_json(c)::text)) INTO notified FROM c;
+    RETURN NULL;
+END $$;
+""", """
+CREATE OR REPLACE FUNCTION posts_counts_update() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    WITH changes AS (
+        SELECT o.category AS old_category, n.category AS new_category,
+               post_facet_bucket(o.is_visible, o.is_paid, o.is_deleted) AS old_bucket,
+               post_facet_bucket(n.is_visible, n.is_paid, n.is_deleted) AS new_bucket
+        FROM old_posts o
+        JOIN new_posts n ON n.id = o.id
+    ), deltas AS (
+        SELECT old_category AS category, old_bucket AS bucket, -1 AS delta FROM changes
+        WHERE (old_category, old_bucket) IS DISTINCT FROM (new_category, new_bucket)
+        UNION ALL
+        SELECT new_category, new_bucket, 1 FROM changes
+        WHERE (old_category, old_bucket) IS DISTINCT FROM (new_category, new_bucket)
+    )
+    INSERT INTO category_post_counts AS c (category, public_count, paid_count, hidden_count)
+    SELECT d.category,
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'public'), 0),
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'paid'), 0),
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'hidden'), 0)
+    FROM deltas d
+    WHERE d.category IS NOT NULL AND d.bucket IS NOT NULL
+    GROUP BY d.category
+    ON CONFLICT (category) DO UPDATE SET
+        public_count = c.public_count + EXCLUDED.public_count,
+        paid_count = c.paid_count + EXCLUDED.paid_count,
+        hidden_count = c.hidden_count + EXCLUDED.hidden_count;
+
+    WITH changes AS (
+        SELECT n.id,
+               post_facet_bucket(o.is_visible, o.is_paid, o.is_deleted) AS old_bucket,
+               post_facet_bucket(n.is_visible, n.is_paid, n.is_deleted) AS new_bucket
+        FROM old_posts o
+        JOIN new_posts n ON n.id = o.id
+    ), deltas AS (
+        SELECT id, old_bucket AS bucket, -1 AS delta FROM changes
+        WHERE old_bucket IS DISTINCT FROM new_bucket
+        UNION ALL
+        SELECT id, new_bucket, 1 FROM changes
+        WHERE old_bucket IS DISTINCT FROM new_bucket
+    )
+    INSERT INTO tag_post_counts AS c (tag_id, public_count, paid_count, hidden_count)
+    SELECT l.tag_id,
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'public'), 0),
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'paid'), 0),
+           coalesce(sum(d.delta) FILTER (WHERE d.bucket = 'hidden'), 0)
+    FROM deltas d
+    JOIN posts_tags l ON l.post_id = d.id
+    WHERE d.bucket IS NOT NULL
+    GROUP BY l.tag_id
+    ON CONFLICT (tag_id) DO UPDATE SET
+        public_count = c.public_count + EXCLUDED.public_count,
+        paid_count = c.paid_count + EXCLUDED.paid_count,
+        hidden_count = c.hidden_count + EXCLUDED.hidden_count;
+
+    RETURN NULL;
+END $$;
+"""]
+
+PREVIOUS_TRIGGERS = [
+    "CREATE TRIGGER post_changes_notify_update AFTER UPDATE ON posts REFERENCING OLD TABLE AS old_posts NEW TABLE AS new_posts FOR EACH STATEMENT EXECUTE FUNCTION post_changes_notify_update()",
+    "CREATE TRIGGER posts_counts_update AFTER UPDATE ON posts REFERENCING OLD TABLE AS old_posts NEW TABLE AS new_posts FOR EACH STATEMENT EXECUTE FUNCTION posts_counts_update()",
+]
+
+
+def _drop_triggers() -> None:
+    op.execute("DROP TRIGGER IF EXISTS posts_counts_update ON posts")
+    op.execute("DROP TRIGGER IF EXISTS post_changes_notify_update ON posts")
+
+
+def upgrade() -> None:
+    _drop_triggers()
+    for statement in TRIGGER_FUNCTIONS + TRIGGERS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    _drop_triggers()
+    for statement in PREVIOUS_TRIGGER_FUNCTIONS + PREVIOUS_TRIGGERS:
+        op.execute(statement)
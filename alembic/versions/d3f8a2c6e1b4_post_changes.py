@@ -0,0 +1,161 @@
+"""post_changes
+
+Revision ID: d3f8a2c6e1b4
+Revises: b7e1f3a5c9d2
+Create Date: 2025-11-24 10:42:13.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f8a2c6e1b4'
+down_revision: Union[str, None] = 'b7e1f3a5c9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Cada cambio se guarda en post_changes (para reanudar streams) y se notifica
+# en el canal post_changes con la fila completa; NOTIFY solo se entrega si la
+# transacción confirma. Triggers por sentencia, como los de post_facet_counts.
+TRIGGER_FUNCTIONS = ["""
+CREATE OR REPLACE FUNCTION post_changes_notify_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    notified integer;
+BEGIN
+    WITH c AS (
+        INSERT INTO post_changes (post_id, op, owner_id, is_visible, is_paid, is_deleted)
+        SELECT p.id, 'create', p.owner_id, p.is_visible, p.is_paid, p.is_deleted
+        FROM new_posts p
+        ORDER BY p.id
+        RETURNING *
+    )
+    SELECT count(pg_notify('post_changes', row_to_json(c)::text)) INTO notified FROM c;
+    RETURN NULL;
+END $$;
+""", """
+CREATE OR REPLACE FUNCTION post_changes_notify_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    notified integer;
+BEGIN
+    WITH c AS (
+        INSERT INTO post_changes (post_id, op, owner_id, was_visible, was_paid, was_deleted)
+        SELECT p.id, 'delete', p.owner_id, p.is_visible, p.is_paid, p.is_deleted
+        FROM old_posts p
+        ORDER BY p.id
+        RETURNING *
+    )
+    SELECT count(pg_notify('post_changes', row_to_json(c)::text)) INTO notified FROM c;
+    RETURN NULL;
+END $$;
+""", """
+-- Solo columnas que cambian de verdad; updated_at sola no es un cambio
+CREATE OR REPLACE FUNCTION post_changes_notify_update() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    notified integer;
+BEGIN
+    WITH changed AS (
+        SELECT n.id, n.owner_id, n.is_visible, n.is_paid, n.is_deleted,
+               o.is_visible AS was_visible, o.is_paid AS was_paid, o.is_deleted AS was_deleted,
+               ARRAY(
+                   SELECT e.key FROM jsonb_each(to_jsonb(n)) e
+                   WHERE e.key <> 'updated_at' AND e.value IS DISTINCT FROM to_jsonb(o) -> e.key
+                   ORDER BY e.key
+               ) AS fields
+        FROM old_posts o
+        JOIN new_posts n ON n.id = o.id
+    ), c AS (
+        INSERT INTO post_changes (post_id, op, owner_id, is_visible, is_paid, is_deleted,
+                                  was_visible, was_paid, was_deleted, fields)
+        SELECT id, 'update', owner_id, is_visible, is_paid, is_deleted,
+               was_visible, was_paid, was_deleted, fields
+        FROM changed
+        WHERE cardinality(fields) > 0
+        ORDER BY id
+        RETURNING *
+    )
+    SELECT count(pg_notify('post_changes', row_to_json(c)::text)) INTO notified FROM c;
+    RETURN NULL;
+END $$;
+""", """
+-- Altas y bajas en posts_tags: un cambio "tags" por post afectado. Los posts
+-- borrados en la misma sentencia ya no aparecen en el JOIN.
+CREATE OR REPLACE FUNCTION post_changes_record_links(post_ids integer[]) RETURNS void LANGUAGE sql AS $$
+    WITH c AS (
+        INSERT INTO post_changes (post_id, op, owner_id, is_visible, is_paid, is_deleted,
+                                  was_visible, was_paid, was_deleted, fields)
+        SELECT p.id, 'update', p.owner_id, p.is_visible, p.is_paid, p.is_deleted,
+               p.is_visible, p.is_paid, p.is_deleted, ARRAY['tags']
+        FROM posts p
+        WHERE p.id = ANY(post_ids)
+        ORDER BY p.id
+        RETURNING *
+    )
+    SELECT pg_notify('post_changes', row_to_json(c)::text) FROM c;
+$$;
+""", """
+CREATE OR REPLACE FUNCTION post_changes_notify_links_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM post_changes_record_links(ARRAY(SELECT DISTINCT post_id FROM new_links));
+    RETURN NULL;
+END $$;
+""", """
+CREATE OR REPLACE FUNCTION post_changes_notify_links_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM post_changes_record_links(ARRAY(SELECT DISTINCT post_id FROM old_links));
+    RETURN NULL;
+END $$;
+"""]
+
+TRIGGERS = [
+    "CREATE TRIGGER post_changes_notify_insert AFTER INSERT ON posts REFERENCING NEW TABLE AS new_posts FOR EACH STATEMENT EXECUTE FUNCTION post_changes_notify_insert()",
+    "CREATE TRIGGER post_changes_notify_delete AFTER DELETE ON posts REFERENCING OLD TABLE AS old_posts FOR EACH STATEMENT EXECUTE FUNCTION post_changes_notify_delete()",
+    "CREATE TRIGGER post_changes_notify_update AFTER UPDATE ON posts REFERENCING OLD TABLE AS old_posts NEW TABLE AS new_posts FOR EACH STATEMENT EXECUTE FUNCTION post_changes_notify_update()",
+    "CREATE TRIGGER post_changes_notify_links_insert AFTER INSERT ON posts_tags REFERENCING NEW TABLE AS new_links FOR EACH STATEMENT EXECUTE FUNCTION post_changes_notify_links_insert()",
+    "CREATE TRIGGER post_changes_notify_links_delete AFTER DELETE ON posts_tags REFERENCING OLD TABLE AS old_links FOR EACH STATEMENT EXECUTE FUNCTION post_changes_notify_links_delete()",
+]
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('post_changes',
+    sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('is_visible', sa.Boolean(), nullable=True),
+    sa.Column('is_paid', sa.Boolean(), nullable=True),
+    sa.Column('is_deleted', sa.Boolean(), nullable=True),
+    sa.Column('was_visible', sa.Boolean(), nullable=True),
+    sa.Column('was_paid', sa.Boolean(), nullable=True),
+    sa.Column('was_deleted', sa.Boolean(), nullable=True),
+    sa.Column('fields', postgresql.ARRAY(sa.String()), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_post_changes_created_at', 'post_changes', ['created_at'], unique=False)
+    # ### end Alembic commands ###
+    for statement in TRIGGER_FUNCTIONS + TRIGGERS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS post_changes_notify_links_delete ON posts_tags")
+    op.execute("DROP TRIGGER IF EXISTS post_changes_notify_links_insert ON posts_tags")
+    op.execute("DROP TRIGGER IF EXISTS post_changes_notify_update ON posts")
+    op.execute("DROP TRIGGER IF EXISTS post_changes_notify_delete ON posts")
+    op.execute("DROP TRIGGER IF EXISTS post_changes_notify_insert ON posts")
+    op.execute("DROP FUNCTION IF EXISTS post_changes_notify_links_delete()")
+    op.execute("DROP FUNCTION IF EXISTS post_changes_notify_links_insert()")
+    op.execute("DROP FUNCTION IF EXISTS post_changes_record_links(integer[])")
+    op.execute("DROP FUNCTION IF EXISTS post_changes_notify_update()")
+    op.execute("DROP FUNCTION IF EXISTS post_changes_notify_delete()")
+    op.execute("DROP FUNCTION IF EXISTS post_changes_notify_insert()")
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index('ix_post_changes_created_at', table_name='post_changes')
+    op.drop_table('post_changes')
+    # ### end Alembic commands ###
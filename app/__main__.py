@@ -0,0 +1,13 @@
+"""
+Servidor de producción: `python -m app`.
+
+Arranca uvicorn con uvloop y httptools (si están instalados), tantos workers
+como CPUs disponibles (o WEB_WORKERS / WEB_CONCURRENCY) y un pool de base de
+datos por worker calculado a partir del presupuesto de conexiones de Postgres.
+`kill -HUP <pid del proceso padre>` reinicia los workers de uno en uno.
+Para desarrollo sigue sirviendo `uvicorn app.main:myapp --reload`.
+"""
+from app.core.server import serve
+
+if __name__ == "__main__":
+    serve("app.main:myapp")
@@ -0,0 +1,290 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, TextIO
+
+from app.core.config import settings
+from app.core.instrumentation import RequestStats
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+access_log_records_total = registry.counter(
+    "access_log_records_total",
+    "Access log records by outcome (queued, sampled_out, dropped).",
+    ("outcome",),
+)
+
+# Centinela que despierta al hilo escritor para que termine
+_STOP = object()
+
+
+class _RotatingFile:
+    """Fichero de log que rota por tamaño y por antigüedad, conservando `backup_count` copias."""
+
+    def __init__(self, path: str, max_bytes: int, rotate_seconds: float, backup_count: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self._stream: Optional[TextIO] = None
+        self._size = 0
+        self._opened_at = 0.0
+
+    def write(self, lines: List[str]) -> None:
+        if self._stream is None or self._should_rotate():
+            self._rotate()
+        data = "".join(lines)
+        self._stream.write(data)
+        self._stream.flush()
+        self._size += len(data)
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def _should_rotate(self) -> bool:
+        if self.max_bytes and self._size >= self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.monotonic() - self._opened_at >= self.rotate_seconds
+
+    def _rotate(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            if self._size:
+                stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+                os.replace(self.path, f"{self.path}.{stamp}")
+                self._prune()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._stream = open(self.path, "a", encoding="utf-8")
+        self._size = self._stream.tell()
+        self._opened_at = time.monotonic()
+
+    def _prune(self) -> None:
+        directory = os.path.dirname(self.path) or "."
+        prefix = os.path.basename(self.path) + "."
+        backups = sorted(entry.path for entry in os.scandir(directory) if entry.name.startswith(prefix))
+        for path in backups[:max(0, len(backups) - self.backup_count)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class JsonLinesWriter:
+    """
+    Escritor de líneas JSON en segundo plano.
+
+    `put()` encola un registro sin bloquear (si la cola de `max_queue` está
+    llena lo descarta y lo cuenta en `dropped`). Un hilo aparte los convierte
+    en líneas con `formatter` y las escribe por lotes de hasta `batch_size`
+    registros o cada `flush_seconds`, en stdout o en un fichero con rotación.
+    """
+
+    def __init__(
+        self,
+        destination: str,
+        formatter: Callable[[Any], str],
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        flush_seconds: float = 1.0,
+        max_bytes: int = 100 * 1024 * 1024,
+        rotate_seconds: float = 86400.0,
+        backup_count: int = 7,
+        name: str = "jsonl-writer",
+    ):
+        self.destination = destination
+        self.formatter = formatter
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.name = name
+        self.dropped = 0
+        self.written = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        # Si la cola está llena se espera a que el escritor haga sitio
+        try:
+            self._queue.put(_STOP, timeout=5)
+        except queue.Full:
+            logger.warning("%s did not drain its queue; %d records lost", self.name, self._queue.qsize())
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def put(self, item) -> bool:
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _run(self) -> None:
+        output = None if self.destination == "stdout" else _RotatingFile(
+            self.destination, self.max_bytes, self.rotate_seconds, self.backup_count
+        )
+        stopping = False
+        try:
+            while not stopping:
+                batch: List[str] = []
+                deadline = time.monotonic() + self.flush_seconds
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(self.formatter(item))
+                if batch:
+                    self._write(output, batch)
+        finally:
+            if output is not None:
+                output.close()
+
+    def _write(self, output: Optional[_RotatingFile], batch: List[str]) -> None:
+        try:
+            if output is None:
+                sys.stdout.write("".join(batch))
+                sys.stdout.flush()
+            else:
+                output.write(batch)
+            self.written += len(batch)
+        except OSError as e:
+            logger.warning("%s could not write %d records: %s", self.name, len(batch), e)
+
+
+class AccessLog:
+    """
+    Log de accesos estructurado (una línea JSON por petición) que no bloquea el
+    event loop.
+
+    `record()` solo decide si la petición se registra y encola una tupla con sus
+    datos; el formateo a JSON y la escritura los hace un `JsonLinesWriter`, por
+    lotes, hacia stdout o hacia un fichero con rotación. Los errores (estado
+    >= 400) y las peticiones lentas se registran siempre; las correctas, con
+    probabilidad `sample_rate`. La cola está acotada a `max_queue` registros:
+    si se llena, los nuevos se descartan y se cuentan en `dropped`.
+    """
+
+    def __init__(
+        self,
+        destination: str = "stdout",
+        sample_rate: float = 1.0,
+        slow_ms: float = 1000.0,
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        flush_seconds: float = 1.0,
+        max_bytes: int = 100 * 1024 * 1024,
+        rotate_seconds: float = 86400.0,
+        backup_count: int = 7,
+    ):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.writer = JsonLinesWriter(
+            destination,
+            _format,
+            max_queue=max_queue,
+            batch_size=batch_size,
+            flush_seconds=flush_seconds,
+            max_bytes=max_bytes,
+            rotate_seconds=rotate_seconds,
+            backup_count=backup_count,
+            name="access-log",
+        )
+
+    @property
+    def dropped(self) -> int:
+        return self.writer.dropped
+
+    def start(self) -> None:
+        self.writer.start()
+
+    def stop(self) -> None:
+        self.writer.stop()
+
+    def record(self, stats: RequestStats, status: int, client: Optional[str], response_bytes: int) -> None:
+        if not self.writer.running:
+            return
+        elapsed_ms = stats.elapsed_ms
+        if status >= 400:
+            reason = "error"
+        elif self.slow_ms and elapsed_ms >= self.slow_ms:
+            reason = "slow"
+        elif self.sample_rate >= 1 or random.random() < self.sample_rate:
+            reason = "sampled"
+        else:
+            access_log_records_total.inc(("sampled_out",))
+            return
+        queued = self.writer.put((
+            time.time(),
+            stats.method,
+            stats.path,
+            stats.route,
+            status,
+            elapsed_ms,
+            stats.db_count,
+            stats.db_ns,
+            stats.user_id,
+            client,
+            response_bytes,
+            reason,
+        ))
+        access_log_records_total.inc(("queued" if queued else "dropped",))
+
+
+def _format(item: tuple) -> str:
+    (timestamp, method, path, route, status, elapsed_ms, db_count, db_ns, user_id, client, response_bytes, reason) = item
+    return json.dumps({
+        "ts": datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="milliseconds"),
+        "method": method,
+        "path": path,
+        "route": route,
+        "status": status,
+        "duration_ms": round(elapsed_ms, 2),
+        "db_queries": db_count,
+        "db_ms": round(db_ns / 1e6, 2),
+        "user_id": user_id,
+        "client": client,
+        "bytes": response_bytes,
+        "reason": reason,
+    }, separators=(",", ":")) + "\n"
+
+
+access_log = AccessLog(
+    destination=settings.ACCESS_LOG_DESTINATION,
+    sample_rate=settings.ACCESS_LOG_SAMPLE_RATE,
+    slow_ms=settings.ACCESS_LOG_SLOW_MS,
+    max_queue=settings.ACCESS_LOG_MAX_QUEUE,
+    batch_size=settings.ACCESS_LOG_BATCH_SIZE,
+    flush_seconds=settings.ACCESS_LOG_FLUSH_SECONDS,
+    max_bytes=settings.ACCESS_LOG_MAX_BYTES,
+    rotate_seconds=settings.ACCESS_LOG_ROTATE_SECONDS,
+    backup_count=settings.ACCESS_LOG_BACKUP_COUNT,
+)
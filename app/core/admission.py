@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match, Router
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ROUTE_CLASSES = ("read", "list", "write", "auth", "stream")
+
+QUEUE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+admission_rejections_total = registry.counter(
+    "admission_rejections_total",
+    "Requests rejected with 503 by admission control, by route class and reason.",
+    ("route_class", "reason"),
+)
+admission_queue_wait = registry.histogram(
+    "admission_queue_wait_seconds",
+    "Time admitted requests spent waiting for a concurrency slot, by route class.",
+    ("route_class",),
+    buckets=QUEUE_WAIT_BUCKETS,
+)
+admission_in_flight = registry.gauge(
+    "admission_in_flight",
+    "Requests holding a concurrency slot, by route class.",
+    ("route_class",),
+)
+admission_queued = registry.gauge(
+    "admission_queued",
+    "Requests waiting for a concurrency slot, by route class.",
+    ("route_class",),
+)
+
+
+def admission_class(route_class: str) -> Callable:
+    """
+    Decorador para fijar la clase de admisión de una ruta en lugar de la que
+    se deduce de su método y su plantilla. Debe aplicarse debajo del decorador
+    de la ruta:
+
+        @router.get("/me")
+        @admission_class("read")
+        async def me(...): ...
+    """
+    if route_class not in ROUTE_CLASSES:
+        raise ValueError(f"Unknown admission class: {route_class}")
+
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__admission_class__ = route_class
+        return endpoint
+
+    return decorator
+
+
+def fit_to_pool(limits: Dict[str, int], capacity: Optional[int]) -> Dict[str, int]:
+    """
+    Ajusta los límites de las clases que usan la base de datos a `capacity`
+    (las conexiones del pool del worker, ver `pool_capacity`): si su suma la
+    supera, se reducen en proporción, con al menos 1 por clase. Así cada
+    petición admitida tiene una conexión libre en lugar de esperarla en el
+    pool. Sin `capacity` (NullPool) no se tocan.
+    """
+    total = sum(limits.values())
+    if capacity is None or total <= capacity:
+        return dict(limits)
+    fitted = {name: max(1, limit * capacity // total) for name, limit in limits.items()}
+    logger.warning(
+        "Admission limits %s add up to %d but the DB pool holds %d connections; using %s",
+        limits, total, capacity, fitted,
+    )
+    return fitted
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+class AdmissionGate:
+    """
+    Semáforo con cola acotada para una clase de rutas.
+
+    Como mucho `limit` peticiones a la vez; las siguientes esperan en orden de
+    llegada hasta `timeout` segundos. Si ya hay `max_queue` esperando, o se
+    agota la espera, `acquire()` lanza `Rejected` en lugar de dejar que la
+    petición se acumule frente al pool de conexiones.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_use = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            admission_in_flight.inc((self.name,))
+            admission_queue_wait.observe_ns((self.name,), 0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise Rejected("queue_full")
+
+        started = time.perf_counter_ns()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        admission_queued.inc((self.name,))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # El hueco llegó a la vez que el timeout o la cancelación: se cede
+                self._release_slot()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise Rejected("timeout")
+        finally:
+            admission_queued.dec((self.name,))
+        admission_queue_wait.observe_ns((self.name,), time.perf_counter_ns() - started)
+
+    def release(self) -> None:
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        # El hueco pasa directamente al primer waiter vivo; in_use no cambia
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_use -= 1
+        admission_in_flight.dec((self.name,))
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI de control de admisión (load shedding).
+
+    Cada ruta bajo `prefix` pertenece a una clase con su propio `AdmissionGate`:
+    `auth` (rutas de /auth), `write` (métodos distintos de GET/HEAD), `read`
+    (GET de un recurso concreto, plantilla terminada en parámetro) y `list`
+    (el resto de GET: listados, búsquedas, agregados). `admission_class`
+    permite fijarla por ruta; `stream` es para respuestas de larga duración
+    (SSE), que ocupan su hueco mientras siguen conectadas. Si la cola de la clase está llena o la espera
+    supera el plazo, se responde 503 con `Retry-After` sin tocar la base de datos.
+    Las rutas fuera de `prefix` (health, métricas, documentación) no se limitan.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        router: Router,
+        gates: Dict[str, AdmissionGate],
+        prefix: str = "",
+        retry_after: int = 1,
+    ):
+        self.app = app
+        self.router = router
+        self.gates = gates
+        self.prefix = prefix
+        self.retry_after = retry_after
+        self._route_classes: Dict[int, Optional[str]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        route = self._match(scope)
+        gate = self.gates.get(self._route_class(route)) if route is not None else None
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await gate.acquire()
+        except Rejected as e:
+            admission_rejections_total.inc((gate.name, e.reason))
+            # Para que las métricas y el log etiqueten el 503 con su ruta
+            scope["route"] = route
+            await self._reject(gate.name)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+    def _match(self, scope: Scope):
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route
+        return None
+
+    def _route_class(self, route) -> Optional[str]:
+        # Las rutas no son hashables; viven lo mismo que la aplicación
+        key = id(route)
+        if key not in self._route_classes:
+            self._route_classes[key] = self._classify(route)
+        return self._route_classes[key]
+
+    def _classify(self, route) -> Optional[str]:
+        path = getattr(route, "path", "")
+        if not path.startswith(self.prefix):
+            return None
+        explicit = getattr(getattr(route, "endpoint", None), "__admission_class__", None)
+        if explicit is not None:
+            return explicit
+        if path[len(self.prefix):].startswith("/auth/"):
+            return "auth"
+        if set(getattr(route, "methods", None) or ()) - {"GET", "HEAD"}:
+            return "write"
+        return "read" if path.endswith("}") else "list"
+
+    def _reject(self, route_class: str) -> JSONResponse:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "error": "Service overloaded",
+                "message": f"Too many concurrent '{route_class}' requests, retry later",
+                "retry_after": self.retry_after,
+            },
+            headers={"Retry-After": str(self.retry_after)},
+        )
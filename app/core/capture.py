@@ -0,0 +1,155 @@
+import json
+import random
+import time
+from typing import Any, Optional
+from urllib.parse import parse_qsl
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.access_log import JsonLinesWriter
+from app.core.config import settings
+from app.core.instrumentation import current_request_stats
+from app.core.metrics import registry
+
+# Claves que nunca se guardan en claro, ni en la query ni en el cuerpo
+SENSITIVE_KEYS = frozenset({
+    "password", "token", "access_token", "refresh_token", "secret",
+    "email", "username", "full_name", "phone_number", "address",
+})
+REDACTED = "[REDACTED]"
+
+capture_records_total = registry.counter(
+    "traffic_capture_records_total",
+    "Captured request traces by outcome (queued, dropped).",
+    ("outcome",),
+)
+
+
+def sanitize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: REDACTED if key.lower() in SENSITIVE_KEYS else sanitize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [sanitize(item) for item in value]
+    return value
+
+
+def _format(trace: dict) -> str:
+    return json.dumps(trace, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+
+
+class TrafficCapture:
+    """
+    Captura de tráfico real para reproducirlo con `benchmarks.replay`.
+
+    Guarda, para una fracción `sample_rate` de las peticiones, una traza JSONL
+    con el instante de llegada, método, ruta (plantilla y path real), query,
+    cuerpo JSON, rol del usuario, estado, duración y consultas SQL. Nunca se
+    guardan cabeceras (ni el token) y las claves de `SENSITIVE_KEYS` se
+    sustituyen por `[REDACTED]`. La escritura usa un `JsonLinesWriter`, fuera
+    del event loop.
+    """
+
+    def __init__(
+        self,
+        destination: str,
+        sample_rate: float = 1.0,
+        max_body_bytes: int = 16384,
+        max_bytes: int = 100 * 1024 * 1024,
+        backup_count: int = 7,
+    ):
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+        self.writer = JsonLinesWriter(
+            destination,
+            _format,
+            max_bytes=max_bytes,
+            backup_count=backup_count,
+            name="traffic-capture",
+        )
+
+    def start(self) -> None:
+        self.writer.start()
+
+    def stop(self) -> None:
+        self.writer.stop()
+
+    def should_capture(self) -> bool:
+        return self.writer.running and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def record(self, trace: dict) -> None:
+        queued = self.writer.put(trace)
+        capture_records_total.inc(("queued" if queued else "dropped",))
+
+
+class CaptureMiddleware:
+    """
+    Middleware ASGI que alimenta `TrafficCapture`. Debe ir dentro de
+    `InstrumentationMiddleware` para tomar del RequestStats la ruta, el rol y
+    las consultas SQL. Solo copia el cuerpo de las peticiones JSON de hasta
+    `max_body_bytes`; el resto se reproduce sin cuerpo.
+    """
+
+    def __init__(self, app: ASGIApp, capture: TrafficCapture):
+        self.app = app
+        self.capture = capture
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.capture.should_capture():
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.time()
+        started = time.perf_counter_ns()
+        is_json = Headers(scope=scope).get("content-type", "").startswith("application/json")
+        body = bytearray()
+        body_complete = False
+        status = 500
+
+        async def receive_wrapper() -> Message:
+            nonlocal body_complete
+            message = await receive()
+            if is_json and message["type"] == "http.request" and len(body) <= self.capture.max_body_bytes:
+                body.extend(message.get("body", b""))
+                body_complete = not message.get("more_body", False)
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            stats = current_request_stats.get()
+            self.capture.record({
+                "ts": round(arrived, 6),
+                "method": scope["method"],
+                "route": getattr(scope.get("route"), "path", None),
+                "path": scope["path"],
+                "query": sanitize(dict(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True))),
+                "body": self._body(body) if body_complete else None,
+                "role": stats.role if stats is not None else None,
+                "status": status,
+                "duration_ms": round((time.perf_counter_ns() - started) / 1e6, 2),
+                "db_queries": stats.db_count if stats is not None else None,
+            })
+
+    def _body(self, body: bytearray) -> Optional[Any]:
+        if not body or len(body) > self.capture.max_body_bytes:
+            return None
+        try:
+            return sanitize(json.loads(body))
+        except ValueError:
+            return None
+
+
+traffic_capture = TrafficCapture(
+    destination=settings.CAPTURE_DESTINATION,
+    sample_rate=settings.CAPTURE_SAMPLE_RATE,
+    max_body_bytes=settings.CAPTURE_MAX_BODY_BYTES,
+    max_bytes=settings.CAPTURE_MAX_BYTES,
+    backup_count=settings.CAPTURE_BACKUP_COUNT,
+)
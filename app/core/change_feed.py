@@ -0,0 +1,347 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models.post_change import PostChange
+from app.models.visibilitymixin import VisibilityMixin
+from app.schemas.user import Role
+
+logger = logging.getLogger(__name__)
+
+# Canal fijado por los triggers de la migración post_changes
+POST_CHANGES_CHANNEL = "post_changes"
+# IDs ya difundidos que se recuerdan para descartar duplicados tras reconectar
+RECENT_IDS = 4096
+_OVERFLOW = object()
+_CLOSED = object()
+
+change_feed_subscribers = registry.gauge(
+    "post_changes_subscribers",
+    "Clients connected to the post change stream in this worker.",
+)
+change_feed_received_total = registry.counter(
+    "post_changes_received_total",
+    "Post changes received from the post_changes channel.",
+)
+change_feed_overflows_total = registry.counter(
+    "post_changes_overflows_total",
+    "Stream clients disconnected because their queue filled up.",
+)
+change_feed_resumes_total = registry.counter(
+    "post_changes_resumes_total",
+    "Streams opened with a resume token, by result (replay or reset).",
+    ("result",),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class _Visibility:
+    owner_id: int
+    is_visible: Optional[bool]
+    is_paid: Optional[bool]
+    is_deleted: Optional[bool]
+
+
+@dataclass(frozen=True, slots=True)
+class Change:
+    """Un cambio de post tal como lo registran los triggers de post_changes."""
+    id: int
+    post_id: int
+    op: str
+    after: Optional[_Visibility]
+    before: Optional[_Visibility]
+    fields: Tuple[str, ...]
+    created_at: str
+
+    @classmethod
+    def from_fields(
+        cls, id, post_id, op, owner_id, is_visible, is_paid, is_deleted,
+        was_visible, was_paid, was_deleted, fields, created_at,
+        xact_id=None, xact_horizon=None,
+    ) -> "Change":
+        # xact_id/xact_horizon solo sirven para reanudar desde la tabla
+        return cls(
+            id=id,
+            post_id=post_id,
+            op=op,
+            after=None if op == "delete" else _Visibility(owner_id, is_visible, is_paid, is_deleted),
+            before=None if op == "create" else _Visibility(owner_id, was_visible, was_paid, was_deleted),
+            fields=tuple(fields or ()),
+            created_at=created_at,
+        )
+
+    @classmethod
+    def from_payload(cls, payload: str) -> "Change":
+        return cls.from_fields(**json.loads(payload))
+
+    @classmethod
+    def from_row(cls, row: PostChange) -> "Change":
+        values = {column.key: getattr(row, column.key) for column in PostChange.__table__.columns}
+        values["created_at"] = row.created_at.isoformat()
+        return cls.from_fields(**values)
+
+    def event_for(self, current_user_role: Role, user_id: Optional[int]) -> Optional[str]:
+        """
+        Lo que ve el usuario: `create` si el post entra en su vista, `update`
+        si ya estaba y sigue, `delete` si sale de ella y nada si nunca la vio.
+        """
+        visible = self.after is not None and VisibilityMixin.matches_visibility(self.after, current_user_role, user_id)
+        was_visible = self.before is not None and VisibilityMixin.matches_visibility(self.before, current_user_role, user_id)
+        if visible:
+            return "update" if was_visible else "create"
+        return "delete" if was_visible else None
+
+    def render(self, op: str) -> bytes:
+        data = {"op": op, "id": self.post_id, "at": self.created_at}
+        if op == "update":
+            data["fields"] = list(self.fields)
+        return _event("post", data, self.id)
+
+
+def _event(name: str, data: dict, event_id: Optional[int] = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class _Subscriber:
+    __slots__ = ("role", "user_id", "queue", "overflowed")
+
+    def __init__(self, current_user_role: Role, user_id: Optional[int], queue_size: int):
+        self.role = current_user_role
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+
+class PostChangeFeed:
+    """
+    Difusión de los cambios de posts a los clientes SSE de un worker.
+
+    Los triggers de la migración post_changes guardan cada cambio en la tabla
+    `post_changes` y lo notifican en el canal del mismo nombre, que se escucha
+    en la conexión compartida del bus de invalidación: un único listener por
+    worker para todos los clientes. Cada aviso se filtra por la visibilidad de
+    cada cliente y se encola ya serializado.
+
+    Contrapresión: la cola de cada cliente está acotada; si se llena (el
+    cliente no lee al ritmo de los cambios) se vacía, se le envía `overflow`
+    y se cierra el stream. El cliente reconecta con `Last-Event-ID` y recibe
+    lo pendiente desde la tabla; si su token ya no está en el histórico o hay
+    más de `replay_limit` cambios pendientes, recibe `reset` y debe recargar.
+
+    Los ids se asignan al insertar y no al confirmar, así que lo pendiente no
+    es solo lo posterior al token: `PostChange.replay` incluye también los
+    cambios de transacciones que seguían abiertas cuando se escribió. Al
+    reanudar pueden repetirse eventos ya entregados, pero no perderse.
+    """
+
+    def __init__(
+        self,
+        queue_size: int,
+        heartbeat_seconds: float,
+        max_stream_seconds: float,
+        retry_ms: int,
+        replay_limit: int,
+        retention_seconds: float,
+        prune_seconds: float,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_stream_seconds = max_stream_seconds
+        self.retry_ms = retry_ms
+        self.replay_limit = replay_limit
+        self.retention_seconds = retention_seconds
+        self.prune_seconds = prune_seconds
+        self._subscribers: Set[_Subscriber] = set()
+        self._recent: OrderedDict[int, None] = OrderedDict()
+        self._last_id = 0
+        self._session_factory: Optional[Callable] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, session_factory: Callable) -> None:
+        """Debe llamarse después de empezar a escuchar el canal, para no perder cambios."""
+        if not self.enabled or self._task is not None:
+            return
+        self._session_factory = session_factory
+        async with session_factory() as db:
+            _, newest = await PostChange.bounds(db)
+        self._last_id = max(self._last_id, newest or 0)
+        self._task = asyncio.create_task(self._prune_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscriber in list(self._subscribers):
+            self._close(subscriber, _CLOSED)
+
+    # Entrada: canal post_changes
+
+    def publish(self, payload: str) -> None:
+        try:
+            change = Change.from_payload(payload)
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed post change payload: %.200s", payload)
+            return
+        self._fan_out(change)
+
+    async def resync(self) -> None:
+        """Tras reconectar el listener, difunde desde la tabla lo notificado durante el corte."""
+        if self._session_factory is None:
+            return
+        async with self._session_factory() as db:
+            rows = await PostChange.replay(db, self._last_id, self.replay_limit + 1, self.retention_seconds)
+            if rows is None:
+                # Sin cambios recibidos aún, o demasiado antiguos: lo posterior
+                rows = await PostChange.since(db, self._last_id, self.replay_limit + 1)
+        if len(rows) > self.replay_limit:
+            # Demasiado para encolar: que cada cliente se reanude por su cuenta
+            for subscriber in list(self._subscribers):
+                self._overflow(subscriber)
+            self._last_id = max(self._last_id, rows[-1].id)
+            return
+        for row in rows:
+            self._fan_out(Change.from_row(row))
+
+    def _fan_out(self, change: Change) -> None:
+        if change.id in self._recent:
+            return
+        self._recent[change.id] = None
+        if len(self._recent) > RECENT_IDS:
+            self._recent.popitem(last=False)
+        self._last_id = max(self._last_id, change.id)
+        change_feed_received_total.inc()
+
+        rendered = {}
+        for subscriber in self._subscribers:
+            if subscriber.overflowed:
+                continue
+            op = change.event_for(subscriber.role, subscriber.user_id)
+            if op is None:
+                continue
+            if op not in rendered:
+                rendered[op] = change.render(op)
+            try:
+                subscriber.queue.put_nowait((change.id, rendered[op]))
+            except asyncio.QueueFull:
+                self._overflow(subscriber)
+
+    def _overflow(self, subscriber: _Subscriber) -> None:
+        if not subscriber.overflowed:
+            subscriber.overflowed = True
+            change_feed_overflows_total.inc()
+            self._close(subscriber, _OVERFLOW)
+
+    @staticmethod
+    def _close(subscriber: _Subscriber, reason: object) -> None:
+        # Lo encolado se descarta: el cliente lo recupera al reanudar
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(reason)
+
+    # Salida: un stream por cliente
+
+    async def stream(
+        self,
+        current_user_role: Role,
+        user_id: Optional[int],
+        last_event_id: Optional[int] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Cuerpo SSE de un cliente: `ready` (o lo pendiente desde
+        `last_event_id`), los cambios que puede ver, comentarios de keep-alive
+        y, como mucho tras `max_stream_seconds`, fin del stream para que el
+        cliente reconecte (y se reparta de nuevo entre los workers).
+        """
+        subscriber = _Subscriber(current_user_role, user_id, self.queue_size)
+        # Suscrito antes de leer la tabla: lo que llegue mientras tanto queda en la cola
+        self._subscribers.add(subscriber)
+        change_feed_subscribers.inc()
+        try:
+            yield f"retry: {self.retry_ms}\n\n".encode()
+            replayed: Set[int] = set()
+            for chunk in await self._resume(subscriber, last_event_id, replayed):
+                yield chunk
+
+            deadline = time.monotonic() + self.max_stream_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), min(self.heartbeat_seconds, remaining))
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if item is _CLOSED:
+                    return
+                if item is _OVERFLOW:
+                    yield _event("overflow", {})
+                    return
+                change_id, chunk = item
+                if change_id not in replayed:
+                    yield chunk
+        finally:
+            self._subscribers.discard(subscriber)
+            change_feed_subscribers.dec()
+
+    async def _resume(self, subscriber: _Subscriber, last_event_id: Optional[int], replayed: Set[int]) -> list[bytes]:
+        rows = []
+        async with self._session_factory() as db:
+            _, newest = await PostChange.bounds(db)
+            if last_event_id is not None:
+                rows = await PostChange.replay(db, last_event_id, self.replay_limit + 1, self.retention_seconds)
+        head = max(newest or 0, self._last_id)
+
+        if last_event_id is None:
+            return [_event("ready", {"last_event_id": head}, head)]
+        if rows is None or len(rows) > self.replay_limit:
+            change_feed_resumes_total.inc(("reset",))
+            return [_event("reset", {"last_event_id": head}, head)]
+
+        change_feed_resumes_total.inc(("replay",))
+        chunks = []
+        for row in rows:
+            change = Change.from_row(row)
+            replayed.add(change.id)
+            op = change.event_for(subscriber.role, subscriber.user_id)
+            if op is not None:
+                chunks.append(change.render(op))
+        return chunks
+
+    async def _prune_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.prune_seconds)
+            try:
+                async with self._session_factory() as db:
+                    deleted = await PostChange.prune(db, self.retention_seconds)
+                if deleted:
+                    logger.info("Pruned %d post changes older than %.0f s", deleted, self.retention_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Pruning post_changes failed")
+
+
+post_change_feed = PostChangeFeed(
+    queue_size=settings.SSE_CLIENT_QUEUE_SIZE,
+    heartbeat_seconds=settings.SSE_HEARTBEAT_SECONDS,
+    max_stream_seconds=settings.SSE_MAX_STREAM_SECONDS,
+    retry_ms=settings.SSE_RETRY_MS,
+    replay_limit=settings.SSE_REPLAY_LIMIT,
+    retention_seconds=settings.SSE_RETENTION_SECONDS,
+    prune_seconds=settings.SSE_PRUNE_SECONDS,
+    enabled=settings.SSE_ENABLED,
+)
@@ -0,0 +1,348 @@
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+
+# Tipos que ya vienen comprimidos o que no ganan nada al comprimirse
+EXCLUDED_MEDIA_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "application/zip",
+    "application/gzip",
+    "application/zstd",
+    "application/octet-stream",
+)
+
+
+def no_compression(endpoint: Callable) -> Callable:
+    """
+    Decorador para excluir una ruta de la compresión de respuestas.
+
+    Debe aplicarse debajo del decorador de la ruta:
+
+        @router.get("/stream")
+        @no_compression
+        async def stream(...): ...
+    """
+    endpoint.__no_compression__ = True
+    return endpoint
+
+
+class CompressionStats:
+    """Contadores de compresión por worker (bytes originales, bytes enviados, respuestas)."""
+
+    def __init__(self):
+        self.bytes_in: Dict[str, int] = defaultdict(int)
+        self.bytes_out: Dict[str, int] = defaultdict(int)
+        self.responses: Dict[str, int] = defaultdict(int)
+        self.skipped: Dict[str, int] = defaultdict(int)
+
+    def record(self, encoding: str, raw: int, sent: int) -> None:
+        self.bytes_in[encoding] += raw
+        self.bytes_out[encoding] += sent
+
+    def snapshot(self) -> dict:
+        encodings = {}
+        for encoding, count in self.responses.items():
+            raw = self.bytes_in[encoding]
+            sent = self.bytes_out[encoding]
+            encodings[encoding] = {
+                "responses": count,
+                "bytes_in": raw,
+                "bytes_out": sent,
+                "bytes_saved": raw - sent,
+                "ratio": round(sent / raw, 4) if raw else None,
+            }
+        return {
+            "encodings": encodings,
+            "bytes_saved": sum(e["bytes_saved"] for e in encodings.values()),
+            "skipped": dict(self.skipped),
+        }
+
+    def reset(self) -> None:
+        self.__init__()
+
+
+compression_stats = CompressionStats()
+
+
+class _GzipEncoder:
+    name = "gzip"
+    # Plantilla inicializada una vez; cada respuesta usa una copia (evita
+    # reservar y preparar de nuevo las tablas de deflate en cada respuesta).
+    _templates: Dict[int, "zlib._Compress"] = {}
+
+    def __init__(self, level: int):
+        template = self._templates.get(level)
+        if template is None:
+            template = self._templates[level] = zlib.compressobj(level, zlib.DEFLATED, 31)
+        self._compressor = template.copy()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+    def release(self) -> None:
+        pass
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality, mode=brotli.MODE_TEXT)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+    def release(self) -> None:
+        pass
+
+
+class _ZstdEncoder:
+    name = "zstd"
+    # Un ZstdCompressor no admite dos streams activos a la vez, así que los
+    # contextos se reutilizan a través de un pool por nivel.
+    _pools: Dict[int, List["zstandard.ZstdCompressor"]] = defaultdict(list)
+    _max_pooled = 32
+
+    def __init__(self, level: int):
+        pool = self._pools[level]
+        self._level = level
+        self._context = pool.pop() if pool else zstandard.ZstdCompressor(level=level)
+        self._compressor = self._context.compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+    def release(self) -> None:
+        pool = self._pools[self._level]
+        if self._context is not None and len(pool) < self._max_pooled:
+            pool.append(self._context)
+        self._context = None
+
+
+def available_encodings() -> List[str]:
+    """Codificaciones disponibles en orden de preferencia del servidor."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str, supported: List[str]) -> Optional[str]:
+    """
+    Elige la codificación a partir de la cabecera Accept-Encoding.
+
+    Gana el mayor valor `q`; a igualdad de `q` se respeta el orden de `supported`.
+    Devuelve None si el cliente no acepta ninguna codificación soportada.
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best: Optional[str] = None
+    best_q = 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI que comprime las respuestas según Accept-Encoding (zstd, br, gzip).
+
+    - Las respuestas por debajo de `minimum_size` se envían sin comprimir.
+    - Las respuestas en streaming se comprimen bloque a bloque (tras acumular como
+      mucho `minimum_size` bytes) y se vacían en cada envío, de modo que el cliente
+      recibe cada fragmento sin esperar al final.
+    - Las rutas marcadas con `no_compression` y los tipos de `EXCLUDED_MEDIA_TYPES`
+      no se comprimen.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+        stats: CompressionStats = compression_stats,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality, "zstd": zstd_level}
+        self.supported = available_encodings()
+        self.stats = stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.supported)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, scope, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+    def _make_encoder(self, encoding: str):
+        level = self.levels[encoding]
+        if encoding == "zstd":
+            return _ZstdEncoder(level)
+        if encoding == "br":
+            return _BrotliEncoder(level)
+        return _GzipEncoder(level)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, send: Send, encoding: str):
+        self.middleware = middleware
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.start_message: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+
+    def _skip_reason(self, headers: Headers) -> Optional[str]:
+        endpoint = self.scope.get("endpoint")
+        if endpoint is not None and getattr(endpoint, "__no_compression__", False):
+            return "opt_out"
+        if "content-encoding" in headers:
+            return "already_encoded"
+        status = self.start_message["status"]
+        if status < 200 or status in (204, 304):
+            return "no_body"
+        content_type = headers.get("content-type", "")
+        if content_type.startswith(EXCLUDED_MEDIA_TYPES):
+            return "media_type"
+        return None
+
+    def _start_compressed(self) -> None:
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "content-length" in headers:
+            del headers["content-length"]
+        self.encoder = self.middleware._make_encoder(self.encoding)
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            reason = self._skip_reason(headers)
+            if reason is not None:
+                self.passthrough = True
+                self.middleware.stats.skipped[reason] += 1
+                await self._send(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            # Se acumulan bloques hasta alcanzar `minimum_size` o el final de la
+            # respuesta; las respuestas pequeñas nunca llegan a comprimirse.
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if more_body and self.pending_size < self.middleware.minimum_size:
+                return
+            body = b"".join(self.pending)
+            self.pending = []
+
+            if not more_body:
+                await self._send_complete(body)
+                return
+
+            # Streaming: se comprime cada bloque y se vacía inmediatamente
+            self._start_compressed()
+            await self._send(self.start_message)
+
+        try:
+            chunk = self.encoder.compress(body) if more_body else self.encoder.finish(body)
+        except BaseException:
+            self.encoder.release()
+            raise
+        self.raw_bytes += len(body)
+        self.sent_bytes += len(chunk)
+        if not more_body:
+            self.encoder.release()
+            self._record(self.raw_bytes, self.sent_bytes)
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_complete(self, body: bytes) -> None:
+        """Envía una respuesta cuyo cuerpo completo ya está en memoria."""
+        if len(body) < self.middleware.minimum_size:
+            self.middleware.stats.skipped["below_minimum"] += 1
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Length"] = str(len(body))
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        self._start_compressed()
+        try:
+            compressed = self.encoder.finish(body)
+        finally:
+            self.encoder.release()
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Length"] = str(len(compressed))
+        self._record(len(body), len(compressed))
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    def _record(self, raw: int, sent: int) -> None:
+        stats = self.middleware.stats
+        stats.responses[self.encoding] += 1
+        stats.record(self.encoding, raw, sent)
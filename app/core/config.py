@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, Optional
 from fastapi.security import OAuth2PasswordBearer
 import os
 
@@ -23,6 +23,180 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     DEBUG: bool = True
 
+    # Tag catalog (per-worker in-memory cache)
+    TAG_CATALOG_ENABLED: bool = True
+    TAG_CATALOG_MAX_ENTRIES: int = 10000
+    TAG_CATALOG_REFRESH_SECONDS: float = 30.0
+    TAG_CATALOG_OVERLAP_SECONDS: float = 5.0
+
+    # Cross-worker cache invalidation over LISTEN/NOTIFY. The listener needs a
+    # direct connection (LISTEN does not work through PgBouncer transaction
+    # mode); INVALIDATION_DATABASE_URL unset = DATABASE_URL
+    INVALIDATION_ENABLED: bool = True
+    INVALIDATION_CHANNEL: str = "cache_invalidation"
+    INVALIDATION_DATABASE_URL: Optional[str] = None
+    INVALIDATION_BATCH_MS: float = 50.0
+    INVALIDATION_RECONNECT_SECONDS: float = 2.0
+    INVALIDATION_HEALTHCHECK_SECONDS: float = 30.0
+
+    # Post change stream (SSE at /posts/changes/stream), fed by the post_changes
+    # triggers through the invalidation listener. Slow clients whose queue fills
+    # up are disconnected and resume with Last-Event-ID from the post_changes
+    # table, which keeps SSE_RETENTION_SECONDS of history
+    SSE_ENABLED: bool = True
+    SSE_CLIENT_QUEUE_SIZE: int = 256
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    SSE_MAX_STREAM_SECONDS: float = 600.0
+    SSE_RETRY_MS: int = 2000
+    SSE_REPLAY_LIMIT: int = 1000
+    SSE_RETENTION_SECONDS: float = 3600.0
+    SSE_PRUNE_SECONDS: float = 300.0
+
+    # Incremental sync (/posts/sync, /tags/sync) by (updated_at, id) watermark.
+    # The returned watermark stays SYNC_OVERLAP_SECONDS behind now() so rows
+    # from transactions still in flight are not skipped
+    SYNC_PAGE_SIZE: int = 500
+    SYNC_MAX_PAGE_SIZE: int = 1000
+    SYNC_OVERLAP_SECONDS: float = 5.0
+
+    # Post view counts: reads only bump a per-worker in-memory buffer that is
+    # flushed every VIEW_COUNTER_FLUSH_SECONDS in batched UPDATEs; at most
+    # VIEW_COUNTER_MAX_ENTRIES distinct posts are buffered
+    VIEW_COUNTER_ENABLED: bool = True
+    VIEW_COUNTER_FLUSH_SECONDS: float = 5.0
+    VIEW_COUNTER_MAX_ENTRIES: int = 50000
+    VIEW_COUNTER_BATCH_SIZE: int = 1000
+
+    # Response compression (zstd/br need the optional "compression" extra)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # Metrics (/metrics, Prometheus text format)
+    METRICS_ENABLED: bool = True
+    # Shared directory for multi-worker aggregation; unset = single process
+    METRICS_MULTIPROC_DIR: Optional[str] = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    METRICS_FLUSH_SECONDS: float = 5.0
+
+    # Per-request instrumentation (Server-Timing header and request log line)
+    LOG_LEVEL: str = "INFO"
+    INSTRUMENTATION_ENABLED: bool = True
+    # Warn when the same statement runs this many times in one request (opt-in;
+    # not tied to DEBUG, which defaults to on)
+    N_PLUS_ONE_DETECTION: bool = False
+    N_PLUS_ONE_THRESHOLD: int = 5
+
+    # Slow-query log (0 disables); a sample of slow SELECTs gets an EXPLAIN
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.1
+    SLOW_QUERY_LOG_SIZE: int = 200
+    SLOW_QUERY_EXPLAIN_TIMEOUT_SECONDS: float = 5.0
+
+    # Sampling profiler (opt-in): a fraction of requests and/or every request
+    # still running after the latency threshold; 0 disables each trigger
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_LATENCY_THRESHOLD_MS: float = 500.0
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_OUTPUT_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 200
+
+    # Event-loop lag sampler and blocked-loop watchdog
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: float = 100.0
+    LOOP_STALL_THRESHOLD_MS: float = 100.0
+
+    # Structured access log (JSON lines written off the event loop).
+    # Destination is "stdout" or a file path; errors and slow requests are
+    # always logged, successful ones with ACCESS_LOG_SAMPLE_RATE
+    ACCESS_LOG_ENABLED: bool = True
+    ACCESS_LOG_DESTINATION: str = "stdout"
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_SLOW_MS: float = 1000.0
+    ACCESS_LOG_MAX_QUEUE: int = 10000
+    ACCESS_LOG_BATCH_SIZE: int = 256
+    ACCESS_LOG_FLUSH_SECONDS: float = 1.0
+    ACCESS_LOG_MAX_BYTES: int = 100 * 1024 * 1024
+    ACCESS_LOG_ROTATE_SECONDS: float = 86400.0
+    ACCESS_LOG_BACKUP_COUNT: int = 7
+
+    # Traffic capture (opt-in): sanitized request traces in JSONL for
+    # benchmarks/replay.py; headers are never stored
+    CAPTURE_ENABLED: bool = False
+    CAPTURE_DESTINATION: str = "captures/traffic.jsonl"
+    CAPTURE_SAMPLE_RATE: float = 1.0
+    CAPTURE_MAX_BODY_BYTES: int = 16384
+    CAPTURE_MAX_BYTES: int = 100 * 1024 * 1024
+    CAPTURE_BACKUP_COUNT: int = 7
+
+    # Startup warm-up (mappers, schemas, pre-opened pool connections with the
+    # hot statements prepared) and a cold-start budget checked at startup
+    WARMUP_ENABLED: bool = True
+    WARMUP_POOL_CONNECTIONS: int = 5
+    WARMUP_TIMEOUT_SECONDS: float = 10.0
+    STARTUP_BUDGET_MS: float = 3000.0
+
+    # Admission control: per route-class concurrency limits with bounded wait
+    # queues; requests that cannot be admitted in time get 503 + Retry-After.
+    # The read/list/write/auth limits together stay below the DB pool
+    # (DB_POOL_SIZE + DB_MAX_OVERFLOW, 30 by default), leaving room for the
+    # background tasks; at startup they are scaled down to fit a smaller pool
+    # (DB_POOLER_POOL_SIZE in transaction pooler mode)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_READ_CONCURRENCY: int = 12
+    ADMISSION_READ_QUEUE: int = 200
+    ADMISSION_LIST_CONCURRENCY: int = 6
+    ADMISSION_LIST_QUEUE: int = 50
+    ADMISSION_WRITE_CONCURRENCY: int = 6
+    ADMISSION_WRITE_QUEUE: int = 100
+    ADMISSION_AUTH_CONCURRENCY: int = 4
+    ADMISSION_AUTH_QUEUE: int = 50
+    # Long-lived streams (SSE) hold their slot while connected and never queue
+    ADMISSION_STREAM_CONCURRENCY: int = 1000
+    ADMISSION_QUEUE_TIMEOUT_MS: float = 2000.0
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # Statement timeouts: connection-wide default plus per-route overrides keyed
+    # by route template (JSON in the environment); 0 disables the default.
+    # Cancelled statements are answered with 504
+    STATEMENT_TIMEOUT_MS: int = 10000
+    STATEMENT_TIMEOUTS_MS: Dict[str, int] = {
+        "/api/v1/posts/search/": 2000,
+        "/api/v1/tags/search/": 2000,
+        "/api/v1/posts/": 3000,
+        "/api/v1/posts/facets": 3000,
+    }
+
+    # Production server (python -m app). WEB_WORKERS=0 sizes from the CPUs
+    # available to the process; the per-worker pool is derived from
+    # DB_CONNECTION_BUDGET (0 = Postgres max_connections minus superuser and
+    # DB_RESERVED_CONNECTIONS) so workers * (pool_size + max_overflow) fits it.
+    # DB_POOL_SIZE/DB_MAX_OVERFLOW are the per-worker upper bounds
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8000
+    WEB_WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "0"))
+    WEB_MAX_WORKERS: int = 16
+    WEB_GRACEFUL_TIMEOUT_SECONDS: int = 30
+    WEB_READY_TIMEOUT_SECONDS: float = 60.0
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_CONNECTION_BUDGET: int = 0
+    DB_RESERVED_CONNECTIONS: int = 10
+    # Statement caches: SQLAlchemy compiled SQL per engine and asyncpg prepared
+    # statements per connection; the hot query templates (by id, email and
+    # title lookups, role-specific lists) times load types need more than the
+    # default 100 prepared statements
+    DB_QUERY_CACHE_SIZE: int = 1200
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
+    # Pooler in front of Postgres: "session" (direct or PgBouncer session mode)
+    # or "transaction" (PgBouncer transaction mode: no prepared statement
+    # caches, unique statement names, per-transaction SET LOCAL instead of
+    # connection settings). DB_POOLER_POOL_SIZE=0 uses NullPool on the app side
+    DB_POOLER_MODE: str = "session"
+    DB_POOLER_POOL_SIZE: int = 0
+
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 # Instancia global de configuración
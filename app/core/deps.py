@@ -1,16 +1,17 @@
-from typing import Annotated, List
-from fastapi import Depends, HTTPException, status
+from typing import Annotated, List, Literal
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from app.core.config import settings
+from app.core.instrumentation import track_auth
 from app.db.services import get_db
 from app.models.user import User as UserModel
 from app.schemas.user import Role, TokenData
 
 oauth2_scheme = settings.OAUTH2_SCHEME
 
+@track_auth
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
@@ -37,12 +38,11 @@ async def get_current_user(
         if email is None or role is None:
             raise credentials_exception
             
-    except JWTError:
+    except jwt.InvalidTokenError:
         raise credentials_exception
     
     # Get user from database
-    result = await db.execute(select(UserModel).filter(UserModel.email == email))
-    user = result.scalars().first()
+    user = await UserModel.get_by_email(db, email)
     
     if user is None:
         raise credentials_exception
@@ -85,4 +85,17 @@ async def get_current_user_with_role(
 currentUserDep = Annotated[UserModel, Depends(get_current_user)]
 sessionDep = Annotated[AsyncSession, Depends(get_db)]
 adminDep = Annotated[UserModel, Depends(require_role([Role.ADMIN]))]
-premiumDep = Annotated[UserModel, Depends(require_role([Role.PAID_USER, Role.ADMIN]))]
\ No newline at end of file
+premiumDep = Annotated[UserModel, Depends(require_role([Role.PAID_USER, Role.ADMIN]))]
+
+
+def get_response_format(
+    response_format: Literal["nested", "normalized"] = Query(
+        default="nested",
+        alias="format",
+        description="`normalized`: posts con `owner_id`/`tag_ids` y autores y tags una sola vez en `included`."
+    ),
+) -> str:
+    return response_format
+
+
+responseFormatDep = Annotated[str, Depends(get_response_format)]
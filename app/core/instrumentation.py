@@ -0,0 +1,269 @@
+import functools
+import inspect
+import logging
+import re
+import sys
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import greenlet
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger("app.requests")
+
+# Colapsa listas de parámetros ($1, $2, ...) para comparar la forma de las sentencias
+_PARAM_LIST = re.compile(r"\$\d+(?:\s*,\s*\$\d+)*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass(slots=True)
+class RequestStats:
+    """Contadores de una petición HTTP, compartidos a través de `current_request_stats`."""
+    method: str
+    path: str
+    started_ns: int = field(default_factory=time.perf_counter_ns)
+    route: Optional[str] = None
+    status: Optional[int] = None
+    user_id: Optional[int] = None
+    role: Optional[str] = None
+    db_count: int = 0
+    db_ns: int = 0
+    auth_ns: int = 0
+    endpoint_done_ns: int = 0
+    serialize_ns: int = 0
+    # Solo se rellenan con la detección de N+1 activa
+    shapes: Optional[Counter] = None
+    reported_shapes: Optional[set] = None
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter_ns() - self.started_ns) / 1e6
+
+    def server_timing(self) -> str:
+        return ", ".join([
+            f"auth;dur={self.auth_ns / 1e6:.2f}",
+            f'db;dur={self.db_ns / 1e6:.2f};desc="{self.db_count} queries"',
+            f"serialize;dur={self.serialize_ns / 1e6:.2f}",
+            f"total;dur={self.elapsed_ms:.2f}",
+        ])
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+class InstrumentationMiddleware:
+    """
+    Middleware ASGI que crea el RequestStats de cada petición, añade la cabecera
+    `Server-Timing` (auth, db, serialize, total) y, al terminar, la registra en
+    `access_log` (AccessLog) o, sin él, en una línea del logger `app.requests`
+    con la ruta, el estado y los tiempos.
+    """
+
+    def __init__(self, app: ASGIApp, detect_n_plus_one: bool = False, access_log=None):
+        self.app = app
+        self.detect_n_plus_one = detect_n_plus_one
+        self.access_log = access_log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(method=scope["method"], path=scope["path"])
+        if self.detect_n_plus_one:
+            stats.shapes = Counter()
+            stats.reported_shapes = set()
+        token = current_request_stats.set(stats)
+        response_bytes = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_bytes
+            if message["type"] == "http.response.start":
+                stats.status = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            if stats.route is None:
+                stats.route = getattr(scope.get("route"), "path", None)
+            if self.access_log is not None:
+                client = scope.get("client")
+                self.access_log.record(stats, stats.status or 500, client[0] if client else None, response_bytes)
+                return
+            logger.info(
+                "%s %s route=%s status=%s total_ms=%.2f db_queries=%d db_ms=%.2f auth_ms=%.2f serialize_ms=%.2f",
+                stats.method,
+                stats.path,
+                stats.route or "-",
+                stats.status or 500,
+                stats.elapsed_ms,
+                stats.db_count,
+                stats.db_ns / 1e6,
+                stats.auth_ns / 1e6,
+                stats.serialize_ns / 1e6,
+            )
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    Ruta que mide la serialización de la respuesta: el tiempo entre que el
+    endpoint devuelve su resultado y que FastAPI termina de construir la respuesta
+    (validación con `response_model` y codificación).
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def instrumented_handler(request: Request) -> Response:
+            stats = current_request_stats.get()
+            if stats is not None:
+                stats.route = self.path
+            response = await handler(request)
+            if stats is not None and stats.endpoint_done_ns:
+                stats.serialize_ns += time.perf_counter_ns() - stats.endpoint_done_ns
+            return response
+
+        return instrumented_handler
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    if getattr(endpoint, "__instrumented__", False) or not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            stats = current_request_stats.get()
+            if stats is not None:
+                stats.endpoint_done_ns = time.perf_counter_ns()
+
+    timed.__instrumented__ = True
+    return timed
+
+
+def track_auth(dependency: Callable) -> Callable:
+    """
+    Decorador para la dependencia de autenticación: acumula su duración en
+    `auth` y guarda el ID y el rol del usuario autenticado en el RequestStats.
+    """
+
+    @functools.wraps(dependency)
+    async def tracked(*args, **kwargs):
+        started = time.perf_counter_ns()
+        user = None
+        try:
+            user = await dependency(*args, **kwargs)
+            return user
+        finally:
+            stats = current_request_stats.get()
+            if stats is not None:
+                stats.auth_ns += time.perf_counter_ns() - started
+                stats.user_id = getattr(user, "id", None)
+                stats.role = getattr(getattr(user, "role", None), "value", None)
+
+    return tracked
+
+
+def statement_shape(statement: str) -> str:
+    """Normaliza una sentencia SQL para agrupar las que solo difieren en parámetros."""
+    return _WHITESPACE.sub(" ", _PARAM_LIST.sub("$?", statement)).strip()
+
+
+def _app_location(limit: int = 3) -> str:
+    """
+    Frames de la aplicación (fuera de app/core) que originaron la sentencia.
+    Las consultas de AsyncSession se ejecutan en un greenlet; la pila del código
+    que hizo el `await` continúa en el greenlet padre.
+    """
+    frames = []
+    frame = sys._getframe(2)
+    current = greenlet.getcurrent()
+    while frame is not None or current is not None:
+        if frame is None:
+            current = current.parent
+            frame = current.gr_frame if current is not None else None
+            continue
+        filename = frame.f_code.co_filename.replace("\\", "/")
+        if "/app/" in filename and "/app/core/" not in filename:
+            short = filename[filename.rindex("/app/") + 1:]
+            frames.append(f"{short}:{frame.f_lineno} in {frame.f_code.co_name}")
+            if len(frames) >= limit:
+                break
+        frame = frame.f_back
+    return " <- ".join(frames) or "<unknown>"
+
+
+def track_request_queries(engine: Engine, n_plus_one_threshold: int = 5) -> None:
+    """
+    Registra en el engine (síncrono) los eventos que alimentan RequestStats.
+    Con la detección activa, `n_plus_one_threshold` ejecuciones de la misma
+    sentencia en una petición generan un aviso con el código que las originó.
+    """
+    global _n_plus_one_threshold
+    _n_plus_one_threshold = n_plus_one_threshold
+    time_queries(engine)
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def time_queries(engine: Engine) -> None:
+    """Marca el inicio de cada sentencia para que `query_duration_ns` pueda medirla."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def query_duration_ns(context) -> Optional[int]:
+    """Duración de la sentencia en curso (usar desde `after_cursor_execute`)."""
+    started = getattr(context, "_query_started_ns", None)
+    return time.perf_counter_ns() - started if started is not None else None
+
+
+_n_plus_one_threshold = 5
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None:
+        context._query_started_ns = time.perf_counter_ns()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = current_request_stats.get()
+    if stats is None:
+        return
+    stats.db_count += 1
+    duration = query_duration_ns(context)
+    if duration is not None:
+        stats.db_ns += duration
+
+    if stats.shapes is None:
+        return
+    shape = statement_shape(statement)
+    stats.shapes[shape] += 1
+    if stats.shapes[shape] >= _n_plus_one_threshold and shape not in stats.reported_shapes:
+        stats.reported_shapes.add(shape)
+        logger.warning(
+            "Possible N+1: %d executions of the same statement in %s %s at %s: %s",
+            stats.shapes[shape],
+            stats.method,
+            stats.path,
+            _app_location(),
+            shape[:300],
+        )
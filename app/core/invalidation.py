@@ -0,0 +1,320 @@
+import asyncio
+import inspect
+import itertools
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# IDs por NOTIFY; el payload de Postgres está limitado a 8000 bytes
+MAX_IDS_PER_NOTIFY = 500
+_LOST = object()
+
+Handler = Callable[..., Union[None, Awaitable[None]]]
+
+invalidation_published_total = registry.counter(
+    "cache_invalidation_published_total",
+    "Invalidation notifications published by this worker, by entity.",
+    ("entity",),
+)
+invalidation_received_total = registry.counter(
+    "cache_invalidation_received_total",
+    "Invalidation notifications received from other workers, by entity.",
+    ("entity",),
+)
+invalidation_flushes_total = registry.counter(
+    "cache_invalidation_flushes_total",
+    "Full cache flushes triggered by the invalidation bus, by reason.",
+    ("reason",),
+)
+invalidation_listener_connected = registry.gauge(
+    "cache_invalidation_listener_connected",
+    "1 while this worker's LISTEN connection is up.",
+)
+
+
+class InvalidationBus:
+    """
+    Bus de invalidación de cachés entre workers sobre LISTEN/NOTIFY.
+
+    Publicación: tras cada flush de una sesión ORM se envía, en la misma
+    transacción, un `pg_notify` por entidad con los IDs creados, modificados
+    o borrados de los modelos registrados con `track`. Postgres solo entrega
+    la notificación si la transacción confirma, y nunca antes del commit.
+    Las sentencias Core (`update()`, `delete()`, `insert()` con
+    `db.execute`) no pasan por el flush y no publican nada: quien las use
+    sobre un modelo registrado tiene que cubrir la invalidación.
+
+    Recepción: cada worker mantiene una conexión dedicada con LISTEN. Las
+    notificaciones se agrupan durante `batch_ms` y se entregan a los
+    suscriptores (`subscribe`) como un conjunto de IDs por entidad; las del
+    propio worker se ignoran porque sus cachés ya se actualizaron al
+    escribir. Si la conexión se pierde, al reconectar se piden vaciados
+    completos (`on_flush`): durante el corte pudo perderse cualquier aviso.
+
+    Otros canales pueden compartir la misma conexión con `listen`: sus
+    mensajes se entregan tal cual, sin agrupar, y al reconectar se avisa a su
+    `on_reconnect` para que recupere lo perdido por su cuenta.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        database_url: str,
+        batch_ms: float = 50.0,
+        reconnect_seconds: float = 2.0,
+        healthcheck_seconds: float = 30.0,
+        enabled: bool = True,
+    ):
+        self.channel = channel
+        self.database_url = database_url
+        self.batch_seconds = batch_ms / 1000
+        self.reconnect_seconds = reconnect_seconds
+        self.healthcheck_seconds = healthcheck_seconds
+        self.enabled = enabled
+        self.origin = uuid.uuid4().hex
+        self._tracked: Dict[type, str] = {}
+        self._subscribers: Dict[str, List[Tuple[Handler, Optional[Handler]]]] = {}
+        self._listeners: Dict[str, Tuple[Callable[[str], None], Optional[Handler]]] = {}
+        self._conn = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    # Publicación
+
+    def track(self, model_cls: type) -> type:
+        """Publica los cambios de `model_cls` con su nombre de tabla como entidad."""
+        self._tracked[model_cls] = model_cls.__tablename__
+        return model_cls
+
+    def install(self) -> None:
+        if self.enabled and not event.contains(Session, "after_flush", self._after_flush):
+            event.listen(Session, "after_flush", self._after_flush)
+
+    def _after_flush(self, session, flush_context) -> None:
+        changed: Dict[str, Set[int]] = {}
+        for instance in itertools.chain(session.new, session.dirty, session.deleted):
+            entity = self._tracked.get(type(instance))
+            # Todos los workers se suscriben igual: sin suscriptores aquí, nadie escucha
+            if entity is None or entity not in self._subscribers or instance.id is None:
+                continue
+            if instance in session.dirty and not session.is_modified(instance):
+                continue
+            changed.setdefault(entity, set()).add(instance.id)
+        if not changed:
+            return
+
+        connection = session.connection()
+        for entity, ids in changed.items():
+            ordered = sorted(ids)
+            for start in range(0, len(ordered), MAX_IDS_PER_NOTIFY):
+                connection.execute(
+                    text(
+                        "SELECT pg_notify(:channel, json_build_object("
+                        "'entity', CAST(:entity AS text), 'ids', CAST(:ids AS int[]), "
+                        "'origin', CAST(:origin AS text))::text)"
+                    ),
+                    {
+                        "channel": self.channel,
+                        "entity": entity,
+                        "ids": ordered[start:start + MAX_IDS_PER_NOTIFY],
+                        "origin": self.origin,
+                    },
+                )
+            invalidation_published_total.inc((entity,))
+
+    # Suscripción
+
+    def subscribe(self, entity: str, on_invalidate: Handler, on_flush: Optional[Handler] = None) -> None:
+        """
+        `on_invalidate(ids)` recibe los IDs cambiados en otros workers;
+        `on_flush()` se llama cuando pudieron perderse avisos y hay que
+        descartar todo. Ambos pueden ser corrutinas.
+        """
+        subscribers = self._subscribers.setdefault(entity, [])
+        if (on_invalidate, on_flush) not in subscribers:
+            subscribers.append((on_invalidate, on_flush))
+
+    def listen(self, channel: str, on_message: Callable[[str], None], on_reconnect: Optional[Handler] = None) -> None:
+        """
+        Escucha `channel` en la conexión del bus. `on_message(payload)` se
+        llama en el bucle de eventos por cada notificación y no debe bloquear;
+        `on_reconnect()` (puede ser corrutina) tras recuperar la conexión.
+        Debe llamarse antes de `start`.
+        """
+        self._listeners[channel] = (on_message, on_reconnect)
+
+    async def start(self) -> None:
+        """Abre la conexión de escucha; si falla, se reintenta en segundo plano."""
+        if not (self.enabled or self._listeners) or self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        try:
+            await self._connect()
+        except Exception as exc:
+            logger.warning("Invalidation listener could not connect (%s); retrying in background", exc)
+            self._queue.put_nowait(_LOST)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close()
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        dsn = make_url(self.database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        conn = await asyncpg.connect(dsn, timeout=10)
+        conn.add_termination_listener(self._on_terminated)
+        channels = ([self.channel] if self.enabled else []) + list(self._listeners)
+        for channel in channels:
+            await conn.add_listener(channel, self._on_notify)
+        self._conn = conn
+        invalidation_listener_connected.set((), 1)
+        logger.info("Invalidation listener connected on channels %s", ", ".join(channels))
+
+    async def _close(self) -> None:
+        conn, self._conn = self._conn, None
+        invalidation_listener_connected.set((), 0)
+        if conn is not None and not conn.is_closed():
+            conn.remove_termination_listener(self._on_terminated)
+            try:
+                await asyncio.wait_for(conn.close(), timeout=5)
+            except Exception:
+                conn.terminate()
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        if channel == self.channel:
+            self._queue.put_nowait(payload)
+            return
+        try:
+            self._listeners[channel][0](payload)
+        except Exception:
+            logger.exception("Listener for channel %s failed", channel)
+
+    def _on_terminated(self, conn) -> None:
+        if self._queue is not None:
+            self._queue.put_nowait(_LOST)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=self.healthcheck_seconds)
+            except asyncio.TimeoutError:
+                first = None if await self._healthy() else _LOST
+                if first is None:
+                    continue
+
+            batch = [first]
+            if first is not _LOST:
+                # Agrupa las ráfagas: lo que llegue en la ventana va en el mismo lote
+                await asyncio.sleep(self.batch_seconds)
+                while not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+            if any(item is _LOST for item in batch):
+                await self._reconnect()
+                continue
+            await self._dispatch(batch)
+
+    async def _healthy(self) -> bool:
+        if not self.connected:
+            return False
+        try:
+            await asyncio.wait_for(self._conn.fetchval("SELECT 1"), timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def _reconnect(self) -> None:
+        await self._close()
+        while True:
+            try:
+                await self._connect()
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Invalidation listener reconnect failed (%s)", exc)
+                await asyncio.sleep(self.reconnect_seconds)
+        # Descarta avisos anteriores al corte; la recarga completa ya los cubre
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        await self.flush_all("reconnect")
+        for channel, (_, on_reconnect) in self._listeners.items():
+            if on_reconnect is None:
+                continue
+            try:
+                await _call(on_reconnect)
+            except Exception:
+                logger.exception("Reconnect handler for channel %s failed", channel)
+
+    async def _dispatch(self, payloads: Iterable[str]) -> None:
+        changed: Dict[str, Set[int]] = {}
+        for payload in payloads:
+            try:
+                message = json.loads(payload)
+            except ValueError:
+                logger.warning("Ignoring malformed invalidation payload: %.200s", payload)
+                continue
+            if message.get("origin") == self.origin:
+                continue
+            entity = message["entity"]
+            changed.setdefault(entity, set()).update(message["ids"])
+            invalidation_received_total.inc((entity,))
+
+        for entity, ids in changed.items():
+            for on_invalidate, on_flush in self._subscribers.get(entity, ()):
+                try:
+                    await _call(on_invalidate, ids)
+                except Exception:
+                    logger.exception("Invalidation handler for %s failed; flushing it", entity)
+                    if on_flush is not None:
+                        invalidation_flushes_total.inc(("handler_error",))
+                        await _call(on_flush)
+
+    async def flush_all(self, reason: str) -> None:
+        invalidation_flushes_total.inc((reason,))
+        for subscribers in self._subscribers.values():
+            for _, on_flush in subscribers:
+                if on_flush is None:
+                    continue
+                try:
+                    await _call(on_flush)
+                except Exception:
+                    logger.exception("Cache flush after %s failed", reason)
+
+
+async def _call(handler: Handler, *args) -> None:
+    result = handler(*args)
+    if inspect.isawaitable(result):
+        await result
+
+
+invalidation_bus = InvalidationBus(
+    channel=settings.INVALIDATION_CHANNEL,
+    database_url=settings.INVALIDATION_DATABASE_URL or settings.DATABASE_URL,
+    batch_ms=settings.INVALIDATION_BATCH_MS,
+    reconnect_seconds=settings.INVALIDATION_RECONNECT_SECONDS,
+    healthcheck_seconds=settings.INVALIDATION_HEALTHCHECK_SECONDS,
+    enabled=settings.INVALIDATION_ENABLED,
+)
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.core.config import settings
+from app.core.instrumentation import current_request_stats
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+event_loop_lag = registry.histogram(
+    "event_loop_lag_seconds",
+    "Delay between the scheduled and actual wake-up of the loop lag sampler.",
+    buckets=LAG_BUCKETS,
+)
+event_loop_stalls_total = registry.counter(
+    "event_loop_stalls_total",
+    "Times the event loop was blocked longer than the stall threshold, by route.",
+    ("route",),
+)
+
+
+class LoopMonitor:
+    """
+    Vigila el event loop del worker.
+
+    - Una tarea se despierta cada `interval` segundos y registra en un
+      histograma el retraso con el que lo hace (lag del loop).
+    - Un hilo watchdog comprueba el latido de esa tarea; si el loop lleva más
+      de `stall_threshold` segundos sin atenderlo, captura la pila del hilo del
+      loop y la ruta de la petición en curso, y lo registra en el log y en
+      `event_loop_stalls_total`. Así aparecen las llamadas bloqueantes (hash de
+      contraseñas, E/S síncrona, validaciones grandes) con su origen.
+    """
+
+    def __init__(self, interval: float = 0.1, stall_threshold: float = 0.1):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = 0.0
+        self._reported_heartbeat = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample_lag())
+        self._thread = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _sample_lag(self) -> None:
+        interval_ns = int(self.interval * 1e9)
+        while True:
+            started = time.perf_counter_ns()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = time.perf_counter()
+            event_loop_lag.observe_ns((), max(0, time.perf_counter_ns() - started - interval_ns))
+
+    def _watchdog(self) -> None:
+        check_every = max(self.stall_threshold / 2, 0.005)
+        while not self._stopped.wait(check_every):
+            heartbeat = self._heartbeat
+            blocked_for = time.perf_counter() - heartbeat - self.interval
+            if blocked_for < self.stall_threshold or heartbeat == self._reported_heartbeat:
+                continue
+            # Un aviso por bloqueo, aunque dure varias comprobaciones
+            self._reported_heartbeat = heartbeat
+            self._report_stall(blocked_for)
+
+    def _report_stall(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task = asyncio.current_task(self._loop) if frame is not None else None
+        stats = task.get_context().get(current_request_stats) if task is not None else None
+        route = (stats.route if stats is not None else None) or "-"
+        location = "".join(traceback.format_stack(frame, limit=15)) if frame is not None else "<no frame>\n"
+        logger.warning(
+            "Event loop blocked for at least %.0f ms (route=%s %s). Loop thread stack:\n%s",
+            blocked_for * 1000,
+            stats.method if stats is not None else "",
+            (stats.route or stats.path) if stats is not None else "-",
+            location,
+        )
+        # Las métricas solo se escriben desde el hilo del loop
+        self._loop.call_soon_threadsafe(event_loop_stalls_total.inc, (route,))
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+    stall_threshold=settings.LOOP_STALL_THRESHOLD_MS / 1000,
+)
@@ -0,0 +1,369 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Límites de los histogramas de latencia, en segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+LOAD_TYPES = ("lazy", "selectin", "joined", "auto")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, object] = {}
+
+    def snapshot(self) -> dict:
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "values": [[list(labels), value] for labels, value in self._values.items()],
+        }
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, labels: Labels = (), value: float = 0) -> None:
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """
+    Histograma con límites fijos. Cada serie es una lista de contadores por
+    bucket (no acumulados) seguida de la suma en nanosegundos, así que
+    registrar una muestra es una búsqueda binaria y dos sumas.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._bounds_ns = [int(bound * 1e9) for bound in self.buckets]
+
+    def observe_ns(self, labels: Labels, value_ns: int) -> None:
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [0] * (len(self._bounds_ns) + 2)
+        state[bisect_left(self._bounds_ns, value_ns)] += 1
+        state[-1] += value_ns
+
+    def observe(self, labels: Labels, seconds: float) -> None:
+        self.observe_ns(labels, int(seconds * 1e9))
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data["values"] = [[labels, list(state)] for labels, state in data["values"]]
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas por worker con exposición en formato de texto de Prometheus.
+
+    Todas las escrituras se hacen desde el hilo del event loop, por lo que el
+    camino de registro no usa locks. Con `multiproc_dir` cada worker vuelca
+    periódicamente su estado a `<dir>/<pid>.json` y `/metrics` agrega los
+    ficheros de todos los workers: contadores e histogramas se suman; los
+    gauges solo se suman para procesos vivos.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self.multiproc_dir: Optional[str] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    # Multiproceso
+
+    async def start(self, multiproc_dir: Optional[str], flush_seconds: float) -> None:
+        self.multiproc_dir = multiproc_dir
+        if not multiproc_dir:
+            return
+        os.makedirs(multiproc_dir, exist_ok=True)
+        self._flush_task = asyncio.create_task(self._flush_loop(flush_seconds))
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self.multiproc_dir:
+            await self.flush()
+
+    async def _flush_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot: %s", e)
+
+    async def flush(self) -> None:
+        # La copia se toma en el loop; la escritura a disco va a un hilo
+        snapshot = self.snapshot()
+        await asyncio.to_thread(self._write_snapshot, self.multiproc_dir, snapshot)
+
+    @staticmethod
+    def _write_snapshot(directory: str, snapshot: dict) -> None:
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_snapshots(directory: str) -> List[Tuple[int, dict]]:
+        snapshots = []
+        for filename in os.listdir(directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    snapshots.append((int(filename[:-5]), json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    async def render(self) -> str:
+        """Devuelve las métricas en formato de texto de Prometheus (0.0.4)."""
+        if not self.multiproc_dir:
+            return _render(self.snapshot())
+        await self.flush()
+        snapshots = await asyncio.to_thread(self._read_snapshots, self.multiproc_dir)
+        return _render(_merge(snapshots))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(snapshots: Iterable[Tuple[int, dict]]) -> dict:
+    merged: Dict[str, dict] = {}
+    for pid, snapshot in snapshots:
+        alive = None
+        for name, data in snapshot.items():
+            if data["kind"] == "gauge":
+                if alive is None:
+                    alive = _pid_alive(pid)
+                if not alive:
+                    continue
+            target = merged.setdefault(name, {**data, "values": {}})
+            for labels, value in data["values"]:
+                key = tuple(labels)
+                current = target["values"].get(key)
+                if current is None:
+                    target["values"][key] = value
+                elif data["kind"] == "histogram":
+                    target["values"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["values"][key] = current + value
+    for data in merged.values():
+        data["values"] = list(data["values"].items())
+    return merged
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], labels: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _render(snapshot: dict) -> str:
+    lines = []
+    for name, data in sorted(snapshot.items()):
+        kind = data["kind"]
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {kind}")
+        labelnames = data["labelnames"]
+        for labels, value in data["values"]:
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(data["buckets"], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labelnames, labels, f'le=\"{bound}\"')} {cumulative}")
+            cumulative += value[-2]
+            lines.append(f"{name}_bucket{_format_labels(labelnames, labels, 'le=\"+Inf\"')} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {value[-1] / 1e9}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method, status and load_type.",
+    ("route", "method", "status", "load_type"),
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served.",
+)
+db_queries_total = registry.counter(
+    "db_queries_total",
+    "SQL statements executed, by operation.",
+    ("operation",),
+)
+
+
+def _route_load_type(route) -> Optional[str]:
+    """Valor por defecto de `load_type` de la ruta, o None si no lo acepta."""
+    if not isinstance(route, APIRoute):
+        return None
+    for param in route.dependant.query_params:
+        if param.name == "load_type":
+            return str(param.field_info.default)
+    return None
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que registra la latencia de cada petición con
+    `perf_counter_ns` (hasta el último bloque del cuerpo) y el número de
+    peticiones en curso. La ruta se etiqueta con su plantilla (`/posts/{post_id}`)
+    para mantener acotada la cardinalidad.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._load_type_defaults: Dict[int, Optional[str]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter_ns()
+        status = "500"
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            http_request_duration.observe_ns(
+                (self._route_template(scope), scope["method"], status, self._load_type(scope)),
+                time.perf_counter_ns() - started,
+            )
+
+    @staticmethod
+    def _route_template(scope: Scope) -> str:
+        route = scope.get("route")
+        return getattr(route, "path", None) or "<unmatched>"
+
+    def _load_type(self, scope: Scope) -> str:
+        route = scope.get("route")
+        if route is None:
+            return ""
+        # Las rutas no son hashables; viven lo mismo que la aplicación
+        key = id(route)
+        if key not in self._load_type_defaults:
+            self._load_type_defaults[key] = _route_load_type(route)
+        default = self._load_type_defaults[key]
+        if default is None:
+            return ""
+        # Solo valores válidos: FastAPI ya rechaza el resto con 422
+        query_string = scope.get("query_string", b"")
+        if b"load_type" not in query_string:
+            return default
+        value = dict(parse_qsl(query_string.decode("latin-1"))).get("load_type", default)
+        return value if value in LOAD_TYPES else "invalid"
+
+
+def _statement_operation(statement: str) -> str:
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+        return operation.lower()
+    return "other"
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Cuenta las sentencias SQL ejecutadas por el engine (síncrono) indicado."""
+    if event.contains(engine, "after_cursor_execute", _count_query):
+        return
+    event.listen(engine, "after_cursor_execute", _count_query)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    db_queries_total.inc((_statement_operation(statement),))
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Marca la petición a la que pertenece cada tarea (las tareas hijas heredan el contexto)
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+# Pseudo-frame para las muestras en las que la petición no estaba ejecutándose en el loop
+NOT_RUNNING = "[not running: awaiting I/O or other tasks]"
+
+
+class RequestProfile:
+    """Muestras de pila de una petición: pila colapsada -> número de muestras."""
+
+    __slots__ = ("method", "path", "route", "started_ns", "samples", "armed_by")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.started_ns = time.perf_counter_ns()
+        self.samples: Counter = Counter()
+        self.armed_by: Optional[str] = None
+
+
+def _short_filename(filename: str) -> str:
+    for marker in ("/site-packages/", "/app/", "/lib/"):
+        index = filename.rfind(marker)
+        if index != -1:
+            return filename[index + 1:] if marker == "/app/" else filename[index + len(marker):]
+    return os.path.basename(filename)
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({_short_filename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+class SamplingProfiler:
+    """
+    Perfilador estadístico del hilo del event loop.
+
+    Un hilo aparte toma la pila del loop con `sys._current_frames()` cada
+    `interval` segundos y la atribuye a la petición cuya tarea se está
+    ejecutando en ese momento. El hilo solo despierta mientras hay alguna
+    petición en perfilado; sin perfiles activos el coste es nulo.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._active: List[RequestProfile] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stopped = False
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._thread is not None:
+            return
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def begin(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._active.append(profile)
+        self._wakeup.set()
+
+    def end(self, profile: RequestProfile) -> None:
+        with self._lock:
+            if profile in self._active:
+                self._active.remove(profile)
+            if not self._active:
+                self._wakeup.clear()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait()
+            if self._stopped:
+                return
+            self._sample()
+            time.sleep(self.interval)
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task = asyncio.current_task(self._loop) if frame is not None else None
+        running = task.get_context().get(_current_profile) if task is not None else None
+        stack = None
+        with self._lock:
+            for profile in self._active:
+                if profile is running:
+                    if stack is None:
+                        stack = _collapse(frame)
+                    profile.samples[stack] += 1
+                else:
+                    profile.samples[NOT_RUNNING] += 1
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que perfila una fracción `sample_rate` de las peticiones
+    desde el inicio y, con `latency_threshold_ms`, cualquier petición que siga
+    en curso al superar el umbral (a partir de ese momento).
+
+    Cada perfil se escribe en `output_dir` en formato de pilas colapsadas
+    (compatible con flamegraph.pl y speedscope), con la ruta en el nombre del
+    fichero; se conservan como mucho `max_files` ficheros. La escritura se hace
+    en un hilo, fuera del event loop.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        profiler: SamplingProfiler,
+        output_dir: str,
+        sample_rate: float = 0.0,
+        latency_threshold_ms: float = 0.0,
+        max_files: int = 200,
+    ):
+        self.app = app
+        self.profiler = profiler
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.latency_threshold = latency_threshold_ms / 1000
+        self.max_files = max_files
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _current_profile.set(profile)
+        armed = False
+        timer = None
+
+        def arm(reason: str) -> None:
+            nonlocal armed
+            armed = True
+            profile.armed_by = reason
+            self.profiler.begin(profile)
+
+        if self.sample_rate and random.random() < self.sample_rate:
+            arm("sampled")
+        elif self.latency_threshold:
+            timer = loop.call_later(self.latency_threshold, arm, "slow")
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_profile.reset(token)
+            if timer is not None:
+                timer.cancel()
+            if armed:
+                self.profiler.end(profile)
+                profile.route = getattr(scope.get("route"), "path", None)
+                elapsed_ms = (time.perf_counter_ns() - profile.started_ns) / 1e6
+                loop.run_in_executor(None, self._write, profile, elapsed_ms)
+
+    def _write(self, profile: RequestProfile, elapsed_ms: float) -> None:
+        if not profile.samples:
+            return
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+            route = _SLUG.sub("_", profile.route or profile.path).strip("_") or "root"
+            filename = f"{stamp}_{profile.method}_{route}_{elapsed_ms:.0f}ms_{profile.armed_by}.collapsed"
+            root = f"{profile.method} {profile.route or profile.path}"
+            with open(os.path.join(self.output_dir, filename), "w") as f:
+                for stack, count in profile.samples.most_common():
+                    f.write(f"{root};{stack} {count}\n")
+            self._rotate()
+        except OSError as e:
+            logger.warning("Could not write profile: %s", e)
+
+    def _rotate(self) -> None:
+        files = sorted(
+            entry.path for entry in os.scandir(self.output_dir)
+            if entry.is_file() and entry.name.endswith(".collapsed")
+        )
+        for path in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+profiler = SamplingProfiler(interval=settings.PROFILING_INTERVAL_MS / 1000)
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from uvicorn import Config, Server
+from uvicorn.supervisors.multiprocess import Multiprocess, Process
+
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Cada worker necesita al menos estas conexiones en su pool para ser útil
+MIN_CONNECTIONS_PER_WORKER = 2
+
+
+def available_cpus() -> int:
+    """
+    CPUs que puede usar este proceso: afinidad del proceso y, en contenedores,
+    la cuota de CPU del cgroup v2 (`cpu.max`), que `os.cpu_count()` ignora.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def _best_available(module: str, implementation: str) -> str:
+    try:
+        __import__(module)
+    except ImportError:
+        return "auto"
+    return implementation
+
+
+@dataclass
+class ServerPlan:
+    workers: int
+    pool_size: int
+    max_overflow: int
+    budget: Optional[int]
+    auxiliary_connections: int
+
+    @property
+    def connections(self) -> int:
+        """Conexiones que pueden llegar a abrir todos los workers juntos."""
+        return self.workers * (self.pool_size + self.max_overflow + self.auxiliary_connections)
+
+
+def auxiliary_connections() -> int:
+    """
+    Conexiones por worker fuera del pool principal: EXPLAIN del slow-query
+    log y la conexión LISTEN del bus de invalidación y del stream de cambios.
+    """
+    from app.core.slow_queries import MAX_CONCURRENT_EXPLAINS
+
+    auxiliary = 0
+    if settings.SLOW_QUERY_THRESHOLD_MS and settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE > 0:
+        auxiliary += MAX_CONCURRENT_EXPLAINS
+    if settings.INVALIDATION_ENABLED or settings.SSE_ENABLED:
+        auxiliary += 1
+    return auxiliary
+
+
+async def _server_connection_budget(database_url: str, timeout: float = 5.0) -> int:
+    """max_connections de Postgres menos las reservadas a superusuarios y a `DB_RESERVED_CONNECTIONS`."""
+    import asyncpg
+    from sqlalchemy.engine import make_url
+
+    dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+    conn = await asyncpg.connect(dsn, timeout=timeout)
+    try:
+        available = await conn.fetchval(
+            "SELECT current_setting('max_connections')::int"
+            " - current_setting('superuser_reserved_connections')::int"
+        )
+    finally:
+        await conn.close()
+    return available - settings.DB_RESERVED_CONNECTIONS
+
+
+def plan_server(workers: int, budget: Optional[int]) -> ServerPlan:
+    """
+    Reparte `budget` conexiones entre `workers` procesos. Cada worker recibe
+    como mucho DB_POOL_SIZE + DB_MAX_OVERFLOW, en la misma proporción; si el
+    presupuesto no da para MIN_CONNECTIONS_PER_WORKER por worker, se arrancan
+    menos workers. Sin presupuesto se usan los valores configurados.
+    """
+    auxiliary = auxiliary_connections()
+    if budget is None:
+        return ServerPlan(workers, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, None, auxiliary)
+
+    affordable = budget // (MIN_CONNECTIONS_PER_WORKER + auxiliary)
+    if affordable < 1:
+        raise SystemExit(f"A connection budget of {budget} cannot fit a single worker")
+    if affordable < workers:
+        logger.warning("Connection budget %d only fits %d of %d workers", budget, affordable, workers)
+        workers = affordable
+
+    configured = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    per_worker = min(configured, budget // workers - auxiliary)
+    pool_size = max(1, per_worker * settings.DB_POOL_SIZE // configured)
+    return ServerPlan(workers, pool_size, per_worker - pool_size, budget, auxiliary)
+
+
+class _Worker:
+    """Objetivo de cada proceso hijo: arranca un `Server` y avisa cuando está listo."""
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.ready = multiprocessing.get_context("spawn").Event()
+
+    def run(self, sockets=None) -> None:
+        ready = self.ready
+
+        class _Server(Server):
+            async def startup(self, sockets=None) -> None:
+                await super().startup(sockets)
+                if self.started:
+                    ready.set()
+
+        _Server(self.config).run(sockets)
+
+
+class RollingSupervisor(Multiprocess):
+    """
+    Supervisor de uvicorn con reinicio escalonado en SIGHUP: para cada worker
+    espera a que el anterior termine sus peticiones (SIGTERM, apagado
+    ordenado), arranca el sustituto y no pasa al siguiente hasta que este ha
+    completado su lifespan. El resto de workers sigue atendiendo mientras
+    tanto y nunca hay más procesos vivos que los planificados, así que el
+    presupuesto de conexiones se respeta. SIGTTIN se ignora por el mismo motivo.
+    """
+
+    def __init__(self, config: Config, sockets: list, ready_timeout: float):
+        super().__init__(config, target=_Worker(config).run, sockets=sockets)
+        self.ready_timeout = ready_timeout
+
+    def restart_all(self) -> None:
+        for idx, process in enumerate(self.processes):
+            process.terminate()
+            process.join()
+            worker = _Worker(self.config)
+            self.target = worker.run
+            replacement = Process(self.config, self.target, self.sockets)
+            replacement.start()
+            self.processes[idx] = replacement
+            if not worker.ready.wait(self.ready_timeout):
+                logger.error(
+                    "Worker [%s] not ready after %.0f s; stopping the rolling restart",
+                    replacement.pid,
+                    self.ready_timeout,
+                )
+                return
+            logger.info("Worker [%s] ready (%d/%d)", replacement.pid, idx + 1, len(self.processes))
+
+    def handle_ttin(self) -> None:
+        logger.warning("Ignoring SIGTTIN: database pools are sized for %d workers", self.processes_num)
+
+
+def serve(app: str) -> None:
+    """Planifica workers y pools, y arranca el supervisor con `app` ("módulo:atributo")."""
+    logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    workers = settings.WEB_WORKERS or min(available_cpus(), settings.WEB_MAX_WORKERS)
+    budget = settings.DB_CONNECTION_BUDGET or None
+    if settings.DB_POOLER_MODE == "transaction":
+        # Las conexiones a Postgres las limita el pooler (default_pool_size)
+        budget = None
+    elif budget is None:
+        try:
+            budget = asyncio.run(_server_connection_budget(settings.DATABASE_URL))
+        except Exception as exc:
+            logger.warning("Could not read max_connections (%s); using the configured pool sizes", exc)
+    plan = plan_server(workers, budget)
+
+    # Los workers leen su pool de la configuración, que hereda el entorno
+    os.environ["DB_POOL_SIZE"] = str(plan.pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(plan.max_overflow)
+
+    config = Config(
+        app,
+        host=settings.WEB_HOST,
+        port=settings.WEB_PORT,
+        workers=plan.workers,
+        loop=_best_available("uvloop", "uvloop"),
+        http=_best_available("httptools", "httptools"),
+        timeout_graceful_shutdown=settings.WEB_GRACEFUL_TIMEOUT_SECONDS,
+        log_level=settings.LOG_LEVEL.lower(),
+        access_log=not settings.ACCESS_LOG_ENABLED,
+    )
+    logger.info(
+        "Serving %s: %d workers, loop=%s, http=%s, pool_size=%d, max_overflow=%d, "
+        "up to %d connections (budget %s)",
+        app,
+        plan.workers,
+        config.loop,
+        config.http,
+        plan.pool_size,
+        plan.max_overflow,
+        plan.connections,
+        plan.budget if plan.budget is not None else "unknown",
+    )
+    sock = config.bind_socket()
+    RollingSupervisor(config, sockets=[sock], ready_timeout=settings.WEB_READY_TIMEOUT_SECONDS).run()
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+import random
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.instrumentation import current_request_stats, query_duration_ns, statement_shape, time_queries
+
+logger = logging.getLogger(__name__)
+
+# Como mucho estos EXPLAIN a la vez; el resto de muestras se descartan
+MAX_CONCURRENT_EXPLAINS = 2
+
+
+def _plan_summary(plan: dict) -> dict:
+    """Resumen del plan: nodo raíz, coste estimado y tablas leídas con Seq Scan."""
+    seq_scans: List[str] = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if node.get("Node Type") == "Seq Scan":
+            seq_scans.append(node.get("Relation Name", "?"))
+        pending.extend(node.get("Plans", []))
+    return {
+        "node_type": plan.get("Node Type"),
+        "total_cost": plan.get("Total Cost"),
+        "plan_rows": plan.get("Plan Rows"),
+        "seq_scans": sorted(set(seq_scans)),
+    }
+
+
+class SlowQueryLog:
+    """
+    Registro de sentencias lentas por worker.
+
+    Cada sentencia que supera `threshold_ms` se registra en el log (forma SQL,
+    tipos de los parámetros, duración y ruta) y se guarda en un buffer circular
+    de `capacity` entradas. Una fracción `explain_sample_rate` de ellas se
+    analiza con `EXPLAIN (FORMAT JSON)` en segundo plano, usando un engine
+    aparte sin pool para no ocupar conexiones de la aplicación.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = 200.0,
+        explain_sample_rate: float = 0.0,
+        capacity: int = 200,
+        explain_timeout: float = 5.0,
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_timeout = explain_timeout
+        self.entries: Deque[dict] = deque(maxlen=capacity)
+        self._explain_engine: Optional[AsyncEngine] = None
+        self._explain_tasks: Set[asyncio.Task] = set()
+        self._explaining: Set[str] = set()
+
+    def instrument(self, engine: Engine) -> None:
+        time_queries(engine)
+        if not event.contains(engine, "after_cursor_execute", self._after_cursor_execute):
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    async def start(self, database_url: str, connect_args: Optional[dict] = None) -> None:
+        if self.explain_sample_rate > 0 and self._explain_engine is None:
+            self._explain_engine = create_async_engine(database_url, poolclass=NullPool, connect_args=connect_args or {})
+
+    async def stop(self) -> None:
+        for task in list(self._explain_tasks):
+            task.cancel()
+        if self._explain_tasks:
+            await asyncio.gather(*self._explain_tasks, return_exceptions=True)
+        if self._explain_engine is not None:
+            await self._explain_engine.dispose()
+            self._explain_engine = None
+
+    def recent(self, limit: int = 50) -> List[dict]:
+        """Entradas más recientes primero."""
+        return list(reversed(self.entries))[:limit]
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if not self.threshold_ms:
+            return
+        duration_ns = query_duration_ns(context)
+        if duration_ns is None or duration_ns < self.threshold_ms * 1e6:
+            return
+
+        stats = current_request_stats.get()
+        shape = statement_shape(statement)
+        entry = {
+            "timestamp": datetime.now(timezone.utc),
+            "duration_ms": round(duration_ns / 1e6, 2),
+            "statement": shape,
+            "parameter_types": [type(value).__name__ for value in (parameters or ())] if not executemany else ["executemany"],
+            "route": f"{stats.method} {stats.route or stats.path}" if stats is not None else None,
+            "explain": None,
+        }
+        self.entries.append(entry)
+        logger.warning(
+            "Slow query (%.1f ms) route=%s params=%s: %s",
+            entry["duration_ms"],
+            entry["route"] or "-",
+            ",".join(entry["parameter_types"]),
+            shape[:500],
+        )
+
+        if self._should_explain(statement, shape, executemany):
+            self._explaining.add(shape)
+            task = asyncio.get_running_loop().create_task(self._explain(entry, shape, statement, parameters))
+            self._explain_tasks.add(task)
+            task.add_done_callback(self._explain_tasks.discard)
+
+    def _should_explain(self, statement: str, shape: str, executemany: bool) -> bool:
+        if self._explain_engine is None or executemany or shape in self._explaining:
+            return False
+        if len(self._explain_tasks) >= MAX_CONCURRENT_EXPLAINS:
+            return False
+        if not statement.lstrip()[:6].upper().startswith(("SELECT", "WITH")):
+            return False
+        return random.random() < self.explain_sample_rate
+
+    async def _explain(self, entry: dict, shape: str, statement: str, parameters) -> None:
+        try:
+            async with self._explain_engine.connect() as conn:
+                result = await asyncio.wait_for(
+                    conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", tuple(parameters or ())),
+                    timeout=self.explain_timeout,
+                )
+                plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            root = plan[0]["Plan"]
+            entry["explain"] = {**_plan_summary(root), "plan": root}
+            if entry["explain"]["seq_scans"]:
+                logger.warning("Slow query plan uses Seq Scan on %s: %s", ", ".join(entry["explain"]["seq_scans"]), shape[:300])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            entry["explain"] = {"error": str(e)}
+        finally:
+            self._explaining.discard(shape)
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    explain_sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    capacity=settings.SLOW_QUERY_LOG_SIZE,
+    explain_timeout=settings.SLOW_QUERY_EXPLAIN_TIMEOUT_SECONDS,
+)
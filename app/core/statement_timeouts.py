@@ -0,0 +1,122 @@
+import logging
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.instrumentation import current_request_stats
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE de "canceling statement due to statement timeout" (query_canceled)
+QUERY_CANCELED = "57014"
+
+db_statement_timeouts_total = registry.counter(
+    "db_statement_timeouts_total",
+    "Statements cancelled by statement_timeout, by route.",
+    ("route",),
+)
+
+current_request_scope: ContextVar[Optional[Scope]] = ContextVar("statement_timeouts_request_scope", default=None)
+
+
+class StatementTimeouts:
+    """
+    Límite de duración de las sentencias SQL por ruta.
+
+    `default_ms` se fija como `statement_timeout` de cada conexión al abrirla
+    (`connect_args()`), sin coste por petición. Las rutas de `overrides_ms`
+    (plantilla -> milisegundos) ejecutan además `SET LOCAL statement_timeout`
+    al empezar cada transacción de la sesión; el valor se descarta con el
+    COMMIT/ROLLBACK y no se filtra a la siguiente petición que use la conexión.
+    La ruta es la plantilla que el router deja en el scope de la petición,
+    que guarda StatementTimeoutMiddleware.
+
+    Con `per_transaction` (pooler en modo transacción, que no admite
+    parámetros de arranque y reparte las transacciones entre backends) no hay
+    ajuste de conexión: también el valor por defecto se fija con
+    `SET LOCAL` en cada transacción.
+    """
+
+    def __init__(self, default_ms: int = 0, overrides_ms: Optional[Dict[str, int]] = None, per_transaction: bool = False):
+        self.default_ms = int(default_ms)
+        self.overrides_ms = {route: int(ms) for route, ms in (overrides_ms or {}).items()}
+        self.per_transaction = per_transaction
+
+    def connect_args(self) -> dict:
+        if not self.default_ms or self.per_transaction:
+            return {}
+        return {"server_settings": {"statement_timeout": str(self.default_ms)}}
+
+    def install(self) -> None:
+        needed = self.overrides_ms or (self.per_transaction and self.default_ms)
+        if needed and not event.contains(Session, "after_begin", self._after_begin):
+            event.listen(Session, "after_begin", self._after_begin)
+
+    def _after_begin(self, session, transaction, connection) -> None:
+        scope = current_request_scope.get()
+        route = getattr(scope.get("route"), "path", None) if scope is not None else None
+        timeout_ms = self.overrides_ms.get(route) if route is not None else None
+        if self.per_transaction:
+            if timeout_ms is None:
+                timeout_ms = self.default_ms or None
+        elif timeout_ms == self.default_ms:
+            timeout_ms = None
+        if timeout_ms is not None:
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+class StatementTimeoutMiddleware:
+    """
+    Middleware ASGI que publica el scope de cada petición en
+    `current_request_scope`: el router escribe en él la ruta elegida antes de
+    llamar al endpoint, y de ahí la leen los límites por ruta.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request_scope.reset(token)
+
+
+def is_statement_timeout(exc: BaseException) -> bool:
+    return getattr(getattr(exc, "orig", None), "sqlstate", None) == QUERY_CANCELED
+
+
+async def statement_timeout_handler(request: Request, exc: DBAPIError):
+    """Traduce las sentencias canceladas por `statement_timeout` en un 504; el resto de errores sigue su curso."""
+    if not is_statement_timeout(exc):
+        raise exc
+    stats = current_request_stats.get()
+    route = getattr(request.scope.get("route"), "path", None) or (stats.route if stats is not None else None) or "-"
+    db_statement_timeouts_total.inc((route,))
+    logger.warning("Statement timeout in %s %s: %s", request.method, route, str(exc.statement)[:300])
+    return JSONResponse(
+        status_code=504,
+        content={
+            "error": "Query timeout",
+            "message": "The request took too long to complete, try narrowing it down",
+        },
+    )
+
+
+statement_timeouts = StatementTimeouts(
+    default_ms=settings.STATEMENT_TIMEOUT_MS,
+    overrides_ms=settings.STATEMENT_TIMEOUTS_MS,
+    per_transaction=settings.DB_POOLER_MODE == "transaction",
+)
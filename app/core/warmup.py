@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import sys
+import time
+from typing import Dict
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+from sqlalchemy.orm import configure_mappers
+
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+app_startup_seconds = registry.gauge(
+    "app_startup_seconds",
+    "Duration of each startup phase of this worker (import, warm-up steps).",
+    ("phase",),
+)
+
+
+def _complete_schemas() -> int:
+    """Termina de construir los esquemas que quedaron pendientes (referencias adelantadas)."""
+    rebuilt = 0
+    for name, module in list(sys.modules.items()):
+        if not name.startswith("app.schemas") or module is None:
+            continue
+        for value in vars(module).values():
+            if (
+                isinstance(value, type)
+                and issubclass(value, BaseModel)
+                and value.__module__ == name
+                and not value.__pydantic_complete__
+            ):
+                value.model_rebuild()
+                rebuilt += 1
+    return rebuilt
+
+
+async def _prime_connections(session_factory, connections: int) -> None:
+    """
+    Abre `connections` conexiones a la vez y ejecuta en cada una las consultas
+    más frecuentes, para que queden en el pool con sus sentencias preparadas
+    en la caché de asyncpg.
+    """
+    from app.models.post import Post
+    from app.models.user import User
+    from app.schemas.post import PostPublicExtended
+
+    # Cada sesión retiene su conexión hasta que todas tienen una
+    barrier = asyncio.Barrier(connections)
+
+    async def prime() -> None:
+        async with session_factory() as db:
+            try:
+                # Autenticación (get_current_user y login) y lectura de un post
+                await User.get_by_email(db, "")
+                await barrier.wait()
+                # Mismo tipo de carga que GET /posts/{id} por defecto
+                await Post.get_by_id(db, 0, load_type="selectin", schema=PostPublicExtended)
+                await Post.get_tag_ids(db, 0)
+            except BaseException:
+                await barrier.abort()
+                raise
+
+    await asyncio.gather(*(prime() for _ in range(connections)))
+
+
+async def warm_up(app: FastAPI, session_factory, pool_connections: int = 0, timeout: float = 10.0) -> Dict[str, float]:
+    """
+    Fase de calentamiento del lifespan, antes de aceptar peticiones:
+
+    - configura los mappers de SQLAlchemy (si no, los configura la primera consulta);
+    - completa los esquemas Pydantic pendientes y genera el esquema OpenAPI;
+    - abre `pool_connections` conexiones y prepara en ellas las consultas calientes.
+
+    Devuelve la duración de cada paso en milisegundos. Un fallo de base de
+    datos no impide arrancar: el pool se llenará con las primeras peticiones.
+    """
+    timings: Dict[str, float] = {}
+
+    started = time.perf_counter()
+    configure_mappers()
+    timings["mappers"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    _complete_schemas()
+    app.openapi()
+    timings["schemas"] = (time.perf_counter() - started) * 1000
+
+    if pool_connections > 0:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(_prime_connections(session_factory, pool_connections), timeout)
+        except Exception:
+            logger.exception("Connection pool warm-up failed")
+        timings["pool"] = (time.perf_counter() - started) * 1000
+
+    for phase, elapsed_ms in timings.items():
+        app_startup_seconds.set((f"warmup_{phase}",), elapsed_ms / 1000)
+    return timings
+
+
+def report_startup(import_ms: float, timings: Dict[str, float], budget_ms: float = 0.0) -> None:
+    """Registra el coste del arranque y avisa si supera `budget_ms`."""
+    app_startup_seconds.set(("import",), import_ms / 1000)
+    total_ms = import_ms + sum(timings.values())
+    logger.info(
+        "Startup: import %.0f ms, warm-up %s, total %.0f ms",
+        import_ms,
+        " ".join(f"{phase}={elapsed:.0f}ms" for phase, elapsed in timings.items()) or "skipped",
+        total_ms,
+    )
+    if budget_ms and total_ms > budget_ms:
+        logger.warning("Startup took %.0f ms, over the %.0f ms budget", total_ms, budget_ms)
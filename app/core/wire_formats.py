@@ -0,0 +1,173 @@
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import Receive, Scope, Send
+
+from app.core.instrumentation import InstrumentedRoute
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - dependencia opcional
+    cbor2 = None
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Alias habituales de MessagePack -> tipo canónico
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+# Formato de respuesta negociado para la petición en curso (None fuera de NegotiatedRoute)
+_response_format: ContextVar[Optional[str]] = ContextVar("response_format", default=None)
+
+
+def _encoders() -> Dict[str, Callable[[Any], bytes]]:
+    encoders = {}
+    if msgpack is not None:
+        encoders[MSGPACK] = lambda content: msgpack.packb(content, use_bin_type=True)
+    if cbor2 is not None:
+        encoders[CBOR] = cbor2.dumps
+    return encoders
+
+
+def _decoders() -> Dict[str, Callable[[bytes], Any]]:
+    decoders = {}
+    if msgpack is not None:
+        decoders[MSGPACK] = lambda body: msgpack.unpackb(body, raw=False)
+    if cbor2 is not None:
+        decoders[CBOR] = cbor2.loads
+    return decoders
+
+
+ENCODERS = _encoders()
+DECODERS = _decoders()
+
+
+def _media_type(value: str) -> str:
+    media_type = value.split(";", 1)[0].strip().lower()
+    return _ALIASES.get(media_type, media_type)
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """
+    Elige el formato de respuesta a partir de la cabecera Accept.
+
+    Solo se devuelve MessagePack o CBOR si el cliente los pide explícitamente;
+    a igualdad de `q` gana el primero de la lista y, si no hay nada aceptable,
+    se responde en JSON.
+    """
+    if not accept:
+        return JSON
+    best, best_q = JSON, 0.0
+    for item in accept.split(","):
+        media_type = _media_type(item)
+        q = 1.0
+        for param in item.split(";")[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in ENCODERS and q > best_q:
+            best, best_q = media_type, q
+        elif media_type in (JSON, "application/*", "*/*") and q > best_q:
+            best, best_q = JSON, q
+    return best
+
+
+class NegotiatedResponse(JSONResponse):
+    """
+    Respuesta por defecto de la aplicación: recibe el contenido ya validado y
+    serializado por FastAPI (la misma ruta que JSON) y solo cambia la
+    codificación final según el formato negociado por NegotiatedRoute.
+    """
+
+    # Firma explícita: FastAPI lee el status_code por defecto de aquí para el esquema OpenAPI
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        self.wire_format = _response_format.get()
+        super().__init__(content, status_code, headers, media_type, background)
+        if self.wire_format is not None:
+            MutableHeaders(raw=self.raw_headers).add_vary_header("Accept")
+
+    def render(self, content: Any) -> bytes:
+        encoder = ENCODERS.get(self.wire_format)
+        if encoder is None:
+            return super().render(content)
+        self.media_type = self.wire_format
+        return encoder(content)
+
+
+class WireFormatRequest(Request):
+    """
+    Request que decodifica cuerpos MessagePack/CBOR.
+
+    FastAPI solo pasa por `json()` los cuerpos con Content-Type JSON, así que
+    estos tipos se presentan como JSON y `json()` usa el decodificador binario;
+    el resto de la validación del cuerpo es idéntica.
+    """
+
+    def __init__(self, scope: Scope, receive: Receive, send: Send):
+        super().__init__(scope, receive, send)
+        content_type = super().headers.get("content-type")
+        media_type = _media_type(content_type) if content_type else None
+        self.body_format = media_type if media_type in DECODERS else None
+        self._json_headers = None
+        if self.body_format is not None:
+            self._json_headers = Headers(raw=[
+                (key, JSON.encode("latin-1") if key == b"content-type" else value)
+                for key, value in scope["headers"]
+            ])
+
+    @property
+    def headers(self) -> Headers:
+        if self._json_headers is not None:
+            return self._json_headers
+        return super().headers
+
+    async def json(self) -> Any:
+        body_format = self.body_format
+        if body_format is None:
+            return await super().json()
+        if not hasattr(self, "_json"):
+            self._json = DECODERS[body_format](await self.body())
+        return self._json
+
+
+class NegotiatedRoute(InstrumentedRoute):
+    """
+    Ruta con negociación de formato: respuestas en JSON, MessagePack o CBOR
+    según Accept, y cuerpos de petición en cualquiera de esos formatos.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            token = _response_format.set(negotiate_format(request.headers.get("accept")))
+            try:
+                return await handler(WireFormatRequest(request.scope, request.receive, request._send))
+            finally:
+                _response_format.reset(token)
+
+        return negotiated_handler
@@ -5,9 +5,10 @@ from app.models.user import User, UserProfile
 from app.models.post_tag import PostsTags
 from app.models.tag import Tag
 from app.models.post import Post
+from app.models.post_counts import TagPostCount, CategoryPostCount
 # from app.models.timestampmixin import TimestampMixin
 # from app.models.visibilitymixin import VisibilityMixin
 
 
 
-__all__ = ["Base", "User", "PostsTags", "Tag", "Post", "UserProfile"]
\ No newline at end of file
+__all__ = ["Base", "User", "PostsTags", "Tag", "Post", "UserProfile", "TagPostCount", "CategoryPostCount"]
\ No newline at end of file
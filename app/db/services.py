@@ -1,4 +1,5 @@
 import contextlib
+import uuid
 from typing import AsyncIterator, Annotated, Optional
 from collections.abc import AsyncGenerator
 
@@ -11,6 +12,7 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine
 )
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import NullPool
 
 from app.schemas.user import Role
 
@@ -18,23 +20,77 @@ class Base(DeclarativeBase):
     """Base class for all database models"""
     pass
 
+POOLER_MODES = ("session", "transaction")
+
+
+def _unique_statement_name() -> str:
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+
+def pooler_connect_args(pooler_mode: str, prepared_statement_cache_size: int = 100) -> dict:
+    """
+    connect_args de asyncpg según lo que haya delante de Postgres. Con un
+    pooler en modo "transaction" (PgBouncer pool_mode=transaction) cada
+    transacción puede ir a un backend distinto: las sentencias preparadas no
+    se cachean y llevan nombres únicos, para que dos clientes no choquen con
+    los nombres secuenciales de asyncpg en el mismo backend.
+    """
+    if pooler_mode not in POOLER_MODES:
+        raise ValueError(f"Pooler mode '{pooler_mode}' not recognized. Use 'session' or 'transaction'.")
+    if pooler_mode == "transaction":
+        return {
+            "prepared_statement_cache_size": 0,
+            "statement_cache_size": 0,
+            "prepared_statement_name_func": _unique_statement_name,
+        }
+    return {"prepared_statement_cache_size": prepared_statement_cache_size}
+
+
+def pooler_pool_options(pooler_mode: str, pool_size: int, max_overflow: int, pooler_pool_size: int = 0) -> dict:
+    """
+    Pool del lado de la aplicación. Detrás de un pooler en modo "transaction"
+    el pool real es el del pooler: NullPool (una conexión al pooler por
+    sesión) o, con `pooler_pool_size`, un pool pequeño sin overflow.
+    """
+    if pooler_mode == "transaction":
+        if not pooler_pool_size:
+            return {"poolclass": NullPool}
+        return {"pool_size": pooler_pool_size, "max_overflow": 0}
+    return {"pool_size": pool_size, "max_overflow": max_overflow}
+
+
+def pool_capacity(pool_options: dict) -> Optional[int]:
+    """
+    Conexiones que puede abrir el pool descrito por `pool_options` (las de
+    `pooler_pool_options`); None con NullPool, que no tiene límite propio.
+    """
+    if pool_options.get("poolclass") is NullPool:
+        return None
+    return pool_options["pool_size"] + pool_options["max_overflow"]
+
+
 class DatabaseSessionManager:
     def __init__(self):
         self._engine: AsyncEngine | None = None
         self._sessionmaker: async_sessionmaker | None = None
 
-    def init(self, host: str) -> None:
+    def init(self, host: str, **engine_options) -> None:
         
         if self._engine is not None:
             return
             
-        self._engine = create_async_engine(
-            host,
-            echo=False,  # Set to True for SQL logging
-            pool_pre_ping=True,  # Enable connection pool pre-ping
-            pool_size=10,  # Maximum number of connections to keep in the pool
-            max_overflow=20  # Maximum number of connections to create above pool_size
-        )
+        options = {
+            "echo": False,  # Set to True for SQL logging
+            "pool_pre_ping": True,  # Enable connection pool pre-ping
+            "pool_size": 10,  # Maximum number of connections to keep in the pool
+            "max_overflow": 20,  # Maximum number of connections to create above pool_size
+            **engine_options,  # e.g. connect_args from the application settings
+        }
+        if options.get("poolclass") is NullPool:
+            # NullPool does not accept pool sizing arguments
+            options.pop("pool_size", None)
+            options.pop("max_overflow", None)
+        self._engine = create_async_engine(host, **options)
         self._sessionmaker = async_sessionmaker(
             bind=self._engine,
             autoflush=False,
@@ -42,6 +98,12 @@ class DatabaseSessionManager:
             class_=AsyncSession
         )
 
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        return self._engine
+
     async def close(self) -> None:
         
         if self._engine is None:
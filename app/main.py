@@ -1,30 +1,116 @@
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI,Request
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
+from sqlalchemy.exc import DBAPIError
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.wire_formats import NegotiatedResponse
+from app.core.metrics import MetricsMiddleware, instrument_engine, registry as metrics_registry
+from app.core.instrumentation import InstrumentationMiddleware, track_request_queries
+from app.core.slow_queries import slow_query_log
+from app.core.profiling import ProfilingMiddleware, profiler
+from app.core.loop_monitor import loop_monitor
+from app.core.access_log import access_log
+from app.core.capture import CaptureMiddleware, traffic_capture
+from app.core.statement_timeouts import StatementTimeoutMiddleware, statement_timeout_handler, statement_timeouts
+from app.core.admission import AdmissionControlMiddleware, AdmissionGate, fit_to_pool
+from app.core.warmup import report_startup, warm_up
+from app.core.invalidation import invalidation_bus
+from app.core.change_feed import POST_CHANGES_CHANNEL, post_change_feed
 from app.core.rate_limiting import limiter, rate_limit_handler
-from app.db.services import sessionmanager
+from app.models.tag_catalog import tag_catalog
+from app.models.view_counter import view_counter
+from app.db.services import pool_capacity, pooler_connect_args, pooler_pool_options, sessionmanager
 from app.routers.user import router as router_users
 from app.routers.auth import router as router_auth
 from app.routers.posts import router as router_posts
 from app.routers.tags import router as router_tags
 from app.routers.admin import router as router_admin
 from app.routers.premium import router as router_premium
-import time
+
+logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+pool_options = pooler_pool_options(
+    settings.DB_POOLER_MODE,
+    settings.DB_POOL_SIZE,
+    settings.DB_MAX_OVERFLOW,
+    settings.DB_POOLER_POOL_SIZE,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    sessionmanager.init(settings.DATABASE_URL)
+    connect_args = pooler_connect_args(settings.DB_POOLER_MODE, settings.DB_PREPARED_STATEMENT_CACHE_SIZE)
+    sessionmanager.init(
+        settings.DATABASE_URL,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        connect_args={**connect_args, **statement_timeouts.connect_args()},
+        **pool_options,
+    )
+    statement_timeouts.install()
+    invalidation_bus.install()
+    if settings.METRICS_ENABLED:
+        instrument_engine(sessionmanager.engine.sync_engine)
+        await metrics_registry.start(settings.METRICS_MULTIPROC_DIR, settings.METRICS_FLUSH_SECONDS)
+    if settings.INSTRUMENTATION_ENABLED:
+        track_request_queries(sessionmanager.engine.sync_engine, settings.N_PLUS_ONE_THRESHOLD)
+    if settings.SLOW_QUERY_THRESHOLD_MS:
+        slow_query_log.instrument(sessionmanager.engine.sync_engine)
+        await slow_query_log.start(settings.DATABASE_URL, connect_args)
+    if settings.PROFILING_ENABLED:
+        profiler.start(asyncio.get_running_loop())
+    if settings.LOOP_MONITOR_ENABLED:
+        await loop_monitor.start()
+    if settings.ACCESS_LOG_ENABLED:
+        access_log.start()
+    if settings.CAPTURE_ENABLED:
+        traffic_capture.start()
+    timings = {}
+    if settings.WARMUP_ENABLED:
+        # NullPool (pooler en modo transacción) no guarda conexiones que calentar
+        pool = sessionmanager.engine.pool
+        timings = await warm_up(
+            app,
+            sessionmanager.session,
+            pool_connections=min(settings.WARMUP_POOL_CONNECTIONS, pool.size() if hasattr(pool, "size") else 0),
+            timeout=settings.WARMUP_TIMEOUT_SECONDS,
+        )
+    # LISTEN antes de la carga del catálogo para no perder cambios entre ambos
+    invalidation_bus.subscribe("tags", tag_catalog.invalidate, tag_catalog.reload)
+    if settings.SSE_ENABLED:
+        invalidation_bus.listen(POST_CHANGES_CHANNEL, post_change_feed.publish, post_change_feed.resync)
+    await invalidation_bus.start()
+    await tag_catalog.start(sessionmanager.session)
+    await post_change_feed.start(sessionmanager.session)
+    await view_counter.start(sessionmanager.session)
+    report_startup(_import_ms, timings, settings.STARTUP_BUDGET_MS)
     yield
     
+    await view_counter.stop()
+    await tag_catalog.stop()
+    await post_change_feed.stop()
+    await invalidation_bus.stop()
+    await metrics_registry.stop()
+    await slow_query_log.stop()
+    profiler.stop()
+    await loop_monitor.stop()
+    access_log.stop()
+    traffic_capture.stop()
     await sessionmanager.close()
 
 
 myapp = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
+    default_response_class=NegotiatedResponse,
     lifespan=lifespan
 )
 
@@ -37,14 +123,76 @@ myapp.include_router(router_premium, prefix=settings.API_V1_STR)
 
 myapp.state.limiter = limiter
 myapp.add_exception_handler(RateLimitExceeded, rate_limit_handler)
+myapp.add_exception_handler(DBAPIError, statement_timeout_handler)
 myapp.add_middleware(SlowAPIMiddleware)
-@myapp.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    print("process_time",process_time)
-    return response
+if statement_timeouts.overrides_ms:
+    myapp.add_middleware(StatementTimeoutMiddleware)
+if settings.COMPRESSION_ENABLED:
+    myapp.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+    )
+if settings.PROFILING_ENABLED:
+    myapp.add_middleware(
+        ProfilingMiddleware,
+        profiler=profiler,
+        output_dir=settings.PROFILING_OUTPUT_DIR,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        latency_threshold_ms=settings.PROFILING_LATENCY_THRESHOLD_MS,
+        max_files=settings.PROFILING_MAX_FILES,
+    )
+if settings.CAPTURE_ENABLED:
+    myapp.add_middleware(CaptureMiddleware, capture=traffic_capture)
+if settings.INSTRUMENTATION_ENABLED:
+    myapp.add_middleware(
+        InstrumentationMiddleware,
+        detect_n_plus_one=settings.N_PLUS_ONE_DETECTION,
+        access_log=access_log if settings.ACCESS_LOG_ENABLED else None,
+    )
+if settings.ADMISSION_ENABLED:
+    admission_timeout = settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000
+    # El entrypoint escribe en el entorno el pool calculado para cada worker
+    admission_limits = fit_to_pool(
+        {
+            "read": settings.ADMISSION_READ_CONCURRENCY,
+            "list": settings.ADMISSION_LIST_CONCURRENCY,
+            "write": settings.ADMISSION_WRITE_CONCURRENCY,
+            "auth": settings.ADMISSION_AUTH_CONCURRENCY,
+        },
+        pool_capacity(pool_options),
+    )
+    myapp.add_middleware(
+        AdmissionControlMiddleware,
+        router=myapp.router,
+        gates={
+            "read": AdmissionGate("read", admission_limits["read"], settings.ADMISSION_READ_QUEUE, admission_timeout),
+            "list": AdmissionGate("list", admission_limits["list"], settings.ADMISSION_LIST_QUEUE, admission_timeout),
+            "write": AdmissionGate("write", admission_limits["write"], settings.ADMISSION_WRITE_QUEUE, admission_timeout),
+            "auth": AdmissionGate("auth", admission_limits["auth"], settings.ADMISSION_AUTH_QUEUE, admission_timeout),
+            "stream": AdmissionGate("stream", settings.ADMISSION_STREAM_CONCURRENCY, 0, admission_timeout),
+        },
+        prefix=settings.API_V1_STR,
+        retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+    )
+if settings.METRICS_ENABLED:
+    myapp.add_middleware(MetricsMiddleware)
+
+
 @myapp.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@myapp.get("/metrics", include_in_schema=False)
+@limiter.exempt
+async def metrics():
+    return PlainTextResponse(
+        await metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+_import_ms = (time.perf_counter() - _import_started) * 1000
@@ -2,5 +2,7 @@ from .user import User
 from .post import Post
 from .tag import Tag
 from .post_tag import PostsTags
+from .post_counts import TagPostCount, CategoryPostCount
+from .post_change import PostChange
 
-__all__ = ["User", "Post", "Tag", "PostsTags"]
\ No newline at end of file
+__all__ = ["User", "Post", "Tag", "PostsTags", "TagPostCount", "CategoryPostCount", "PostChange"]
\ No newline at end of file
@@ -1,11 +1,65 @@
+import asyncio
+import logging
+from functools import lru_cache
 from typing import Any, List, Optional, Type, TypeVar, Union
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload, joinedload, lazyload
+from sqlalchemy import bindparam, select, event, inspect
+from sqlalchemy.orm import Session, selectinload, joinedload, lazyload
 from sqlalchemy.exc import NoResultFound, SQLAlchemyError
 
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _auto_load_options(model_cls, schema=None) -> tuple:
+    """
+    Estrategia por relación: joinedload para relaciones a uno (no multiplican
+    filas), selectinload para colecciones y ninguna carga anticipada para las
+    relaciones que el esquema de respuesta no usa.
+    """
+    fields = schema.model_fields if schema is not None else None
+    options = []
+    for relationship in inspect(model_cls).relationships:
+        attribute = getattr(model_cls, relationship.key)
+        if fields is not None and relationship.key not in fields:
+            options.append(lazyload(attribute))
+        elif relationship.uselist:
+            options.append(selectinload(attribute))
+        else:
+            options.append(joinedload(attribute))
+    return tuple(options)
+
+
+@lru_cache(maxsize=None)
+def _lookup_statement(model_cls, column: str, load_type: str = "lazy", schema=None):
+    """
+    Plantilla de `SELECT ... WHERE <column> = :value`, construida una vez por
+    combinación. Reutilizar el mismo objeto evita reconstruir la consulta y
+    recalcular su clave de caché en cada petición (SQLAlchemy la memoriza en
+    el objeto) y mantiene el mismo SQL, y por tanto la misma sentencia
+    preparada de asyncpg, para todos los valores.
+    """
+    options = model_cls._get_load_options(load_type, schema)
+    return select(model_cls).options(*options).where(getattr(model_cls, column) == bindparam("value"))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _warn_on_lazy_load(orm_execute_state):
+    # Con AsyncSession una carga perezosa acaba en MissingGreenlet; el aviso
+    # indica qué relación faltaba en las opciones de carga.
+    if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    logger.warning(
+        "Lazy load of %s inside the event loop; add it to the query load options",
+        orm_execute_state.loader_strategy_path[-1],
+    )
+
 class CRUDBase:
 
     @classmethod
@@ -15,6 +69,7 @@ class CRUDBase:
             db.add(instance)
             await db.commit()
             await db.refresh(instance)
+            cls._after_write(instance)
             return instance
         except SQLAlchemyError as e:
             await db.rollback()
@@ -25,14 +80,26 @@ class CRUDBase:
         cls: Type[T],
         db: AsyncSession,
         id: Any,
-        load_type: str = "lazy"
+        load_type: str = "lazy",
+        schema=None
     ) -> Optional[T]:
-        options = cls._get_load_options(load_type)
-        query = select(cls).options(*options).where(cls.id == id)
+        return await cls.get_one_by(db, "id", id, load_type=load_type, schema=schema)
+
+    @classmethod
+    async def get_one_by(
+        cls: Type[T],
+        db: AsyncSession,
+        column: str,
+        value: Any,
+        load_type: str = "lazy",
+        schema=None
+    ) -> Optional[T]:
+        """Primera fila con `column == value`, usando una plantilla de consulta cacheada."""
+        query = _lookup_statement(cls, column, load_type, schema)
 
         try:
-            result = await db.execute(query)
-            return result.scalars().first()
+            result = await db.execute(query, {"value": value})
+            return result.unique().scalars().first()
         except NoResultFound:
             return None
 
@@ -42,13 +109,14 @@ class CRUDBase:
         db: AsyncSession,
         load_type: str = "lazy",
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        schema=None
     ) -> List[T]:
-        options = cls._get_load_options(load_type)
+        options = cls._get_load_options(load_type, schema)
         query = select(cls).options(*options).offset(skip).limit(limit)
 
         result = await db.execute(query)
-        return result.scalars().all()
+        return result.unique().scalars().all()
 
     @classmethod
     async def update(
@@ -69,6 +137,7 @@ class CRUDBase:
             
             await db.commit()
             await db.refresh(instance)
+            cls._after_write(instance)
             return instance
         except SQLAlchemyError as e:
             await db.rollback()
@@ -87,6 +156,7 @@ class CRUDBase:
             
             await db.delete(instance)
             await db.commit()
+            cls._after_write(instance, deleted=True)
             return True
         except SQLAlchemyError as e:
             await db.rollback()
@@ -109,6 +179,7 @@ class CRUDBase:
             instance.is_deleted = True
             await db.commit()
             await db.refresh(instance)
+            cls._after_write(instance)
             return instance
         except SQLAlchemyError as e:
             await db.rollback()
@@ -131,21 +202,33 @@ class CRUDBase:
             instance.is_deleted = False
             await db.commit()
             await db.refresh(instance)
+            cls._after_write(instance)
             return instance
         except SQLAlchemyError as e:
             await db.rollback()
             raise RuntimeError(f"Error restoring {cls.__name__}: {str(e)}")
 
-    @staticmethod
-    def _get_load_options(load_type: str):
+    @classmethod
+    def _after_write(cls, instance, deleted: bool = False) -> None:
+        """Hook invocado tras confirmar una escritura; las subclases lo usan para sus cachés."""
+        pass
+
+    @classmethod
+    def _get_load_options(cls, load_type: str, schema=None):
+        """
+        schema: esquema Pydantic de la respuesta; con load_type="auto" solo se
+        cargan las relaciones que declara.
+        """
         if load_type == "selectin":
             return [selectinload("*")]
         elif load_type == "joined":
             return [joinedload("*")]
         elif load_type == "lazy":
             return [lazyload("*")]
+        elif load_type == "auto":
+            return list(_auto_load_options(cls, schema))
         else:
             raise ValueError(
                 f"Load type '{load_type}' not recognized. "
-                "Use 'lazy', 'selectin' or 'joined'."
+                "Use 'lazy', 'selectin', 'joined' or 'auto'."
             )
@@ -1,14 +1,24 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, select
-from sqlalchemy.exc import IntegrityError, NoResultFound
+from functools import lru_cache
+from typing import Iterable, Optional
+from sqlalchemy import BigInteger, Column, String, Integer, ForeignKey, Index, bindparam, column, func, select, delete, exists, text, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError, NoResultFound, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import relationship, selectinload , joinedload
 from app.db.services import Base
 from app.models.crud import CRUDBase
+from app.models.post_tag import PostsTags
+from app.models.syncmixin import SyncMixin
 from app.models.timestampmixin import TimestampMixin
 from app.models.visibilitymixin import VisibilityMixin
+from app.schemas.user import Role
 
-class Post(Base, CRUDBase, TimestampMixin, VisibilityMixin):
+class Post(Base, CRUDBase, TimestampMixin, VisibilityMixin, SyncMixin):
     __tablename__ = "posts"
+    __table_args__ = (
+        Index("ix_posts_updated_at_id", "updated_at", "id"),
+        Index("ix_posts_view_count_id", "view_count", "id"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True, index=True, unique=True)
     
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -16,6 +26,8 @@ class Post(Base, CRUDBase, TimestampMixin, VisibilityMixin):
     description = Column(String, nullable=True)
     content = Column(String, nullable=True)
     category = Column(String, nullable=True)
+    # Lo mantiene view_counter con escrituras diferidas; puede ir unos segundos por detrás
+    view_count = Column(BigInteger, nullable=False, server_default=text("0"))
     
 
     user = relationship("User", back_populates="posts",uselist=False)
@@ -27,75 +39,241 @@ class Post(Base, CRUDBase, TimestampMixin, VisibilityMixin):
         return result.scalars().all()
     @classmethod
     async def get_by_title(cls, db: AsyncSession, title: str):
-        query = select(cls).where(cls.title == title)
-        result = await db.execute(query)
-        return result.scalars().first()
+        return await cls.get_one_by(db, "title", title)
+    @classmethod
+    def filter_by_tags(cls, query, match: str = "any", count: int = 0):
+        """
+        Filtra por tags con semi-joins sobre posts_tags(tag_id, post_id); los
+        ids van como parámetros (`tag_params`). any: el post tiene al menos uno
+        de los tags (`tag_ids`); all: tiene los `count` tags (`tag_id_0`...).
+        """
+        if match == "all":
+            for i in range(count):
+                query = query.where(
+                    exists().where(PostsTags.post_id == cls.id, PostsTags.tag_id == bindparam(f"tag_id_{i}"))
+                )
+            return query
+        return query.where(
+            exists().where(PostsTags.post_id == cls.id, PostsTags.tag_id.in_(bindparam("tag_ids", expanding=True)))
+        )
+
+    @staticmethod
+    def tag_params(tag_ids: list[int], match: str = "any") -> dict:
+        """Valores de los parámetros de `filter_by_tags` para unos ids ya ordenados y sin repetir."""
+        if match == "all":
+            return {f"tag_id_{i}": tag_id for i, tag_id in enumerate(tag_ids)}
+        return {"tag_ids": tag_ids}
+
     @classmethod
-    async def execute_query(cls, db: AsyncSession, query, load_type: str = "selectin"):
+    def _list_load_options(cls, load_type: str, schema=None) -> list:
         if load_type == "selectin":
-            query = query.options(selectinload(cls.user), selectinload(cls.tags))
+            return [selectinload(cls.user), selectinload(cls.tags)]
         elif load_type == "joined":
-            query = query.options(joinedload(cls.user), joinedload(cls.tags))
+            return [joinedload(cls.user), joinedload(cls.tags)]
+        elif load_type == "auto":
+            return cls._get_load_options("auto", schema)
+        return []
 
+    @classmethod
+    async def execute_query(cls, db: AsyncSession, query, load_type: str = "selectin", schema=None):
+        query = query.options(*cls._list_load_options(load_type, schema))
         result = await db.execute(query)
-        return result.scalars().all()
+        return result.unique().scalars().all()
+
+    @classmethod
+    def list_visible_statement(
+        cls,
+        current_user_role: Role,
+        user_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100,
+        tag_ids: Iterable[int] = (),
+        match: str = "any",
+        after_id: Optional[int] = None,
+        title: Optional[str] = None,
+        load_type: str = "selectin",
+        schema=None,
+    ):
+        """
+        (consulta, parámetros) de `list_visible`. La consulta sale de una
+        plantilla cacheada por forma (rol, filtros presentes, tipo de carga);
+        los valores van como parámetros.
+        """
+        tag_ids = sorted(set(tag_ids))
+        tag_filter = (match, len(tag_ids) if match == "all" else 0) if tag_ids else None
+        query = _visible_post_statement(
+            current_user_role, bool(user_id), title is not None, after_id is not None,
+            title is None, tag_filter, load_type, schema,
+        )
+        params = cls.visible_params(user_id, skip, limit, title=title, after_id=after_id)
+        if tag_filter is not None:
+            params.update(cls.tag_params(tag_ids, match))
+        return query, params
+
+    @classmethod
+    async def list_visible(
+        cls,
+        db: AsyncSession,
+        current_user_role: Role,
+        user_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100,
+        tag_ids: Iterable[int] = (),
+        match: str = "any",
+        after_id: Optional[int] = None,
+        title: Optional[str] = None,
+        load_type: str = "selectin",
+        schema=None,
+    ):
+        """
+        Posts visibles para el rol, con filtro por tags, cursor y búsqueda por
+        título. Con `title` el resultado no se ordena, como la búsqueda original.
+        """
+        query, params = cls.list_visible_statement(
+            current_user_role, user_id, skip, limit, tag_ids, match, after_id, title, load_type, schema
+        )
+        result = await db.execute(query, params)
+        return result.unique().scalars().all()
     
+    @classmethod
+    async def list_most_viewed(
+        cls,
+        db: AsyncSession,
+        current_user_role: Role,
+        user_id: Optional[int] = None,
+        limit: int = 20,
+        load_type: str = "selectin",
+        schema=None,
+    ):
+        query = cls.apply_visibility_filters(select(cls), cls, current_user_role, user_id)
+        query = query.order_by(cls.view_count.desc(), cls.id.desc()).limit(limit)
+        return await cls.execute_query(db, query, load_type=load_type, schema=schema)
+
+    @classmethod
+    async def add_view_counts(cls, db: AsyncSession, deltas: list[tuple[int, int]]) -> None:
+        """
+        Suma visitas en un único UPDATE ... FROM (VALUES ...). `updated_at` se
+        deja como estaba: una visita no es un cambio del post para la
+        sincronización incremental.
+        """
+        if not deltas:
+            return
+        counts = values(column("post_id", Integer), column("delta", BigInteger), name="view_deltas").data(deltas)
+        try:
+            await db.execute(
+                update(cls)
+                .where(cls.id == counts.c.post_id)
+                .values(view_count=cls.view_count + counts.c.delta, updated_at=cls.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        except SQLAlchemyError:
+            await db.rollback()
+            raise
+
+    @classmethod
+    async def get_tag_ids(cls, db: AsyncSession, post_id: int) -> set[int]:
+        query = select(PostsTags.tag_id).where(PostsTags.post_id == post_id)
+        result = await db.execute(query)
+        return set(result.scalars().all())
+
+    @classmethod
+    async def _write_links(cls, db: AsyncSession, post_id: int, add_ids: set[int], remove_ids: set[int]):
+        # Sentencias Core: no publican en el bus de invalidación, y ningún
+        # caché entre workers guarda enlaces post-tag
+        if remove_ids:
+            await db.execute(
+                delete(PostsTags).where(
+                    PostsTags.post_id == post_id,
+                    PostsTags.tag_id.in_(remove_ids)
+                )
+            )
+        if add_ids:
+            await db.execute(
+                pg_insert(PostsTags)
+                .values([{"post_id": post_id, "tag_id": tag_id} for tag_id in add_ids])
+                .on_conflict_do_nothing()
+            )
+        if add_ids or remove_ids:
+            # Los tags forman parte del post para la sincronización incremental
+            await db.execute(update(cls).where(cls.id == post_id).values(updated_at=func.now()))
+        await db.commit()
+
+    @classmethod
+    async def _link_tags(cls, db: AsyncSession, post, add_ids: set[int], remove_ids: set[int]):
+        """
+        Escribe directamente en posts_tags en lugar de cargar los Tag completos
+        para asignarlos a la relación.
+        """
+        from app.models.tag import Tag
+        from app.models.tag_catalog import tag_catalog
+
+        post_id = post.id
+        try:
+            try:
+                await cls._write_links(db, post_id, add_ids, remove_ids)
+            except IntegrityError:
+                # El catálogo puede no haber visto aún el borrado de un tag: se
+                # descartan los IDs añadidos, se comprueban en la base de datos
+                # y se reintenta una vez solo con los que siguen existiendo
+                await db.rollback()
+                for tag_id in add_ids:
+                    tag_catalog.discard(tag_id)
+                add_ids = await Tag.existing_ids(db, add_ids)
+                await cls._write_links(db, post_id, add_ids, remove_ids)
+                # El rollback caducó el post entero
+                await db.refresh(post)
+        except SQLAlchemyError as e:
+            await db.rollback()
+            raise RuntimeError(f"Error updating tags of {cls.__name__}: {str(e)}")
+
+        # La relación cargada ya no refleja posts_tags
+        db.expire(post, ["tags", "updated_at"])
+        return post
+
     @classmethod
     async def add_tags(cls, db: AsyncSession, post_id: int, tag_ids: list[int]):
         from app.models.tag import Tag
-        
-        post = await cls.get_by_id(db, post_id, load_type="selectin")
+
+        post = await cls.get_by_id(db, post_id)
         if not post:
             return None
-        
+
         if not tag_ids:
             return post
-        
-        query = select(Tag).where(Tag.id.in_(tag_ids))
-        result = await db.execute(query)
-        tags = result.scalars().all()
-        
-        existing_tag_ids = {tag.id for tag in post.tags}
-        new_tags = [tag for tag in tags if tag.id not in existing_tag_ids]
-        
-        if new_tags:
-            post.tags.extend(new_tags)
-            await db.commit()
-            await db.refresh(post)
-        
-        return post
+
+        valid_ids = await Tag.existing_ids(db, tag_ids)
+        current_ids = await cls.get_tag_ids(db, post_id)
+        return await cls._link_tags(db, post, valid_ids - current_ids, set())
 
     @classmethod
     async def remove_tags(cls, db: AsyncSession, post_id: int, tag_ids: list[int]):
-        post = await cls.get_by_id(db, post_id, load_type="selectin")
+        post = await cls.get_by_id(db, post_id)
         if not post:
             return None
-        
+
         if not tag_ids:
             return post
-        
-        tag_ids_set = set(tag_ids)
-        post.tags = [tag for tag in post.tags if tag.id not in tag_ids_set]
-        
-        await db.commit()
-        await db.refresh(post)
-        return post
+
+        current_ids = await cls.get_tag_ids(db, post_id)
+        return await cls._link_tags(db, post, set(), current_ids & set(tag_ids))
 
     @classmethod
     async def set_tags(cls, db: AsyncSession, post_id: int, tag_ids: list[int]):
         from app.models.tag import Tag
-        
-        post = await cls.get_by_id(db, post_id, load_type="selectin")
+
+        post = await cls.get_by_id(db, post_id)
         if not post:
             return None
-        
-        if not tag_ids:
-            post.tags = []
-        else:
-            query = select(Tag).where(Tag.id.in_(tag_ids))
-            result = await db.execute(query)
-            post.tags = result.scalars().all()
-        
-        await db.commit()
-        await db.refresh(post)
-        return post
\ No newline at end of file
+
+        valid_ids = await Tag.existing_ids(db, tag_ids) if tag_ids else set()
+        current_ids = await cls.get_tag_ids(db, post_id)
+        return await cls._link_tags(db, post, valid_ids - current_ids, current_ids - valid_ids)
+
+
+@lru_cache(maxsize=None)
+def _visible_post_statement(current_user_role, with_owner, search, after, ordered, tag_filter, load_type, schema):
+    query = Post.visible_statement(current_user_role, with_owner, search=search, after=after, ordered=ordered)
+    if tag_filter is not None:
+        query = Post.filter_by_tags(query, *tag_filter)
+    return query.options(*Post._list_load_options(load_type, schema))
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import ARRAY, BigInteger, Boolean, Column, DateTime, Identity, Integer, String, and_, delete, func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.services import Base
+
+
+class PostChange(Base):
+    """
+    Registro de cambios de posts para el stream de `/posts/changes`. Las filas
+    las escriben los triggers de la migración post_changes (posts y
+    posts_tags), que además las notifican por el canal `post_changes`.
+
+    `is_*` es la visibilidad después del cambio (vacía en los borrados) y
+    `was_*` la de antes (vacía en las altas); con ambas se decide, por
+    usuario, si el cambio es un alta, una modificación o una baja.
+
+    El id se asigna al insertar, no al confirmar: una transacción lenta puede
+    confirmar un id menor que otro ya notificado. `xact_id` es la transacción
+    que escribió la fila y `xact_horizon` el xmin de su snapshot; las
+    transacciones por debajo ya habían terminado, así que sus cambios se
+    notificaron antes que este.
+    """
+    __tablename__ = "post_changes"
+
+    id = Column(BigInteger, Identity(), primary_key=True)
+    post_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)
+    owner_id = Column(Integer, nullable=False)
+    is_visible = Column(Boolean, nullable=True)
+    is_paid = Column(Boolean, nullable=True)
+    is_deleted = Column(Boolean, nullable=True)
+    was_visible = Column(Boolean, nullable=True)
+    was_paid = Column(Boolean, nullable=True)
+    was_deleted = Column(Boolean, nullable=True)
+    fields = Column(ARRAY(String), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    xact_id = Column(BigInteger, server_default=text("(pg_current_xact_id()::text::bigint)"), nullable=False, index=True)
+    xact_horizon = Column(BigInteger, server_default=text("(pg_snapshot_xmin(pg_current_snapshot())::text::bigint)"), nullable=False)
+
+    @classmethod
+    async def since(cls, db: AsyncSession, after_id: int, limit: int) -> list:
+        query = select(cls).where(cls.id > after_id).order_by(cls.id).limit(limit)
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    @classmethod
+    async def replay(cls, db: AsyncSession, after_id: int, limit: int, retention_seconds: float) -> Optional[list]:
+        """
+        Cambios que puede no haber recibido quien ya recibió `after_id`: los
+        posteriores y los de transacciones que seguían abiertas al escribirse
+        `after_id`. Puede repetir alguno ya entregado, nunca saltarse uno.
+        None si `after_id` ya no está o es anterior a la retención: lo
+        pendiente puede haberse purgado.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=retention_seconds)
+        newest = select(func.max(cls.id)).scalar_subquery()
+        query = select(
+            cls.xact_id, cls.xact_horizon, cls.created_at >= cutoff, cls.id == newest
+        ).where(cls.id == after_id)
+        anchor = (await db.execute(query)).first()
+        if anchor is None:
+            return None
+        xact_id, horizon, retained, is_newest = anchor
+        if not (retained or is_newest):
+            return None
+        # Lo de su misma transacción se notificó junto a `after_id` y en orden de id
+        concurrent = and_(cls.xact_id >= horizon, cls.xact_id != xact_id)
+        query = (
+            select(cls)
+            .where(or_(cls.id > after_id, concurrent))
+            .order_by(cls.id)
+            .limit(limit)
+        )
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    @classmethod
+    async def bounds(cls, db: AsyncSession) -> tuple[Optional[int], Optional[int]]:
+        """(id más antiguo conservado, id más reciente); (None, None) si no hay cambios."""
+        result = await db.execute(select(func.min(cls.id), func.max(cls.id)))
+        return tuple(result.one())
+
+    @classmethod
+    async def prune(cls, db: AsyncSession, retention_seconds: float) -> int:
+        """
+        Borra los cambios más antiguos que la retención. El más reciente se
+        conserva siempre para poder distinguir un hueco de un registro vacío,
+        y tampoco se borra nada que `replay` pueda necesitar para reanudar
+        desde una fila conservada (transacciones a partir de su horizonte).
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=retention_seconds)
+        newest = select(func.max(cls.id)).scalar_subquery()
+        horizon = (
+            select(func.min(cls.xact_horizon))
+            .where(or_(cls.created_at >= cutoff, cls.id == newest))
+            .scalar_subquery()
+        )
+        result = await db.execute(delete(cls).where(cls.created_at < cutoff, cls.id < newest, cls.xact_id < horizon))
+        await db.commit()
+        return result.rowcount
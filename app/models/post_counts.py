@@ -0,0 +1,75 @@
+from typing import Optional
+from sqlalchemy import Column, ForeignKey, Integer, String, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.services import Base
+from app.schemas.user import Role
+
+
+class PostCountsMixin():
+    """
+    Contadores de posts no eliminados por visibilidad. Los mantienen los
+    triggers de la migración post_facet_counts (inserción/borrado en posts_tags
+    y cambios en posts), nunca el código de la aplicación.
+    """
+    __abstract__ = True
+    public_count = Column(Integer, nullable=False, server_default=text("0"))
+    paid_count = Column(Integer, nullable=False, server_default=text("0"))
+    hidden_count = Column(Integer, nullable=False, server_default=text("0"))
+
+    def count_for(self, current_user_role: Role) -> int:
+        """Posts que vería el rol en un listado (sin contar los privados propios)."""
+        if current_user_role == Role.ADMIN:
+            return self.public_count + self.paid_count + self.hidden_count
+        return self.public_count + self.paid_count
+
+    @classmethod
+    async def get_all_counts(cls, db: AsyncSession) -> list:
+        result = await db.execute(select(cls))
+        return result.scalars().all()
+
+
+    def as_facet(self, current_user_role: Role) -> dict:
+        # El desglose de privados solo tiene sentido para quien puede verlos
+        return {
+            "count": self.count_for(current_user_role),
+            "public_count": self.public_count,
+            "paid_count": self.paid_count,
+            "hidden_count": self.hidden_count if current_user_role == Role.ADMIN else None,
+        }
+
+
+class TagPostCount(Base, PostCountsMixin):
+    __tablename__ = "tag_post_counts"
+
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+
+    @classmethod
+    async def tag_facets(cls, db: AsyncSession, current_user_role: Role, user_id: Optional[int] = None) -> list[dict]:
+        """Un elemento por tag visible para el usuario, ordenados por número de posts."""
+        from app.models.tag import Tag
+
+        counts = {row.tag_id: row for row in await cls.get_all_counts(db)}
+        tags = await Tag.list_visible(db, current_user_role, user_id, limit=None)
+        empty = cls(tag_id=0, public_count=0, paid_count=0, hidden_count=0)
+        facets = [
+            {"tag_id": tag.id, "title": tag.title, **counts.get(tag.id, empty).as_facet(current_user_role)}
+            for tag in tags
+        ]
+        facets.sort(key=lambda facet: (-facet["count"], facet["title"]))
+        return facets
+
+
+class CategoryPostCount(Base, PostCountsMixin):
+    __tablename__ = "category_post_counts"
+
+    category = Column(String, primary_key=True)
+
+    @classmethod
+    async def category_facets(cls, db: AsyncSession, current_user_role: Role) -> list[dict]:
+        facets = [
+            {"category": row.category, **row.as_facet(current_user_role)}
+            for row in await cls.get_all_counts(db)
+        ]
+        facets = [facet for facet in facets if facet["count"] > 0]
+        facets.sort(key=lambda facet: (-facet["count"], facet["category"]))
+        return facets
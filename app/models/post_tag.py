@@ -1,8 +1,12 @@
-from sqlalchemy import Column, ForeignKey, Integer
+from sqlalchemy import Column, ForeignKey, Integer, Index
 from app.db.services import Base
 
 class PostsTags(Base):
     __tablename__ = "posts_tags"
+    # La PK (post_id, tag_id) sirve para "tags de un post"; este índice, para "posts de un tag"
+    __table_args__ = (
+        Index("ix_posts_tags_tag_id_post_id", "tag_id", "post_id"),
+    )
 
     post_id = Column(Integer, ForeignKey("posts.id"), primary_key=True)
     tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
\ No newline at end of file
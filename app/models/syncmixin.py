@@ -0,0 +1,107 @@
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.user import Role
+
+Watermark = Tuple[datetime, int]
+
+
+def encode_watermark(watermark: Optional[Watermark], initial: bool = False) -> Optional[str]:
+    """
+    Marca de agua opaca para la URL: base64 de "updated_at|id", con "|i" si
+    la carga inicial aún no ha terminado.
+    """
+    if watermark is None:
+        return None
+    updated_at, id = watermark
+    raw = f"{updated_at.isoformat()}|{id}" + ("|i" if initial else "")
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_watermark(token: str) -> Tuple[Watermark, bool]:
+    """Inversa de `encode_watermark`: (marca, carga inicial); ValueError si no es válida."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        updated_at, id, *flags = raw.split("|")
+        watermark = (datetime.fromisoformat(updated_at), int(id))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid watermark: {token!r}") from e
+    if watermark[0].tzinfo is None or flags not in ([], ["i"]):
+        raise ValueError(f"Invalid watermark: {token!r}")
+    return watermark, flags == ["i"]
+
+
+@dataclass
+class SyncPage:
+    items: List[Any] = field(default_factory=list)
+    tombstones: List[Any] = field(default_factory=list)
+    watermark: Optional[Watermark] = None
+    has_more: bool = False
+    initial: bool = False
+
+
+class SyncMixin():
+    """
+    Sincronización incremental por `updated_at`, para modelos con
+    TimestampMixin y VisibilityMixin.
+
+    Las filas se recorren en orden (updated_at, id), con índice sobre ambas
+    columnas. En la carga inicial solo se recorren las visibles; después, todas
+    las cambiadas, porque una fila que se oculta o pasa a ser de pago sigue
+    viva pero el cliente debe eliminarla. Las que el usuario no puede ver
+    salen como borrado solo con su id y su marca, también si nunca las vio: el
+    cliente ignora los ids que no tiene. La marca de agua que se devuelve es
+    la de la última fila, salvo al llegar al final: entonces no pasa de
+    `now() - overlap`, porque `updated_at` se fija al inicio de la
+    transacción y una transacción en curso puede confirmar filas con una
+    marca anterior a las ya devueltas.
+    Las filas de esa ventana se repiten en la siguiente sincronización.
+    """
+
+    @classmethod
+    async def changed_since(
+        cls,
+        db: AsyncSession,
+        current_user_role: Role,
+        user_id: Optional[int],
+        since: Optional[Watermark],
+        limit: int,
+        overlap_seconds: float = 5.0,
+        options: tuple = (),
+        initial: bool = False,
+    ) -> SyncPage:
+        """
+        Filas cambiadas después de `since`. Las que el usuario puede ver van
+        en `items`; las borradas o que ya no puede ver, en `tombstones` (solo
+        se usan su id y su updated_at). Sin `since`, y en las páginas
+        siguientes de esa carga (`initial`), solo hay filas visibles.
+        """
+        initial = initial or since is None
+        query = select(cls, func.now()).options(*options).order_by(cls.updated_at, cls.id).limit(limit + 1)
+        if initial:
+            query = cls.apply_visibility_filters(query, cls, current_user_role, user_id)
+            query = query.where(cls.is_deleted.is_not(True), cls.updated_at.is_not(None))
+        if since is not None:
+            query = query.where(tuple_(cls.updated_at, cls.id) > tuple_(*since))
+        rows = (await db.execute(query)).all()
+
+        page = SyncPage(has_more=len(rows) > limit, watermark=since)
+        page.initial = initial and page.has_more
+        rows = rows[:limit]
+        for row, _ in rows:
+            if row.is_deleted or not cls.matches_visibility(row, current_user_role, user_id):
+                page.tombstones.append(row)
+            else:
+                page.items.append(row)
+        if rows:
+            last, now = rows[-1]
+            page.watermark = (last.updated_at, last.id)
+            if not page.has_more:
+                settled = (now - timedelta(seconds=overlap_seconds), 0)
+                page.watermark = min(page.watermark, settled)
+                if since is not None:
+                    page.watermark = max(page.watermark, since)
+        return page
@@ -1,28 +1,87 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, select
+from typing import Iterable, Optional
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import relationship
+from app.core.invalidation import invalidation_bus
 from app.db.services import Base
+from app.models.tag_catalog import CachedTag, tag_catalog
 from app.models.crud import CRUDBase
+from app.models.syncmixin import SyncMixin
 from app.models.timestampmixin import TimestampMixin
 from app.models.visibilitymixin import VisibilityMixin
+from app.schemas.user import Role
 
-class Tag(Base, CRUDBase, TimestampMixin, VisibilityMixin):
+@invalidation_bus.track
+class Tag(Base, CRUDBase, TimestampMixin, VisibilityMixin, SyncMixin):
     __tablename__ = "tags"
+    __table_args__ = (
+        Index("ix_tags_updated_at_id", "updated_at", "id"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String, unique=True, nullable=False)
     description = Column(String, nullable=True)
-    
+
     posts = relationship("Post", secondary="posts_tags", back_populates="tags", uselist=True)
-    
+
     @classmethod
     async def search_by_title(cls, db: AsyncSession, title: str):
         query = select(cls).where(cls.title.ilike(f"%{title}%"))
         result = await db.execute(query)
         return result.scalars().all()
-    
+
     @classmethod
     async def get_by_title(cls, db: AsyncSession, title: str):
-        query = select(cls).where(cls.title == title)
-        result = await db.execute(query)
-        return result.scalars().first()
\ No newline at end of file
+        return await cls.get_one_by(db, "title", title)
+
+    @classmethod
+    async def get_cached_by_id(cls, db: AsyncSession, tag_id: int) -> Optional[CachedTag]:
+        cached = tag_catalog.get(tag_id)
+        if cached is not None:
+            return cached
+        tag = await cls.get_by_id(db, tag_id)
+        return tag_catalog.put(tag) if tag else None
+
+    @classmethod
+    async def get_cached_by_title(cls, db: AsyncSession, title: str) -> Optional[CachedTag]:
+        cached = tag_catalog.get_by_title(title)
+        if cached is not None:
+            return cached
+        tag = await cls.get_by_title(db, title)
+        return tag_catalog.put(tag) if tag else None
+
+    @classmethod
+    async def existing_ids(cls, db: AsyncSession, tag_ids: Iterable[int]) -> set[int]:
+        """Devuelve los IDs que existen; solo consulta la base de datos por los que no están en el catálogo."""
+        wanted = set(tag_ids)
+        found = tag_catalog.existing_ids(wanted)
+        missing = wanted - found
+        if missing:
+            result = await db.execute(select(cls).where(cls.id.in_(missing)))
+            for tag in result.scalars():
+                tag_catalog.put(tag)
+                found.add(tag.id)
+        return found
+
+    @classmethod
+    async def list_visible(
+        cls,
+        db: AsyncSession,
+        current_user_role: Role,
+        user_id: Optional[int] = None,
+        skip: int = 0,
+        limit: Optional[int] = 100,
+    ):
+        if tag_catalog.ready:
+            return tag_catalog.list_visible(current_user_role, user_id, skip=skip, limit=limit)
+
+        query = cls.visible_statement(current_user_role, bool(user_id))
+        result = await db.execute(query, cls.visible_params(user_id, skip, limit))
+        return result.scalars().all()
+
+    @classmethod
+    def _after_write(cls, instance, deleted: bool = False) -> None:
+        if deleted:
+            tag_catalog.discard(instance.id)
+        else:
+            tag_catalog.put(instance)
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.visibilitymixin import VisibilityMixin
+from app.schemas.user import Role
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedTag:
+    """Copia inmutable de una fila de `tags` servida desde el catálogo."""
+    id: int
+    owner_id: int
+    title: str
+    description: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    is_deleted: bool
+    is_visible: bool
+    is_paid: bool
+
+    # Mismas reglas de permisos que el modelo ORM
+    has_permission = VisibilityMixin.has_permission
+    is_owner = VisibilityMixin.is_owner
+
+    @classmethod
+    def from_row(cls, tag) -> "CachedTag":
+        return cls(
+            id=tag.id,
+            owner_id=tag.owner_id,
+            title=tag.title,
+            description=tag.description,
+            created_at=tag.created_at,
+            updated_at=tag.updated_at,
+            is_deleted=bool(tag.is_deleted),
+            is_visible=bool(tag.is_visible),
+            is_paid=bool(tag.is_paid),
+        )
+
+
+class TagCatalog:
+    """
+    Catálogo de tags en memoria por worker (id -> fila, título -> id).
+
+    Se carga completo al arrancar y después se refresca de forma incremental
+    usando `updated_at` como marca de agua. Si la tabla supera `max_entries`
+    el catálogo se desactiva y todas las lecturas vuelven a la base de datos.
+    Los fallos de búsqueda también consultan la base de datos, así que un tag
+    creado en otro worker nunca se pierde aunque el refresco aún no haya llegado.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        refresh_seconds: float,
+        overlap_seconds: float = 5.0,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._by_id: dict[int, CachedTag] = {}
+        self._by_title: dict[str, int] = {}
+        self._watermark: Optional[datetime] = None
+        self._loaded = False
+        self._overflow = False
+        self._task: Optional[asyncio.Task] = None
+        self._session_factory: Optional[Callable] = None
+
+    @property
+    def ready(self) -> bool:
+        """True si el catálogo está completo y puede responder listados."""
+        return self._loaded and not self._overflow
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    # Lecturas
+
+    def get(self, tag_id: int) -> Optional[CachedTag]:
+        return self._by_id.get(tag_id)
+
+    def get_by_title(self, title: str) -> Optional[CachedTag]:
+        tag_id = self._by_title.get(title)
+        return self._by_id.get(tag_id) if tag_id is not None else None
+
+    def existing_ids(self, tag_ids: Iterable[int]) -> set[int]:
+        return {tag_id for tag_id in tag_ids if tag_id in self._by_id}
+
+    def list_visible(
+        self,
+        current_user_role: Role = Role.FREE_USER,
+        user_id: Optional[int] = None,
+        skip: int = 0,
+        limit: Optional[int] = 100,
+    ) -> List[CachedTag]:
+        """Mismo resultado que `apply_visibility_filters` sobre `tags`, ordenado por id."""
+        visible = [
+            tag for tag in self._by_id.values()
+            if VisibilityMixin.matches_visibility(tag, current_user_role, user_id)
+        ]
+        visible.sort(key=lambda tag: tag.id)
+        return visible[skip:] if limit is None else visible[skip:skip + limit]
+
+    # Escrituras locales
+
+    def put(self, tag) -> CachedTag:
+        cached = tag if isinstance(tag, CachedTag) else CachedTag.from_row(tag)
+        if not self.enabled or self._overflow:
+            return cached
+        if cached.id not in self._by_id and len(self._by_id) >= self.max_entries:
+            self._set_overflow()
+            return cached
+
+        previous = self._by_id.get(cached.id)
+        if previous is not None and previous.title != cached.title:
+            self._by_title.pop(previous.title, None)
+        self._by_id[cached.id] = cached
+        self._by_title[cached.title] = cached.id
+        if cached.updated_at and (self._watermark is None or cached.updated_at > self._watermark):
+            self._watermark = cached.updated_at
+        return cached
+
+    def discard(self, tag_id: int) -> None:
+        previous = self._by_id.pop(tag_id, None)
+        if previous is not None:
+            self._by_title.pop(previous.title, None)
+
+    def clear(self) -> None:
+        self._by_id = {}
+        self._by_title = {}
+        self._watermark = None
+        self._loaded = False
+
+    def _set_overflow(self) -> None:
+        logger.warning(
+            "Tag catalog exceeded %s entries; falling back to the database",
+            self.max_entries,
+        )
+        self.clear()
+        self._overflow = True
+
+    # Carga y refresco
+
+    async def load(self, db: AsyncSession) -> None:
+        """Carga completa; si la tabla es demasiado grande deja el catálogo desactivado."""
+        from app.models.tag import Tag
+
+        total = (await db.execute(select(func.count()).select_from(Tag))).scalar_one()
+        if total > self.max_entries:
+            if not self._overflow:
+                self._set_overflow()
+            return
+
+        result = await db.execute(select(Tag))
+        by_id: dict[int, CachedTag] = {}
+        watermark: Optional[datetime] = None
+        for row in result.scalars():
+            cached = CachedTag.from_row(row)
+            by_id[cached.id] = cached
+            if cached.updated_at and (watermark is None or cached.updated_at > watermark):
+                watermark = cached.updated_at
+
+        self._by_id = by_id
+        self._by_title = {tag.title: tag.id for tag in by_id.values()}
+        self._watermark = watermark
+        self._overflow = False
+        self._loaded = True
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """
+        Trae solo las filas modificadas desde la marca de agua. Se solapa
+        `overlap` segundos hacia atrás porque `updated_at` se fija al inicio
+        de la transacción y un commit lento puede quedar por detrás.
+        """
+        from app.models.tag import Tag
+
+        if not self.ready:
+            await self.load(db)
+            return
+        if self._watermark is None:
+            query = select(Tag)
+        else:
+            query = select(Tag).where(Tag.updated_at >= self._watermark - self.overlap)
+        result = await db.execute(query)
+        for row in result.scalars():
+            self.put(row)
+            if self._overflow:
+                return
+
+    async def invalidate(self, tag_ids: Iterable[int]) -> None:
+        """
+        Relee de la base de datos los tags que otro worker ha cambiado (aviso
+        del bus de invalidación). Los que ya no existen salen del catálogo.
+        """
+        from app.models.tag import Tag
+
+        if not self.ready or self._session_factory is None:
+            return
+        wanted = set(tag_ids)
+        async with self._session_factory() as db:
+            result = await db.execute(select(Tag).where(Tag.id.in_(wanted)))
+            found = {row.id: row for row in result.scalars()}
+        for tag_id in wanted - found.keys():
+            self.discard(tag_id)
+        for row in found.values():
+            self.put(row)
+
+    async def reload(self) -> None:
+        """Recarga completa, cuando pudieron perderse avisos de invalidación."""
+        if not self.enabled or self._session_factory is None:
+            return
+        async with self._session_factory() as db:
+            await self.load(db)
+
+    async def start(self, session_factory: Callable) -> None:
+        """Carga inicial y programación del refresco periódico en segundo plano."""
+        if not self.enabled or self._task is not None:
+            return
+        self._session_factory = session_factory
+        try:
+            async with session_factory() as db:
+                await self.load(db)
+        except Exception:
+            # Sin base de datos al arrancar: se reintenta en el siguiente ciclo
+            logger.exception("Tag catalog initial load failed")
+        self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, session_factory: Callable) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                async with session_factory() as db:
+                    await self.refresh(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Tag catalog refresh failed")
+
+
+tag_catalog = TagCatalog(
+    max_entries=settings.TAG_CATALOG_MAX_ENTRIES,
+    refresh_seconds=settings.TAG_CATALOG_REFRESH_SECONDS,
+    overlap_seconds=settings.TAG_CATALOG_OVERLAP_SECONDS,
+    enabled=settings.TAG_CATALOG_ENABLED,
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, select, Text, ForeignKey
+from sqlalchemy import Column, String, Integer, Text, ForeignKey
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import Enum
@@ -23,9 +23,7 @@ class User(Base, CRUDBase, TimestampMixin):
 
     @classmethod
     async def get_by_email(cls, db: AsyncSession, email: str):
-        query = select(cls).where(cls.email == email)
-        result = await db.execute(query)
-        return result.scalar_one_or_none()
+        return await cls.get_one_by(db, "email", email)
 
 class UserProfile(Base, CRUDBase, TimestampMixin):
     __tablename__ = "user_profiles"
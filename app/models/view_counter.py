@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from typing import Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+view_counter_pending = registry.gauge(
+    "post_view_counter_pending",
+    "Posts with buffered views not yet written to the database.",
+)
+view_counter_flushed_total = registry.counter(
+    "post_view_counter_flushed_total",
+    "Post views written to the database by the view counter buffer.",
+)
+view_counter_dropped_total = registry.counter(
+    "post_view_counter_dropped_total",
+    "Post views discarded because the buffer was full or a flush failed.",
+)
+
+
+class ViewCounterBuffer:
+    """
+    Contador de visitas de posts con escritura diferida, por worker.
+
+    Las lecturas solo suman en memoria (`increment`); una tarea en segundo
+    plano vuelca cada `flush_seconds` los incrementos agregados por post con
+    un único UPDATE ... FROM (VALUES ...) por lote, así que un post muy leído
+    cuesta una escritura por intervalo y no una por visita. Como mucho se
+    guardan `max_entries` posts distintos: al llenarse se adelanta el volcado
+    y las visitas a posts nuevos se descartan hasta que termine. Al apagar se
+    vuelca lo pendiente.
+    """
+
+    def __init__(
+        self,
+        flush_seconds: float,
+        max_entries: int,
+        batch_size: int = 1000,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.flush_seconds = flush_seconds
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self._pending: Dict[int, int] = {}
+        self._session_factory: Optional[Callable] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def increment(self, post_id: int) -> None:
+        if not self.enabled:
+            return
+        if post_id not in self._pending and len(self._pending) >= self.max_entries:
+            view_counter_dropped_total.inc()
+            if self._wakeup is not None:
+                self._wakeup.set()
+            return
+        self._pending[post_id] = self._pending.get(post_id, 0) + 1
+        view_counter_pending.set((), len(self._pending))
+
+    async def flush(self) -> int:
+        """Escribe los incrementos pendientes; devuelve las visitas volcadas."""
+        from app.models.post import Post
+
+        if not self._pending or self._session_factory is None:
+            return 0
+        pending, self._pending = self._pending, {}
+        view_counter_pending.set((), 0)
+        # Mismo orden de bloqueo en todos los workers: sin interbloqueos entre volcados
+        items = sorted(pending.items())
+        written = 0
+        try:
+            async with self._session_factory() as db:
+                for start in range(0, len(items), self.batch_size):
+                    batch = items[start:start + self.batch_size]
+                    await Post.add_view_counts(db, batch)
+                    written = start + len(batch)
+        except Exception:
+            logger.exception("Flushing post view counts failed")
+            # Cada lote confirma por separado: solo vuelven los que no llegaron a escribirse
+            self._restore(items[written:])
+            raise
+        flushed = sum(delta for _, delta in items)
+        view_counter_flushed_total.inc(amount=flushed)
+        return flushed
+
+    def _restore(self, items) -> None:
+        for post_id, delta in items:
+            if post_id in self._pending or len(self._pending) < self.max_entries:
+                self._pending[post_id] = self._pending.get(post_id, 0) + delta
+            else:
+                view_counter_dropped_total.inc(amount=delta)
+        view_counter_pending.set((), len(self._pending))
+
+    async def start(self, session_factory: Callable) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        self._session_factory = session_factory
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Último volcado; no se cancela a mitad de un lote para no perder visitas."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        if self._pending:
+            logger.error("Lost %d buffered post views at shutdown", sum(self._pending.values()))
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Lo pendiente ya se ha devuelto al buffer; se reintenta en el siguiente ciclo
+                pass
+
+
+view_counter = ViewCounterBuffer(
+    flush_seconds=settings.VIEW_COUNTER_FLUSH_SECONDS,
+    max_entries=settings.VIEW_COUNTER_MAX_ENTRIES,
+    batch_size=settings.VIEW_COUNTER_BATCH_SIZE,
+    enabled=settings.VIEW_COUNTER_ENABLED,
+)
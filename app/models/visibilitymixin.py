@@ -1,5 +1,6 @@
+from functools import lru_cache
 from typing import Any, Dict, Optional, Type, TypeVar
-from sqlalchemy import Column, Boolean, text, and_
+from sqlalchemy import Column, Boolean, bindparam, select, text, and_
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.expression import or_
@@ -31,29 +32,101 @@ class VisibilityMixin():
         Aplica los filtros de visibilidad a una consulta basada en el rol del usuario.
         model_cls: La clase concreta (Post, Tag, etc.) que tiene las columnas owner_id, is_visible, etc.
         """
+        return query.filter(*cls._visibility_conditions(model_cls, current_user_role, user_id if user_id else None))
+
+    @classmethod
+    def visibility_criteria(cls, model_cls, current_user_role: Role, with_owner: bool):
+        """
+        Mismos filtros que `apply_visibility_filters` para plantillas de
+        consulta cacheadas: el id del usuario va como parámetro
+        `visibility_user_id` en lugar de como literal.
+        """
+        owner = bindparam("visibility_user_id") if with_owner else None
+        return cls._visibility_conditions(model_cls, current_user_role, owner)
+
+    @classmethod
+    def visible_statement(
+        cls,
+        current_user_role: Role,
+        with_owner: bool,
+        search: bool = False,
+        after: bool = False,
+        ordered: bool = True,
+    ):
+        """
+        Plantilla cacheada del listado de recursos visibles para un rol, con
+        búsqueda por título (`title_pattern`), cursor (`after_id`) y paginación
+        (`skip`, `limit`) como parámetros. Los valores se obtienen con
+        `visible_params`.
+        """
+        return _visible_statement(cls, current_user_role, with_owner, search, after, ordered)
+
+    @staticmethod
+    def visible_params(
+        user_id: Optional[int],
+        skip: int = 0,
+        limit: Optional[int] = 100,
+        title: Optional[str] = None,
+        after_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"skip": skip, "limit": limit}
+        if user_id:
+            params["visibility_user_id"] = user_id
+        if title is not None:
+            params["title_pattern"] = f"%{title}%"
+        if after_id is not None:
+            params["after_id"] = after_id
+        return params
+
+    @staticmethod
+    def _visibility_conditions(model_cls, current_user_role: Role, owner) -> list:
         # Los administradores ven todo (excepto eliminados)
         if current_user_role == Role.ADMIN:
-            return query.filter(model_cls.is_deleted == False)
-        
+            return [model_cls.is_deleted == False]
+
         # Usuarios autenticados
         if current_user_role in [Role.FREE_USER, Role.PAID_USER]:
-            owner_condition = model_cls.owner_id == user_id if user_id else None
+            owner_condition = model_cls.owner_id == owner if owner is not None else None
             public_condition = (model_cls.is_visible == True) & (model_cls.is_deleted == False)
             if current_user_role == Role.PAID_USER:
                 paid_condition = (model_cls.is_visible == True) & (model_cls.is_paid == True) & (model_cls.is_deleted == False)
                 conditions = [c for c in [owner_condition, public_condition, paid_condition] if c is not None]
-                return query.filter(or_(*conditions))
+                return [or_(*conditions)]
             # Usuario gratuito
             conditions = [c for c in [owner_condition, public_condition] if c is not None]
-            return query.filter(or_(*conditions))
-        
+            return [or_(*conditions)]
+
         # No autenticados
-        return query.filter(
+        return [
             model_cls.is_visible == True,
             model_cls.is_paid == False,
             model_cls.is_deleted == False
-        )
-    
+        ]
+
+    @classmethod
+    def matches_visibility(cls, resource, current_user_role: Role = Role.FREE_USER, user_id: Optional[int] = None) -> bool:
+        """
+        Equivalente en Python de apply_visibility_filters para recursos ya cargados
+        en memoria (por ejemplo, el catálogo de tags).
+
+        Args:
+            resource: Objeto con owner_id, is_visible, is_paid e is_deleted
+            current_user_role: Rol del usuario actual
+            user_id: ID del usuario actual (opcional)
+
+        Returns:
+            bool: True si la consulta filtrada incluiría el recurso
+        """
+        if current_user_role == Role.ADMIN:
+            return not resource.is_deleted
+
+        if current_user_role in [Role.FREE_USER, Role.PAID_USER]:
+            if user_id and resource.owner_id == user_id:
+                return True
+            return bool(resource.is_visible) and not resource.is_deleted
+
+        return bool(resource.is_visible) and not resource.is_paid and not resource.is_deleted
+
     def has_permission(self, current_user_role: Role, user_id: Optional[int] = None) -> bool:
         """
         Verifica si el usuario actual tiene permiso para ver/editar este recurso.
@@ -230,4 +303,16 @@ class VisibilityMixin():
         resource.verify_ownership(current_user_id,
             f"Solo el propietario puede restaurar este {cls.__name__.lower()}")
         
-        return await cls.restore(db, resource_id)
\ No newline at end of file
+        return await cls.restore(db, resource_id)
+
+
+@lru_cache(maxsize=None)
+def _visible_statement(model_cls, current_user_role: Role, with_owner: bool, search: bool, after: bool, ordered: bool):
+    query = select(model_cls).where(*VisibilityMixin.visibility_criteria(model_cls, current_user_role, with_owner))
+    if search:
+        query = query.where(model_cls.title.ilike(bindparam("title_pattern")))
+    if after:
+        query = query.where(model_cls.id > bindparam("after_id"))
+    if ordered:
+        query = query.order_by(model_cls.id)
+    return query.offset(bindparam("skip", type_=Integer)).limit(bindparam("limit", type_=Integer))
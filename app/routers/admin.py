@@ -1,11 +1,15 @@
 from typing import List
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 
 from app.models.user import User
 from app.schemas.user import UserPublic, UserRoleUpdate
+from app.schemas.admin import CompressionStatsPublic, SlowQuery
+from app.core.compression import compression_stats
+from app.core.slow_queries import slow_query_log
 from app.core.deps import sessionDep, adminDep
+from app.core.wire_formats import NegotiatedRoute
 
-router = APIRouter(prefix="/admin", tags=["admin"])
+router = APIRouter(prefix="/admin", tags=["admin"], route_class=NegotiatedRoute)
 
 
 
@@ -102,3 +106,44 @@ async def delete_user(
         )
     
     await User.delete(db, user_id)
+
+
+
+@router.get(
+    "/compression-stats",
+    response_model=CompressionStatsPublic,
+    summary="Estadísticas de compresión de respuestas",
+    description=(
+        "Devuelve los bytes originales, enviados y ahorrados por codificación en este worker, "
+        "y cuántas respuestas se enviaron sin comprimir y por qué."
+    ),
+)
+async def get_compression_stats(
+    admin_user: adminDep,
+):
+    return compression_stats.snapshot()
+
+
+
+@router.get(
+    "/slow-queries",
+    response_model=List[SlowQuery],
+    summary="Consultas lentas recientes",
+    description=(
+        "Devuelve las últimas sentencias SQL que superaron el umbral de consulta lenta en este worker, "
+        "con la ruta que las originó y, si se muestrearon, el resumen de su `EXPLAIN` "
+        "(incluidas las tablas leídas con Seq Scan)."
+    ),
+)
+async def list_slow_queries(
+    admin_user: adminDep,
+    limit: int = Query(50, ge=1, le=500),
+    include_plan: bool = Query(False, description="Incluir el plan completo en JSON."),
+):
+    entries = slow_query_log.recent(limit)
+    if include_plan:
+        return entries
+    return [
+        {**entry, "explain": {k: v for k, v in entry["explain"].items() if k != "plan"}} if entry["explain"] else entry
+        for entry in entries
+    ]
@@ -3,17 +3,18 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from app.core.config import settings
 from app.core.deps import sessionDep, currentUserDep, get_current_active_user
 from app.models.user import User as UserModel
 from app.schemas.user import Role, UserCreate, UserPublic, Token, TokenData
 from app.core.security import verify_password,get_password_hash
+from app.core.instrumentation import InstrumentedRoute
+from app.core.admission import admission_class
 
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=InstrumentedRoute)
 
 
 
@@ -53,8 +54,7 @@ async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Token:
     # Get user from database
-    result = await db.execute(select(UserModel).filter(UserModel.email == form_data.username))
-    user = result.scalars().first()
+    user = await UserModel.get_by_email(db, form_data.username)
     
     # Verify user exists and password is correct
     if not user or not verify_password(form_data.password, user.password_hash):
@@ -77,6 +77,7 @@ async def login_for_access_token(
     }
 
 @router.get("/me", response_model=UserPublic)
+@admission_class("read")
 async def read_users_me(
     current_user: currentUserDep
 ) -> UserModel:
@@ -1,21 +1,39 @@
-from typing import List, Literal, Union
-from fastapi import APIRouter, Depends, HTTPException, Query, status,Request
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status,Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
 from app.models.post import Post
+from app.models.post_counts import CategoryPostCount, TagPostCount
+from app.models.syncmixin import decode_watermark, encode_watermark
+from app.models.view_counter import view_counter
 from app.schemas.post import (
     PostCreate,
     PostUpdate,
     PostPublic,
     PostPublicExtended,
-    PostTagsUpdate
+    PostTagsUpdate,
+    PostFacets,
+    PostListNormalized,
+    PostNormalized,
+    PostSync,
+    list_load_type,
+    render_posts
 )
+from app.schemas.sync import Tombstone
 from app.schemas.user import Role
-from app.core.deps import sessionDep, currentUserDep, adminDep
+from app.core.admission import admission_class
+from app.core.change_feed import post_change_feed
+from app.core.compression import no_compression
+from app.core.config import settings
+from app.core.deps import sessionDep, currentUserDep, adminDep, responseFormatDep
 from app.core.rate_limiting import limiter
-from app.models.visibilitymixin import VisibilityMixin
+from app.core.wire_formats import NegotiatedRoute
 
-router = APIRouter(prefix="/posts", tags=["posts"])
+router = APIRouter(prefix="/posts", tags=["posts"], route_class=NegotiatedRoute)
+
+MAX_FILTER_TAGS = 20
 
 
 
@@ -27,14 +45,14 @@ router = APIRouter(prefix="/posts", tags=["posts"])
     description=(
         "Crea un nuevo post asociado al usuario autenticado. "
         "Si el título ya existe, devuelve un error 400. "
-        "Puedes definir el tipo de carga (`lazy`, `selectin`, `joined`)."
+        "Puedes definir el tipo de carga (`lazy`, `selectin`, `joined`, `auto`)."
     ),
 )
 async def create_post(
     post_in: PostCreate,
     db: sessionDep,
     current_user: currentUserDep,
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin")
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin")
 ):
     existing = await Post.get_by_title(db, post_in.title)
     if existing:
@@ -49,7 +67,7 @@ async def create_post(
     if post_in.tag_ids:
         await Post.set_tags(db, db_post.id, post_in.tag_ids)
     
-    db_post_loaded = await Post.get_by_id(db, db_post.id, load_type=load_type)
+    db_post_loaded = await Post.get_by_id(db, db_post.id, load_type=load_type, schema=PostPublicExtended)
 
     if load_type == "lazy":
         return PostPublic.model_validate(db_post_loaded, from_attributes=True)
@@ -59,25 +77,142 @@ async def create_post(
 
 @router.get(
     "/deleted",
-    response_model=List[Union[PostPublic, PostPublicExtended]],
+    response_model=Union[List[Union[PostPublic, PostPublicExtended]], PostListNormalized],
     summary="Listar posts eliminados (solo admin)",
     description="Devuelve una lista de los posts que han sido eliminados (soft delete). Solo accesible para administradores."
 )
 async def list_deleted_posts(
     db: sessionDep,
     admin_user: adminDep,
+    response_format: responseFormatDep,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=100),
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
     query = select(Post).where(Post.is_deleted == True)
     query = query.offset(skip).limit(limit)
     
-    posts = await Post.execute_query(db, query, load_type=load_type)
+    load_type = list_load_type(response_format, load_type)
+    posts = await Post.execute_query(db, query, load_type=load_type, schema=PostPublicExtended)
     
-    if load_type == "lazy":
-        return [PostPublic.model_validate(p, from_attributes=True) for p in posts]
-    return [PostPublicExtended.model_validate(p, from_attributes=True) for p in posts]
+    return render_posts(posts, response_format, load_type)
+
+
+@router.get(
+    "/facets",
+    response_model=PostFacets,
+    summary="Facetas de posts por tag y categoría",
+    description=(
+        "Devuelve el número de posts por tag y por categoría visibles para el rol del usuario. "
+        "Los contadores se mantienen de forma incremental en la base de datos."
+    ),
+)
+async def post_facets(
+    db: sessionDep,
+    current_user: currentUserDep,
+):
+    return PostFacets(
+        tags=await TagPostCount.tag_facets(db, current_user.role, current_user.id),
+        categories=await CategoryPostCount.category_facets(db, current_user.role),
+    )
+
+
+@router.get(
+    "/most-viewed",
+    response_model=Union[List[Union[PostPublic, PostPublicExtended]], PostListNormalized],
+    summary="Posts más vistos",
+    description=(
+        "Devuelve los posts visibles para el usuario ordenados por número de visitas. "
+        "Los contadores se escriben en diferido, así que pueden ir unos segundos por detrás."
+    ),
+)
+async def most_viewed_posts(
+    db: sessionDep,
+    current_user: currentUserDep,
+    response_format: responseFormatDep,
+    limit: int = Query(20, ge=1, le=100),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
+):
+    load_type = list_load_type(response_format, load_type)
+    posts = await Post.list_most_viewed(
+        db, current_user.role, current_user.id, limit=limit, load_type=load_type, schema=PostPublicExtended
+    )
+
+    return render_posts(posts, response_format, load_type)
+
+
+@router.get(
+    "/sync",
+    response_model=PostSync,
+    summary="Sincronización incremental de posts",
+    description=(
+        "Devuelve los posts cambiados desde la marca de agua `since` (sin ella, todos los visibles), "
+        "ordenados por fecha de modificación y con sus tags por ID; cambiar los tags de un post también "
+        "cuenta como modificación. Los borrados o que ya no son visibles llegan en `deleted`. "
+        "Se repite con el `watermark` devuelto mientras `has_more` sea cierto."
+    ),
+)
+async def sync_posts(
+    db: sessionDep,
+    current_user: currentUserDep,
+    since: Optional[str] = Query(None, description="`watermark` de la sincronización anterior"),
+    limit: int = Query(settings.SYNC_PAGE_SIZE, ge=1, le=settings.SYNC_MAX_PAGE_SIZE),
+):
+    try:
+        watermark, initial = decode_watermark(since) if since else (None, False)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid watermark")
+
+    page = await Post.changed_since(
+        db, current_user.role, current_user.id, watermark, limit, settings.SYNC_OVERLAP_SECONDS,
+        options=(selectinload(Post.tags),), initial=initial,
+    )
+    return PostSync(
+        data=[PostNormalized.from_post(post) for post in page.items],
+        deleted=[Tombstone.model_validate(post, from_attributes=True) for post in page.tombstones],
+        watermark=encode_watermark(page.watermark, page.initial),
+        has_more=page.has_more,
+    )
+
+
+@router.get(
+    "/changes/stream",
+    response_class=StreamingResponse,
+    summary="Stream de cambios de posts (SSE)",
+    description=(
+        "Server-Sent Events con las altas, modificaciones y bajas de los posts visibles para el usuario. "
+        "Cada evento `post` lleva `op` (`create`, `update`, `delete`), el `id` del post y, en las "
+        "modificaciones, los campos cambiados (`tags` si cambian sus tags). Para reanudar se envía "
+        "`Last-Event-ID` (o `last_event_id`); si los cambios pendientes ya no están disponibles se recibe "
+        "`reset` y hay que recargar. Los ids no llegan siempre en orden y al reanudar puede repetirse algún "
+        "evento ya recibido. Un cliente que no lee al ritmo de los cambios recibe `overflow` y "
+        "debe reconectar."
+    ),
+)
+@no_compression
+@admission_class("stream")
+async def stream_post_changes(
+    db: sessionDep,
+    current_user: currentUserDep,
+    last_event_id: Optional[int] = Query(None, ge=0, description="Token de reanudación (id del último evento recibido)"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID", include_in_schema=False),
+):
+    if not post_change_feed.enabled:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Change stream is disabled")
+    if last_event_id_header is not None:
+        try:
+            last_event_id = max(0, int(last_event_id_header))
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Last-Event-ID")
+
+    role, user_id = current_user.role, current_user.id
+    # La sesión de la petición no debe quedarse abierta mientras dure el stream
+    await db.close()
+    return StreamingResponse(
+        post_change_feed.stream(role, user_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get(
@@ -92,9 +227,9 @@ async def read_post(
     post_id: int,
     db: sessionDep,
     current_user: currentUserDep,
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
-    db_post = await Post.get_by_id(db, post_id, load_type=load_type)
+    db_post = await Post.get_by_id(db, post_id, load_type=load_type, schema=PostPublicExtended)
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -107,6 +242,7 @@ async def read_post(
             detail="Insufficient permissions to access this resource"
         )
 
+    view_counter.increment(db_post.id)
     if load_type == "lazy":
         return PostPublic.model_validate(db_post, from_attributes=True)
     return PostPublicExtended.model_validate(db_post, from_attributes=True)
@@ -115,7 +251,7 @@ async def read_post(
 
 @router.get(
     "/search/",
-    response_model=List[Union[PostPublic, PostPublicExtended]],
+    response_model=Union[List[Union[PostPublic, PostPublicExtended]], PostListNormalized],
     summary="Buscar posts por título",
     description=(
         "Permite buscar posts por coincidencia parcial o total en el título. "
@@ -126,37 +262,38 @@ async def read_post(
 async def search_posts(
     db: sessionDep,
     current_user: currentUserDep,
+    response_format: responseFormatDep,
     title: str = Query(..., description="Texto parcial o completo del título a buscar."),
     skip: int = Query(0, ge=0, description="Resultados a omitir."),
     limit: int = Query(50, le=100, description="Resultados máximos a devolver."),
-    load_type: Literal["lazy", "selectin", "joined"] = Query(
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(
         default="selectin",
         description="Tipo de carga de relaciones."
     ),
 ):
-    query = select(Post).where(Post.title.ilike(f"%{title}%"))
-    query = VisibilityMixin.apply_visibility_filters(
-        query,
-        model_cls=Post,
+    load_type = list_load_type(response_format, load_type)
+    posts = await Post.list_visible(
+        db,
         current_user_role=current_user.role,
-        user_id=current_user.id
+        user_id=current_user.id,
+        skip=skip,
+        limit=limit,
+        title=title,
+        load_type=load_type,
+        schema=PostPublicExtended,
     )
-    query = query.offset(skip).limit(limit)
-
-    posts = await Post.execute_query(db, query, load_type=load_type)
 
-    if load_type == "lazy":
-        return [PostPublic.model_validate(p, from_attributes=True) for p in posts]
-    return [PostPublicExtended.model_validate(p, from_attributes=True) for p in posts]
+    return render_posts(posts, response_format, load_type)
 
 
 @router.get(
     "/",
-    response_model=List[Union[PostPublic, PostPublicExtended]],
+    response_model=Union[List[Union[PostPublic, PostPublicExtended]], PostListNormalized],
     summary="Listar posts visibles",
     description=(
         "Lista los posts visibles según el rol del usuario y las reglas de visibilidad. "
-        "Soporta paginación y distintos tipos de carga de relaciones."
+        "Soporta paginación (offset o cursor con `after_id`), filtro por tags "
+        "(`tags=1,2&match=any|all`) y distintos tipos de carga de relaciones."
     ),
 )
 @limiter.limit("5/minute")
@@ -164,26 +301,49 @@ async def list_posts(
     request:Request,
     db: sessionDep,
     current_user: currentUserDep,
+    response_format: responseFormatDep,
     skip: int = Query(0, ge=0, description="Número de posts a omitir (paginación)."),
     limit: int = Query(100, le=100, description="Cantidad máxima de posts."),
-    load_type: Literal["lazy", "selectin", "joined"] = Query(
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(
         default="selectin",
-        description="Tipo de carga de relaciones (lazy, selectin, joined)."
+        description="Tipo de carga de relaciones (lazy, selectin, joined, auto)."
+    ),
+    tags: Optional[str] = Query(
+        None,
+        pattern=r"^\d+(,\d+)*$",
+        description="IDs de tags separados por comas, por ejemplo `1,2`."
+    ),
+    match: Literal["any", "all"] = Query(
+        default="any",
+        description="`any`: posts con alguno de los tags; `all`: posts con todos."
+    ),
+    after_id: Optional[int] = Query(
+        None,
+        ge=0,
+        description="Paginación por cursor: devuelve posts con id mayor que este (usa el id del último post recibido)."
     ),
 ):
-    query = select(Post)
-    query = VisibilityMixin.apply_visibility_filters(
-        query,
-        model_cls=Post,
+    tag_ids = [int(tag_id) for tag_id in tags.split(",")] if tags else []
+    if len(set(tag_ids)) > MAX_FILTER_TAGS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"You can filter by at most {MAX_FILTER_TAGS} tags"
+        )
+
+    load_type = list_load_type(response_format, load_type)
+    posts = await Post.list_visible(
+        db,
         current_user_role=current_user.role,
-        user_id=current_user.id
+        user_id=current_user.id,
+        skip=skip,
+        limit=limit,
+        tag_ids=tag_ids,
+        match=match,
+        after_id=after_id,
+        load_type=load_type,
+        schema=PostPublicExtended,
     )
-    query = query.offset(skip).limit(limit)
-
-    posts = await Post.execute_query(db, query, load_type=load_type)
-    if load_type == "lazy":
-        return [PostPublic.model_validate(p, from_attributes=True) for p in posts]
-    return [PostPublicExtended.model_validate(p, from_attributes=True) for p in posts]
+    return render_posts(posts, response_format, load_type)
 
 
 
@@ -198,7 +358,7 @@ async def update_post(
     post_in: PostUpdate,
     db: sessionDep,
     current_user: currentUserDep,
-    load_type: Literal["lazy", "selectin", "joined"] = Query(
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(
         default="selectin",
         description="Tipo de carga de relaciones."
     ),
@@ -214,7 +374,7 @@ async def update_post(
         if not updated_post:
             raise HTTPException(status_code=404, detail="Post not found")
         
-        db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type)
+        db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type, schema=PostPublicExtended)
         
         if load_type == "lazy":
             return PostPublic.model_validate(db_post_loaded, from_attributes=True)
@@ -268,7 +428,7 @@ async def restore_post(
     post_id: int,
     db: sessionDep,
     current_user: currentUserDep,
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
     try:
         restored_post = await Post.restore_with_ownership(
@@ -280,7 +440,7 @@ async def restore_post(
         if not restored_post:
             raise HTTPException(status_code=404, detail="Post not found")
         
-        db_post_loaded = await Post.get_by_id(db, restored_post.id, load_type=load_type)
+        db_post_loaded = await Post.get_by_id(db, restored_post.id, load_type=load_type, schema=PostPublicExtended)
         
         if load_type == "lazy":
             return PostPublic.model_validate(db_post_loaded, from_attributes=True)
@@ -304,7 +464,7 @@ async def update_post_tags(
     tags_update: PostTagsUpdate,
     db: sessionDep,
     current_user: currentUserDep,
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
     post = await Post.get_by_id(db, post_id, load_type="lazy")
     if not post:
@@ -317,7 +477,7 @@ async def update_post_tags(
         )
     
     updated_post = await Post.set_tags(db, post_id, tags_update.tag_ids)
-    db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type)
+    db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type, schema=PostPublicExtended)
     
     if load_type == "lazy":
         return PostPublic.model_validate(db_post_loaded, from_attributes=True)
@@ -335,7 +495,7 @@ async def add_tag_to_post(
     tag_id: int,
     db: sessionDep,
     current_user: currentUserDep,
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
     post = await Post.get_by_id(db, post_id, load_type="lazy")
     if not post:
@@ -351,7 +511,7 @@ async def add_tag_to_post(
     if not updated_post:
         raise HTTPException(status_code=404, detail="Post or tag not found")
     
-    db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type)
+    db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type, schema=PostPublicExtended)
     
     if load_type == "lazy":
         return PostPublic.model_validate(db_post_loaded, from_attributes=True)
@@ -374,7 +534,7 @@ async def remove_tag_from_post_single(
     tag_id: int,
     db: sessionDep,
     current_user: currentUserDep,
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
     post = await Post.get_by_id(db, post_id, load_type="lazy")
     if not post:
@@ -387,7 +547,7 @@ async def remove_tag_from_post_single(
     if not updated_post:
         raise HTTPException(status_code=404, detail="Post or tag not found")
 
-    db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type)
+    db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type, schema=PostPublicExtended)
     if load_type == "lazy":
         return PostPublic.model_validate(db_post_loaded, from_attributes=True)
     return PostPublicExtended.model_validate(db_post_loaded, from_attributes=True)
@@ -404,7 +564,7 @@ async def remove_tags_from_post(
     tags_update: PostTagsUpdate,
     db: sessionDep,
     current_user: currentUserDep,
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
     post = await Post.get_by_id(db, post_id, load_type="lazy")
     if not post:
@@ -417,7 +577,7 @@ async def remove_tags_from_post(
     if not updated_post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type)
+    db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type, schema=PostPublicExtended)
     if load_type == "lazy":
         return PostPublic.model_validate(db_post_loaded, from_attributes=True)
     return PostPublicExtended.model_validate(db_post_loaded, from_attributes=True)
@@ -425,24 +585,24 @@ async def remove_tags_from_post(
 
 @router.get(
     "/deleted",
-    response_model=List[Union[PostPublic, PostPublicExtended]],
+    response_model=Union[List[Union[PostPublic, PostPublicExtended]], PostListNormalized],
     summary="List deleted posts (Admin only)"
 )
 async def list_deleted_posts(
     db: sessionDep,
     admin_user: adminDep,
+    response_format: responseFormatDep,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=100),
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
     query = select(Post).where(Post.is_deleted == True)
     query = query.offset(skip).limit(limit)
     
-    posts = await Post.execute_query(db, query, load_type=load_type)
+    load_type = list_load_type(response_format, load_type)
+    posts = await Post.execute_query(db, query, load_type=load_type, schema=PostPublicExtended)
     
-    if load_type == "lazy":
-        return [PostPublic.model_validate(p, from_attributes=True) for p in posts]
-    return [PostPublicExtended.model_validate(p, from_attributes=True) for p in posts]
+    return render_posts(posts, response_format, load_type)
 
 
 
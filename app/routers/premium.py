@@ -3,34 +3,36 @@ from fastapi import APIRouter, HTTPException, Query, status
 from sqlalchemy.future import select
 
 from app.models.post import Post
-from app.schemas.post import PostPublic, PostPublicExtended
-from app.core.deps import sessionDep, currentUserDep, premiumDep
+from app.models.view_counter import view_counter
+from app.schemas.post import PostPublic, PostPublicExtended, PostListNormalized, list_load_type, render_posts
+from app.core.deps import sessionDep, currentUserDep, premiumDep, responseFormatDep
+from app.core.wire_formats import NegotiatedRoute
 
-router = APIRouter(prefix="/premium", tags=["premium"])
+router = APIRouter(prefix="/premium", tags=["premium"], route_class=NegotiatedRoute)
 
 
 
 @router.get(
     "/posts",
-    response_model=List[Union[PostPublic, PostPublicExtended]],
+    response_model=Union[List[Union[PostPublic, PostPublicExtended]], PostListNormalized],
     summary="Listar posts de pago",
     description="Devuelve una lista de todos los posts marcados como de pago. Solo accesible para usuarios premium."
 )
 async def list_paid_posts(
     db: sessionDep,
     current_user: premiumDep,
+    response_format: responseFormatDep,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=100),
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
     query = select(Post).where(Post.is_paid == True, Post.is_deleted == False)
     query = query.offset(skip).limit(limit)
     
-    posts = await Post.execute_query(db, query, load_type=load_type)
+    load_type = list_load_type(response_format, load_type)
+    posts = await Post.execute_query(db, query, load_type=load_type, schema=PostPublicExtended)
     
-    if load_type == "lazy":
-        return [PostPublic.model_validate(p, from_attributes=True) for p in posts]
-    return [PostPublicExtended.model_validate(p, from_attributes=True) for p in posts]
+    return render_posts(posts, response_format, load_type)
 
 
 
@@ -44,9 +46,9 @@ async def get_paid_post(
     post_id: int,
     db: sessionDep,
     current_user: premiumDep,
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
-    post = await Post.get_by_id(db, post_id, load_type=load_type)
+    post = await Post.get_by_id(db, post_id, load_type=load_type, schema=PostPublicExtended)
     
     if not post:
         raise HTTPException(
@@ -60,6 +62,7 @@ async def get_paid_post(
             detail="Este post no es de pago"
         )
     
+    view_counter.increment(post.id)
     if load_type == "lazy":
         return PostPublic.model_validate(post, from_attributes=True)
     return PostPublicExtended.model_validate(post, from_attributes=True)
@@ -77,7 +80,7 @@ async def toggle_post_paid_status(
     db: sessionDep,
     current_user: currentUserDep,
     is_paid: bool = Query(...),
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
     post = await Post.get_by_id(db, post_id, load_type="lazy")
     
@@ -94,7 +97,7 @@ async def toggle_post_paid_status(
         )
     
     updated_post = await Post.update(db, post_id, is_paid=is_paid)
-    db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type)
+    db_post_loaded = await Post.get_by_id(db, updated_post.id, load_type=load_type, schema=PostPublicExtended)
     
     if load_type == "lazy":
         return PostPublic.model_validate(db_post_loaded, from_attributes=True)
@@ -104,16 +107,17 @@ async def toggle_post_paid_status(
 
 @router.get(
     "/my-posts",
-    response_model=List[Union[PostPublic, PostPublicExtended]],
+    response_model=Union[List[Union[PostPublic, PostPublicExtended]], PostListNormalized],
     summary="Listar mis posts de pago",
     description="Devuelve una lista de los posts de pago creados por el usuario autenticado."
 )
 async def my_paid_posts(
     db: sessionDep,
     current_user: currentUserDep,
+    response_format: responseFormatDep,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=100),
-    load_type: Literal["lazy", "selectin", "joined"] = Query(default="selectin"),
+    load_type: Literal["lazy", "selectin", "joined", "auto"] = Query(default="selectin"),
 ):
     query = select(Post).where(
         Post.owner_id == current_user.id,
@@ -122,8 +126,7 @@ async def my_paid_posts(
     )
     query = query.offset(skip).limit(limit)
     
-    posts = await Post.execute_query(db, query, load_type=load_type)
+    load_type = list_load_type(response_format, load_type)
+    posts = await Post.execute_query(db, query, load_type=load_type, schema=PostPublicExtended)
     
-    if load_type == "lazy":
-        return [PostPublic.model_validate(p, from_attributes=True) for p in posts]
-    return [PostPublicExtended.model_validate(p, from_attributes=True) for p in posts]
+    return render_posts(posts, response_format, load_type)
@@ -1,15 +1,19 @@
-from typing import List, Literal, Union
+from typing import List, Literal, Optional, Union
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.models.tag import Tag
-from app.schemas.tag import TagCreate, TagUpdate, TagPublic
+from app.models.post_counts import TagPostCount
+from app.models.syncmixin import decode_watermark, encode_watermark
+from app.schemas.sync import Tombstone
+from app.schemas.tag import TagCreate, TagUpdate, TagPublic, TagStats, TagSync
 from app.schemas.user import Role
+from app.core.config import settings
 from app.core.deps import sessionDep, currentUserDep, adminDep
-from app.models.visibilitymixin import VisibilityMixin
+from app.core.wire_formats import NegotiatedRoute
 
-router = APIRouter(prefix="/tags", tags=["tags"])
+router = APIRouter(prefix="/tags", tags=["tags"], route_class=NegotiatedRoute)
 
 
 @router.post(
@@ -24,7 +28,7 @@ async def create_tag(
     db: sessionDep,
     current_user: currentUserDep,
 ):
-    existing = await Tag.get_by_title(db, tag_in.title)
+    existing = await Tag.get_cached_by_title(db, tag_in.title)
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -35,6 +39,55 @@ async def create_tag(
     return TagPublic.model_validate(db_tag, from_attributes=True)
 
 
+@router.get(
+    "/stats",
+    response_model=List[TagStats],
+    summary="Número de posts por tag",
+    description=(
+        "Devuelve, para cada tag visible, cuántos posts lo usan según el rol del usuario. "
+        "Los contadores se mantienen en la base de datos, no se recalculan en cada consulta. "
+        "El desglose de posts privados (`hidden_count`) solo se muestra a administradores."
+    ),
+)
+async def tag_stats(
+    db: sessionDep,
+    current_user: currentUserDep,
+):
+    return await TagPostCount.tag_facets(db, current_user.role, current_user.id)
+
+
+@router.get(
+    "/sync",
+    response_model=TagSync,
+    summary="Sincronización incremental de tags",
+    description=(
+        "Devuelve los tags cambiados desde la marca de agua `since` (sin ella, todos los visibles), "
+        "ordenados por fecha de modificación. Los borrados o que ya no son visibles llegan en `deleted`. "
+        "Se repite con el `watermark` devuelto mientras `has_more` sea cierto."
+    ),
+)
+async def sync_tags(
+    db: sessionDep,
+    current_user: currentUserDep,
+    since: Optional[str] = Query(None, description="`watermark` de la sincronización anterior"),
+    limit: int = Query(settings.SYNC_PAGE_SIZE, ge=1, le=settings.SYNC_MAX_PAGE_SIZE),
+):
+    try:
+        watermark, initial = decode_watermark(since) if since else (None, False)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid watermark")
+
+    page = await Tag.changed_since(
+        db, current_user.role, current_user.id, watermark, limit, settings.SYNC_OVERLAP_SECONDS, initial=initial
+    )
+    return TagSync(
+        data=[TagPublic.model_validate(tag, from_attributes=True) for tag in page.items],
+        deleted=[Tombstone.model_validate(tag, from_attributes=True) for tag in page.tombstones],
+        watermark=encode_watermark(page.watermark, page.initial),
+        has_more=page.has_more,
+    )
+
+
 @router.get(
     "/{tag_id}",
     response_model=TagPublic,
@@ -46,7 +99,7 @@ async def read_tag(
     db: sessionDep,
     current_user: currentUserDep,
 ):
-    db_tag = await Tag.get_by_id(db, tag_id)
+    db_tag = await Tag.get_cached_by_id(db, tag_id)
     if not db_tag:
         raise HTTPException(status_code=404, detail="Tag no encontrado.")
 
@@ -75,16 +128,8 @@ async def search_tags(
     skip: int = Query(0, ge=0, description="Resultados a omitir."),
     limit: int = Query(50, le=100, description="Resultados máximos a devolver."),
 ):
-    query = select(Tag).where(Tag.title.ilike(f"%{title}%"))
-    query = VisibilityMixin.apply_visibility_filters(
-        query,
-        model_cls=Tag,
-        current_user_role=current_user.role,
-        user_id=current_user.id
-    )
-    query = query.offset(skip).limit(limit)
-
-    result = await db.execute(query)
+    query = Tag.visible_statement(current_user.role, bool(current_user.id), search=True, ordered=False)
+    result = await db.execute(query, Tag.visible_params(current_user.id, skip, limit, title=title))
     tags = result.scalars().all()
 
     return [TagPublic.model_validate(t, from_attributes=True) for t in tags]
@@ -102,17 +147,13 @@ async def list_tags(
     skip: int = Query(0, ge=0, description="Número de tags a omitir."),
     limit: int = Query(100, le=100, description="Cantidad máxima de tags."),
 ):
-    query = select(Tag)
-    query = VisibilityMixin.apply_visibility_filters(
-        query,
-        model_cls=Tag,
+    tags = await Tag.list_visible(
+        db,
         current_user_role=current_user.role,
-        user_id=current_user.id
+        user_id=current_user.id,
+        skip=skip,
+        limit=limit
     )
-    query = query.offset(skip).limit(limit)
-
-    result = await db.execute(query)
-    tags = result.scalars().all()
 
     return [TagPublic.model_validate(t, from_attributes=True) for t in tags]
 
@@ -4,12 +4,15 @@ from app.core.deps import sessionDep
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User as UserModel
 from app.core.security import get_password_hash
-router = APIRouter(prefix="/user", tags=["user"])
+from app.core.wire_formats import NegotiatedRoute
+from app.core.admission import admission_class
+router = APIRouter(prefix="/user", tags=["user"], route_class=NegotiatedRoute)
 
 
 
 
 @router.get("/get-user", response_model=UserPublic)
+@admission_class("read")
 async def get_user(id: str, db:sessionDep):
     user = await UserModel.get(db, id)
     if not user:
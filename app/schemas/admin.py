@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class EncodingStats(BaseModel):
+    responses: int
+    bytes_in: int
+    bytes_out: int
+    bytes_saved: int
+    ratio: Optional[float] = None
+
+
+class CompressionStatsPublic(BaseModel):
+    encodings: Dict[str, EncodingStats] = {}
+    bytes_saved: int = 0
+    skipped: Dict[str, int] = {}
+
+
+class QueryPlanSummary(BaseModel):
+    node_type: Optional[str] = None
+    total_cost: Optional[float] = None
+    plan_rows: Optional[float] = None
+    seq_scans: List[str] = []
+    plan: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class SlowQuery(BaseModel):
+    timestamp: datetime
+    duration_ms: float
+    statement: str
+    parameter_types: List[str] = []
+    route: Optional[str] = None
+    explain: Optional[QueryPlanSummary] = None
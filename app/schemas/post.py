@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
-from app.schemas.tag import TagPublic
+from typing import Dict, Optional, List
+from app.schemas.sync import SyncResponse
+from app.schemas.tag import TagPublic, TagStats
 from app.schemas.user import UserPublic
 from app.schemas.timestampmixin import TimestampMixin
 from app.schemas.visibilitymixin import VisibilitySchema
@@ -32,6 +33,7 @@ class PostTagsUpdate(BaseModel):
 class PostPublic(PostBase, TimestampMixin, VisibilitySchema):
     id: int
     owner_id: int
+    view_count: int = 0
 
     class Config:
         from_attributes = True
@@ -45,4 +47,78 @@ class PostPublicExtended(PostPublic):
         from_attributes = True
 
 
+class PostNormalized(PostPublic):
+    tag_ids: List[int] = []
 
+    class Config:
+        from_attributes = True
+
+    @classmethod
+    def from_post(cls, post) -> "PostNormalized":
+        """A partir de un post con `tags` ya cargados."""
+        item = cls.model_validate(post, from_attributes=True)
+        item.tag_ids = [tag.id for tag in post.tags]
+        return item
+
+
+class PostIncluded(BaseModel):
+    users: Dict[int, UserPublic] = {}
+    tags: Dict[int, TagPublic] = {}
+
+
+class PostListNormalized(BaseModel):
+    """
+    Listado de posts en formato normalizado: cada post referencia a su autor
+    y a sus tags por ID, y cada usuario o tag se serializa una sola vez en `included`.
+    """
+    data: List[PostNormalized] = []
+    included: PostIncluded = PostIncluded()
+
+    @classmethod
+    def from_posts(cls, posts) -> "PostListNormalized":
+        """Construye la respuesta a partir de posts con `user` y `tags` ya cargados."""
+        users: Dict[int, UserPublic] = {}
+        tags: Dict[int, TagPublic] = {}
+        data = []
+        for post in posts:
+            if post.user is not None and post.user.id not in users:
+                users[post.user.id] = UserPublic.model_validate(post.user, from_attributes=True)
+            for tag in post.tags:
+                if tag.id not in tags:
+                    tags[tag.id] = TagPublic.model_validate(tag, from_attributes=True)
+            data.append(PostNormalized.from_post(post))
+        return cls(data=data, included=PostIncluded(users=users, tags=tags))
+
+
+def list_load_type(response_format: str, load_type: str) -> str:
+    """El formato normalizado necesita el autor y los tags cargados."""
+    if response_format == "normalized" and load_type == "lazy":
+        return "auto"
+    return load_type
+
+
+def render_posts(posts, response_format: str, load_type: str):
+    """Respuesta de un listado de posts según `format` y el tipo de carga usado."""
+    if response_format == "normalized":
+        return PostListNormalized.from_posts(posts)
+    if load_type == "lazy":
+        return [PostPublic.model_validate(p, from_attributes=True) for p in posts]
+    return [PostPublicExtended.model_validate(p, from_attributes=True) for p in posts]
+
+
+class PostSync(SyncResponse):
+    """Página de sincronización incremental de posts; los tags van por ID."""
+    data: List[PostNormalized] = []
+
+
+class CategoryStats(BaseModel):
+    category: str
+    count: int
+    public_count: int
+    paid_count: int
+    hidden_count: Optional[int] = None
+
+
+class PostFacets(BaseModel):
+    tags: List[TagStats] = []
+    categories: List[CategoryStats] = []
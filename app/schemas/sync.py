@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+class Tombstone(BaseModel):
+    """Fila borrada o que el usuario ya no puede ver: el cliente debe eliminarla."""
+    id: int
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SyncResponse(BaseModel):
+    deleted: List[Tombstone] = []
+    watermark: Optional[str] = Field(None, description="Valor de `since` para la siguiente sincronización")
+    has_more: bool = False
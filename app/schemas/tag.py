@@ -1,6 +1,7 @@
 from pydantic import BaseModel
+from app.schemas.sync import SyncResponse
 from app.schemas.timestampmixin import TimestampMixin
-from typing import Optional
+from typing import List, Optional
 
 
 class TagBase(BaseModel):
@@ -23,3 +24,16 @@ class TagPublic(TagBase, TimestampMixin):
 
     class Config:
         from_attributes = True
+
+
+class TagSync(SyncResponse):
+    data: List[TagPublic] = []
+
+
+class TagStats(BaseModel):
+    tag_id: int
+    title: str
+    count: int
+    public_count: int
+    paid_count: int
+    hidden_count: Optional[int] = None
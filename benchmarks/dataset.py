@@ -0,0 +1,165 @@
+"""
+Generador de datos sintéticos para los benchmarks: usuarios, tags, posts y
+enlaces posts_tags cargados con COPY (asyncpg `copy_records_to_table`).
+
+Como el seeder de alembic, los usuarios se crean con el hasher de la
+aplicación, pero la contraseña se hashea una sola vez y se reutiliza. Todas
+las filas llevan el prefijo `--prefix` para poder regenerarlas con `--reset`
+sin tocar el resto de la base de datos, y la misma `--seed` produce el mismo
+dataset.
+
+Credenciales de los usuarios generados: `<prefix>-user-<n>@example.com` con
+contraseña `<prefix>-password` (n empieza en 1). Los títulos de los posts
+contienen una palabra de `WORDS`, que usa el escenario de búsqueda.
+
+Uso:
+    python -m benchmarks.dataset --users 1000 --posts 200000 --tags 500 --reset
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.core.security import get_password_hash
+
+WORDS = [
+    "python", "postgres", "fastapi", "async", "cache", "index", "latency", "queue",
+    "docker", "kernel", "network", "storage", "search", "metrics", "backup", "deploy",
+]
+CATEGORIES = ["tech", "news", "tutorial", "opinion", "release", "howto"]
+
+
+def email_for(prefix: str, n: int) -> str:
+    return f"{prefix}-user-{n}@example.com"
+
+
+def password_for(prefix: str) -> str:
+    return f"{prefix}-password"
+
+
+def asyncpg_dsn(database_url: str) -> str:
+    return make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+async def reset(conn: asyncpg.Connection, prefix: str) -> None:
+    like = f"{prefix}-%"
+    posts = "SELECT id FROM posts WHERE title LIKE $1 OR owner_id IN (SELECT id FROM users WHERE email LIKE $1)"
+    tags = "SELECT id FROM tags WHERE title LIKE $1 OR owner_id IN (SELECT id FROM users WHERE email LIKE $1)"
+    await conn.execute(f"DELETE FROM posts_tags WHERE post_id IN ({posts}) OR tag_id IN ({tags})", like)
+    await conn.execute(f"DELETE FROM posts WHERE id IN ({posts})", like)
+    await conn.execute(f"DELETE FROM tags WHERE id IN ({tags})", like)
+    await conn.execute("DELETE FROM users WHERE email LIKE $1", like)
+
+
+async def generate(conn: asyncpg.Connection, args) -> dict:
+    rng = random.Random(args.seed)
+    prefix = args.prefix
+    password = get_password_hash(password_for(prefix))
+
+    # 1 de cada 20 usuarios es de pago y el primero es administrador
+    await conn.copy_records_to_table(
+        "users",
+        columns=["email", "full_name", "password_hash", "role"],
+        records=(
+            (
+                email_for(prefix, n),
+                f"Bench User {n}",
+                password,
+                "ADMIN" if n == 1 else ("PAID_USER" if n % 20 == 0 else "FREE_USER"),
+            )
+            for n in range(1, args.users + 1)
+        ),
+    )
+    user_ids = [row["id"] for row in await conn.fetch(
+        "SELECT id FROM users WHERE email LIKE $1 ORDER BY id", f"{prefix}-user-%"
+    )]
+
+    await conn.copy_records_to_table(
+        "tags",
+        columns=["title", "description", "owner_id"],
+        records=(
+            (f"{prefix}-tag-{n}", f"Tag sintético {n}", rng.choice(user_ids))
+            for n in range(1, args.tags + 1)
+        ),
+    )
+    tag_ids = [row["id"] for row in await conn.fetch(
+        "SELECT id FROM tags WHERE title LIKE $1 ORDER BY id", f"{prefix}-tag-%"
+    )]
+
+    # 1 de cada 10 posts es de pago, 1 de cada 20 privado y 1 de cada 100 está borrado
+    content = "lorem ipsum " * (args.content_size // 12)
+    await conn.copy_records_to_table(
+        "posts",
+        columns=["owner_id", "title", "description", "content", "category", "is_paid", "is_visible", "is_deleted"],
+        records=(
+            (
+                rng.choice(user_ids),
+                f"{prefix}-post-{n} {rng.choice(WORDS)} {rng.choice(WORDS)}",
+                f"Post sintético {n}",
+                content,
+                rng.choice(CATEGORIES),
+                n % 10 == 0,
+                n % 20 != 0,
+                n % 100 == 0,
+            )
+            for n in range(1, args.posts + 1)
+        ),
+    )
+    post_ids = [row["id"] for row in await conn.fetch(
+        "SELECT id FROM posts WHERE title LIKE $1 ORDER BY id", f"{prefix}-post-%"
+    )]
+
+    per_post = min(args.tags_per_post, len(tag_ids))
+    await conn.copy_records_to_table(
+        "posts_tags",
+        columns=["post_id", "tag_id"],
+        records=(
+            (post_id, tag_id)
+            for post_id in post_ids
+            for tag_id in rng.sample(tag_ids, rng.randint(0, per_post))
+        ),
+    )
+    links = await conn.fetchval(
+        "SELECT count(*) FROM posts_tags WHERE post_id = ANY($1::int[])", post_ids
+    )
+    return {"users": len(user_ids), "tags": len(tag_ids), "posts": len(post_ids), "links": links}
+
+
+async def run(args) -> None:
+    conn = await asyncpg.connect(asyncpg_dsn(args.database_url))
+    try:
+        started = time.perf_counter()
+        async with conn.transaction():
+            if args.reset:
+                await reset(conn, args.prefix)
+            counts = await generate(conn, args)
+        for table in ("users", "tags", "posts", "posts_tags"):
+            await conn.execute(f"ANALYZE {table}")
+        print(
+            f"generated users={counts['users']} tags={counts['tags']} posts={counts['posts']} "
+            f"links={counts['links']} in {time.perf_counter() - started:.1f}s"
+        )
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--prefix", default="bench", help="Prefijo de emails y títulos generados")
+    parser.add_argument("--reset", action="store_true", help="Borra antes los datos con el mismo prefijo")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--tags-per-post", type=int, default=5, help="Máximo de tags por post")
+    parser.add_argument("--content-size", type=int, default=500, help="Tamaño aproximado del contenido (bytes)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Pruebas de carga de la API HTTP con escenarios reproducibles.
+
+Necesita el dataset de `benchmarks.dataset` (mismo `--prefix`). Por defecto
+las peticiones van a la aplicación en el mismo proceso (httpx + ASGITransport,
+con el lifespan y el rate limiter desactivado); con `--base-url` se lanzan
+contra un servidor ya arrancado (uvicorn local), en cuyo caso conviene
+subir los límites del rate limiter y del control de admisión.
+
+Escenarios:
+    login_storm   POST /auth/login con usuarios distintos (hash de contraseñas).
+    feed_paging   GET /posts/ recorriendo páginas con cursor `after_id`.
+    search        GET /posts/search/ con palabras presentes en los títulos.
+    tag_edits     PUT /posts/{id}/tags sobre posts propios de cada usuario.
+
+Cada escenario se ejecuta durante `--duration` segundos con `--concurrency`
+clientes. El informe JSON incluye throughput, latencias p50/p95/p99 y
+consultas SQL por petición (de la cabecera Server-Timing). Con `--baseline`
+se compara con un informe anterior y el proceso termina con código 1 si
+algún escenario empeora más de `--max-regression`.
+
+Uso:
+    python -m benchmarks.dataset --users 500 --posts 100000 --reset
+    python -m benchmarks.http_load --duration 20 --concurrency 16 --output report.json
+    python -m benchmarks.http_load --baseline report.json --max-regression 0.15
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from benchmarks.dataset import WORDS, email_for, password_for
+
+API = settings.API_V1_STR
+_DB_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class Recorder:
+    """Latencias, estados y consultas SQL de las peticiones de un escenario."""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Counter = Counter()
+        self.queries: List[int] = []
+        self.errors = 0
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.record_exception()
+            return None
+        self.record(response, (time.perf_counter() - started) * 1000)
+        return response
+
+    def record(self, response: httpx.Response, latency_ms: float) -> None:
+        self.latencies_ms.append(latency_ms)
+        self.statuses[str(response.status_code)] += 1
+        if response.status_code >= 400:
+            self.errors += 1
+        match = _DB_QUERIES.search(response.headers.get("server-timing", ""))
+        if match:
+            self.queries.append(int(match.group(1)))
+
+    def record_exception(self) -> None:
+        self.errors += 1
+        self.statuses["exception"] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies_ms)
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "mean": round(statistics.fmean(latencies), 2) if latencies else None,
+                "max": round(latencies[-1], 2) if latencies else None,
+            },
+            "queries_per_request": round(statistics.fmean(self.queries), 2) if self.queries else None,
+            "status": dict(self.statuses),
+        }
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre una lista ordenada."""
+    if not values:
+        return None
+    rank = max(1, round(pct / 100 * len(values) + 0.5))
+    return round(values[min(rank, len(values)) - 1], 2)
+
+
+class Context:
+    """Estado compartido por los escenarios: usuarios autenticados, tags y posts editables."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.users: List[dict] = []
+        self.tag_ids: List[int] = []
+        self.run_id = uuid.uuid4().hex[:8]
+
+    def params(self, **params) -> dict:
+        if self.args.load_type:
+            params["load_type"] = self.args.load_type
+        return params
+
+
+async def login(client: httpx.AsyncClient, prefix: str, n: int) -> httpx.Response:
+    return await client.post(
+        f"{API}/auth/login",
+        data={"username": email_for(prefix, n), "password": password_for(prefix)},
+    )
+
+
+async def setup(client: httpx.AsyncClient, ctx: Context) -> None:
+    args = ctx.args
+    # Del 2 en adelante: el usuario 1 es administrador y ve también lo privado
+    numbers = list(range(2, args.clients + 2))
+    responses = await asyncio.gather(*(login(client, args.prefix, n) for n in numbers))
+    for n, response in zip(numbers, responses):
+        if response.status_code != 200:
+            raise SystemExit(f"Login failed for {email_for(args.prefix, n)} ({response.status_code}); run benchmarks.dataset first")
+        ctx.users.append({"n": n, "headers": {"Authorization": f"Bearer {response.json()['access_token']}"}})
+
+    response = await client.get(
+        f"{API}/tags/search/", params={"title": f"{args.prefix}-tag-", "limit": 100}, headers=ctx.users[0]["headers"]
+    )
+    response.raise_for_status()
+    ctx.tag_ids = [tag["id"] for tag in response.json() if tag["title"].startswith(f"{args.prefix}-tag-")]
+    if not ctx.tag_ids:
+        raise SystemExit("No benchmark tags found; run benchmarks.dataset first")
+
+    if "tag_edits" in args.scenarios:
+        # Un post propio por usuario para editar sus tags sin conflictos de permisos
+        for user in ctx.users:
+            response = await client.post(
+                f"{API}/posts/",
+                json={"title": f"{args.prefix}-edit-{ctx.run_id}-{user['n']}", "tag_ids": ctx.tag_ids[:1]},
+                headers=user["headers"],
+            )
+            response.raise_for_status()
+            user["post_id"] = response.json()["id"]
+
+
+async def teardown(client: httpx.AsyncClient, ctx: Context) -> None:
+    for user in ctx.users:
+        if "post_id" in user:
+            await client.delete(f"{API}/posts/{user['post_id']}", headers=user["headers"])
+
+
+async def login_storm(client, ctx: Context, recorder: Recorder, worker: int, state: dict) -> None:
+    n = ctx.rng.randint(2, ctx.args.login_users + 1)
+    await recorder.request(
+        client, "POST", f"{API}/auth/login",
+        data={"username": email_for(ctx.args.prefix, n), "password": password_for(ctx.args.prefix)},
+    )
+
+
+async def feed_paging(client, ctx: Context, recorder: Recorder, worker: int, state: dict) -> None:
+    user = ctx.users[worker % len(ctx.users)]
+    params = ctx.params(limit=ctx.args.page_size)
+    if state.get("after_id") is not None:
+        params["after_id"] = state["after_id"]
+    response = await recorder.request(client, "GET", f"{API}/posts/", params=params, headers=user["headers"])
+    page = response.json() if response is not None and response.status_code == 200 else []
+    state["page"] = state.get("page", 0) + 1
+    if not page or state["page"] >= ctx.args.pages:
+        state["after_id"], state["page"] = None, 0
+    else:
+        state["after_id"] = page[-1]["id"]
+
+
+async def search(client, ctx: Context, recorder: Recorder, worker: int, state: dict) -> None:
+    user = ctx.users[worker % len(ctx.users)]
+    params = ctx.params(title=ctx.rng.choice(WORDS), limit=ctx.args.page_size)
+    await recorder.request(client, "GET", f"{API}/posts/search/", params=params, headers=user["headers"])
+
+
+async def tag_edits(client, ctx: Context, recorder: Recorder, worker: int, state: dict) -> None:
+    user = ctx.users[worker % len(ctx.users)]
+    tag_ids = ctx.rng.sample(ctx.tag_ids, ctx.rng.randint(1, min(3, len(ctx.tag_ids))))
+    await recorder.request(
+        client, "PUT", f"{API}/posts/{user['post_id']}/tags",
+        params=ctx.params(), json={"tag_ids": tag_ids}, headers=user["headers"],
+    )
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "login_storm": login_storm,
+    "feed_paging": feed_paging,
+    "search": search,
+    "tag_edits": tag_edits,
+}
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: Context, name: str) -> dict:
+    scenario = SCENARIOS[name]
+    recorder = Recorder()
+    deadline = time.perf_counter() + ctx.args.duration
+
+    async def worker(index: int) -> None:
+        state: dict = {}
+        while time.perf_counter() < deadline:
+            await scenario(client, ctx, recorder, index, state)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(ctx.args.concurrency)))
+    return recorder.summary(time.perf_counter() - started)
+
+
+async def run(args) -> dict:
+    ctx = Context(args)
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "target": args.base_url or "asgi",
+            "python": platform.python_version(),
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "load_type": args.load_type,
+            "page_size": args.page_size,
+        },
+        "scenarios": {},
+    }
+    limits = httpx.Limits(max_connections=args.concurrency + args.clients)
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+            await run_all(client, ctx, report)
+        return report
+
+    from app.core.rate_limiting import limiter
+    from app.main import myapp
+
+    limiter.enabled = False
+    async with myapp.router.lifespan_context(myapp):
+        transport = httpx.ASGITransport(app=myapp)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=30) as client:
+            await run_all(client, ctx, report)
+    return report
+
+
+async def run_all(client: httpx.AsyncClient, ctx: Context, report: dict) -> None:
+    await setup(client, ctx)
+    try:
+        for name in ctx.args.scenarios:
+            summary = await run_scenario(client, ctx, name)
+            report["scenarios"][name] = summary
+            latency = summary["latency_ms"]
+            print(
+                f"{name:<12} req={summary['requests']:<6} err={summary['errors']:<4} "
+                f"rps={summary['throughput_rps']:<8} p50={latency['p50']}ms p95={latency['p95']}ms "
+                f"p99={latency['p99']}ms queries/req={summary['queries_per_request']}",
+                file=sys.stderr,
+            )
+    finally:
+        await teardown(client, ctx)
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Escenarios que empeoran respecto al informe base más de `max_regression` (fracción)."""
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for pct in ("p95", "p99"):
+            old, new = previous["latency_ms"].get(pct), current["latency_ms"].get(pct)
+            if old and new and new > old * (1 + max_regression):
+                regressions.append(f"{name}: {pct} {old}ms -> {new}ms (+{(new / old - 1) * 100:.0f}%)")
+        old, new = previous["throughput_rps"], current["throughput_rps"]
+        if old and new < old * (1 - max_regression):
+            regressions.append(f"{name}: throughput {old} -> {new} rps ({(new / old - 1) * 100:.0f}%)")
+        old, new = previous.get("queries_per_request"), current.get("queries_per_request")
+        if old is not None and new is not None and new > old:
+            regressions.append(f"{name}: queries/request {old} -> {new}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Servidor ya arrancado; sin él se usa la app en el mismo proceso")
+    parser.add_argument("--prefix", default="bench", help="Prefijo del dataset generado")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), type=lambda value: value.split(","))
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por escenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--clients", type=int, default=16, help="Usuarios autenticados que reparten la carga")
+    parser.add_argument("--login-users", type=int, default=100, help="Usuarios distintos en login_storm")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10, help="Páginas seguidas antes de volver al principio del feed")
+    parser.add_argument("--load-type", choices=["lazy", "selectin", "joined", "auto"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Fichero donde guardar el informe JSON (por defecto, stdout)")
+    parser.add_argument("--baseline", help="Informe JSON anterior con el que comparar")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="Empeoramiento tolerado (0.10 = 10%%)")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
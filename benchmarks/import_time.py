@@ -0,0 +1,80 @@
+"""
+Informe del coste de importación de la aplicación (como `python -X importtime`).
+
+Importa `--module` en un proceso nuevo con `-X importtime`, agrupa el tiempo
+acumulado por paquete de primer nivel y muestra los módulos más caros. Con
+`--budget-ms` termina con código 1 si la importación total lo supera, para
+detectar en CI dependencias pesadas que se cuelan en el arranque.
+
+Uso:
+    python -m benchmarks.import_time --top 25
+    python -m benchmarks.import_time --budget-ms 1500 --json
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import List, Tuple
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(module: str) -> List[Tuple[str, int, int, int]]:
+    """(módulo, propio_us, acumulado_us, profundidad) de cada importación."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=20, help="Módulos y paquetes a mostrar")
+    parser.add_argument("--budget-ms", type=float, default=0.0, help="Tiempo máximo de importación permitido")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    total_ms = next((cumulative for name, _, cumulative, _ in rows if name == args.module), 0) / 1000
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    modules = sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]
+
+    if args.json:
+        print(json.dumps({
+            "module": args.module,
+            "total_ms": round(total_ms, 1),
+            "packages_ms": {name: round(us / 1000, 1) for name, us in packages},
+            "modules_cumulative_ms": {name: round(cumulative / 1000, 1) for name, _, cumulative, _ in modules},
+        }, indent=2))
+    else:
+        print(f"import {args.module}: {total_ms:.0f} ms")
+        print("\nBy top-level package (self time):")
+        for name, us in packages:
+            print(f"  {us / 1000:8.1f} ms  {name}")
+        print("\nSlowest modules (cumulative):")
+        for name, _, cumulative, _ in modules:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if args.budget_ms and total_ms > args.budget_ms:
+        print(f"Import time {total_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compara las estrategias de carga de relaciones de Post (lazy, selectin,
+joined y auto): número de sentencias SQL, filas devueltas por la base de
+datos y latencia de una página serializada con el esquema de respuesta.
+
+Necesita datos; `python -m benchmarks.tag_filter --seed` genera un dataset
+válido.
+
+Uso:
+    python -m benchmarks.loader_strategies --database-url postgresql+asyncpg://... --iterations 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import event, select
+
+from app.core.config import settings
+from app.db.services import sessionmanager
+from app.models.post import Post
+from app.schemas.post import PostPublic, PostPublicExtended
+
+LOAD_TYPES = ["lazy", "selectin", "joined", "auto"]
+
+
+async def run(args) -> None:
+    sessionmanager.init(args.database_url)
+    engine = sessionmanager._engine.sync_engine
+    stats = {"statements": 0, "rows": 0}
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def count_statements(conn, cursor, statement, parameters, context, executemany):
+        stats["statements"] += 1
+        if cursor.rowcount and cursor.rowcount > 0:
+            stats["rows"] += cursor.rowcount
+
+    try:
+        async with sessionmanager.session() as db:
+            for load_type in LOAD_TYPES:
+                schema = PostPublic if load_type == "lazy" else PostPublicExtended
+                timings = []
+                db_timings = []
+                for _ in range(args.iterations):
+                    stats["statements"] = stats["rows"] = 0
+                    started = time.perf_counter()
+                    query = select(Post).order_by(Post.id).limit(args.page_size)
+                    posts = await Post.execute_query(db, query, load_type=load_type, schema=PostPublicExtended)
+                    db_timings.append((time.perf_counter() - started) * 1000)
+                    payload = [schema.model_validate(p, from_attributes=True).model_dump_json() for p in posts]
+                    timings.append((time.perf_counter() - started) * 1000)
+                    db.expunge_all()
+                timings.sort()
+                print(
+                    f"{load_type:<9} posts={len(payload):<4} statements={stats['statements']:<3} "
+                    f"db_rows={stats['rows']:<6} db_p50={statistics.median(db_timings):7.2f}ms "
+                    f"total_p50={statistics.median(timings):7.2f}ms "
+                    f"total_p95={timings[int(len(timings) * 0.95) - 1]:7.2f}ms"
+                )
+    finally:
+        await sessionmanager.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Reproduce el tráfico capturado por `CaptureMiddleware` (CAPTURE_ENABLED=true)
+contra una instancia local y resume las latencias por ruta.
+
+Cada traza se envía con su método, path, query y cuerpo JSON, autenticada
+como un usuario del dataset de `benchmarks.dataset` con el mismo rol
+(ADMIN, PAID_USER o FREE_USER; sin rol, sin token). Los IDs de los paths se
+reproducen tal cual, así que conviene usar una copia de la base de datos en
+la que se capturó. Las rutas de /auth no se reproducen (sus credenciales se
+guardan redactadas) y las escrituras solo con `--include-writes`.
+
+Modos:
+    por defecto     bucle abierto: respeta los instantes de llegada originales,
+                    acelerados `--speed` veces.
+    --concurrency   bucle cerrado: N clientes envían las trazas sin pausas,
+                    `--loops` veces.
+
+El informe tiene el mismo formato que el de `benchmarks.http_load` (un
+escenario por ruta y `overall`), así que para comparar dos builds basta con
+guardar el informe de la primera y pasarlo como `--baseline` a la segunda.
+
+Uso:
+    python -m benchmarks.replay captures/traffic.jsonl --base-url http://localhost:8000 --output a.json
+    python -m benchmarks.replay captures/traffic.jsonl --base-url http://localhost:8001 --speed 4 --baseline a.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from benchmarks.dataset import email_for, password_for
+from benchmarks.http_load import Recorder, compare, percentile
+
+API = settings.API_V1_STR
+# Usuario del dataset que representa a cada rol
+ROLE_USERS = {"ADMIN": 1, "PAID_USER": 20, "FREE_USER": 2}
+READ_METHODS = ("GET", "HEAD")
+
+
+def load_traces(path: str, include_writes: bool, limit: Optional[int]) -> List[dict]:
+    traces = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            trace = json.loads(line)
+            if trace["path"].startswith(f"{API}/auth/"):
+                continue
+            if trace["method"] not in READ_METHODS and not include_writes:
+                continue
+            traces.append(trace)
+    traces.sort(key=lambda trace: trace["ts"])
+    return traces[:limit] if limit else traces
+
+
+async def authenticate(client: httpx.AsyncClient, prefix: str, roles) -> Dict[Optional[str], dict]:
+    headers: Dict[Optional[str], dict] = {None: {}}
+    for role in roles:
+        if role is None:
+            continue
+        response = await client.post(
+            f"{API}/auth/login",
+            data={"username": email_for(prefix, ROLE_USERS[role]), "password": password_for(prefix)},
+        )
+        if response.status_code != 200:
+            raise SystemExit(f"Login failed for role {role} ({response.status_code}); run benchmarks.dataset first")
+        headers[role] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return headers
+
+
+class Replayer:
+    def __init__(self, client: httpx.AsyncClient, headers: Dict[Optional[str], dict]):
+        self.client = client
+        self.headers = headers
+        self.recorders: Dict[str, Recorder] = {}
+        self.overall = Recorder()
+
+    async def send(self, trace: dict) -> None:
+        key = f"{trace['method']} {trace.get('route') or trace['path']}"
+        recorders = (self.recorders.setdefault(key, Recorder()), self.overall)
+        kwargs = {"params": trace.get("query") or None, "headers": self.headers.get(trace.get("role"), {})}
+        if trace.get("body") is not None and trace["method"] not in READ_METHODS:
+            kwargs["json"] = trace["body"]
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(trace["method"], trace["path"], **kwargs)
+        except httpx.HTTPError:
+            for recorder in recorders:
+                recorder.record_exception()
+            return
+        latency_ms = (time.perf_counter() - started) * 1000
+        for recorder in recorders:
+            recorder.record(response, latency_ms)
+
+    async def open_loop(self, traces: List[dict], speed: float, max_in_flight: int) -> None:
+        semaphore = asyncio.Semaphore(max_in_flight)
+        tasks = set()
+        first = traces[0]["ts"]
+        started = time.perf_counter()
+        for trace in traces:
+            delay = (trace["ts"] - first) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await semaphore.acquire()
+            task = asyncio.create_task(self.send(trace))
+            tasks.add(task)
+            task.add_done_callback(lambda done: (tasks.discard(done), semaphore.release()))
+        await asyncio.gather(*tasks)
+
+    async def closed_loop(self, traces: List[dict], concurrency: int, loops: int) -> None:
+        pending = itertools.chain.from_iterable(itertools.repeat(traces, loops))
+
+        async def worker() -> None:
+            for trace in pending:
+                await self.send(trace)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def captured_latency(traces: List[dict]) -> Dict[str, dict]:
+    """Latencias registradas en la captura, por ruta, como referencia."""
+    by_route: Dict[str, List[float]] = {}
+    for trace in traces:
+        by_route.setdefault(f"{trace['method']} {trace.get('route') or trace['path']}", []).append(trace["duration_ms"])
+    return {
+        key: {"p50": percentile(sorted(values), 50), "p95": percentile(sorted(values), 95), "p99": percentile(sorted(values), 99)}
+        for key, values in by_route.items()
+    }
+
+
+async def run(args) -> dict:
+    traces = load_traces(args.traces, args.include_writes, args.limit)
+    if not traces:
+        raise SystemExit("No traces to replay")
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        headers = await authenticate(client, args.prefix, {trace.get("role") for trace in traces})
+        replayer = Replayer(client, headers)
+        started = time.perf_counter()
+        if args.concurrency:
+            await replayer.closed_loop(traces, args.concurrency, args.loops)
+        else:
+            await replayer.open_loop(traces, args.speed, args.max_in_flight)
+        elapsed = time.perf_counter() - started
+
+    captured = captured_latency(traces)
+    scenarios = {"overall": replayer.overall.summary(elapsed)}
+    for key, recorder in sorted(replayer.recorders.items()):
+        scenarios[key] = {**recorder.summary(elapsed), "captured_latency_ms": captured.get(key)}
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "target": args.base_url,
+            "traces": len(traces),
+            "mode": f"closed-loop x{args.concurrency}" if args.concurrency else f"open-loop speed x{args.speed}",
+        },
+        "scenarios": scenarios,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", help="Fichero JSONL generado por CaptureMiddleware")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--prefix", default="bench", help="Prefijo del dataset con los usuarios por rol")
+    parser.add_argument("--speed", type=float, default=1.0, help="Factor de aceleración del bucle abierto")
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, help="Bucle cerrado con N clientes")
+    parser.add_argument("--loops", type=int, default=1, help="Vueltas a las trazas en bucle cerrado")
+    parser.add_argument("--include-writes", action="store_true", help="Reproduce también POST/PUT/DELETE")
+    parser.add_argument("--limit", type=int, help="Reproduce solo las primeras N trazas")
+    parser.add_argument("--output", help="Fichero donde guardar el informe JSON (por defecto, stdout)")
+    parser.add_argument("--baseline", help="Informe de otra build con el que comparar")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="Empeoramiento tolerado (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    for key, summary in report["scenarios"].items():
+        latency = summary["latency_ms"]
+        print(
+            f"{key:<50} req={summary['requests']:<6} err={summary['errors']:<4} "
+            f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms",
+            file=sys.stderr,
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Coste de construir, compilar y preparar las consultas calientes en cada
+petición frente a las plantillas cacheadas de los modelos (`get_one_by`,
+`list_visible`, `visible_statement`).
+
+Para cada forma de consulta mide:
+
+    build     construir el `select()` y calcular su clave de caché, sin base de datos.
+    adhoc     la consulta construida en cada llamada, como antes.
+    cached    la plantilla cacheada con los valores como parámetros.
+
+y repite ambas variantes con la caché de sentencias preparadas de asyncpg
+desactivada (`prepared_statement_cache_size=0`) para ver lo que cuesta
+preparar cada vez.
+
+Necesita el dataset de `benchmarks.dataset`.
+
+Uso:
+    python -m benchmarks.statement_cache --iterations 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.models.post import Post
+from app.models.tag import Tag
+from app.models.user import User
+from app.schemas.post import PostPublicExtended
+from app.schemas.user import Role
+from benchmarks.dataset import email_for
+
+
+def shapes(email: str, post_id: int, tag_title: str, tag_ids: list, user_id: int):
+    """(nombre, constructor ad hoc, llamada ad hoc, llamada cacheada) de cada forma."""
+
+    def email_query():
+        return select(User).where(User.email == email)
+
+    def post_query():
+        return select(Post).options(*Post._get_load_options("auto", PostPublicExtended)).where(Post.id == post_id)
+
+    def title_query():
+        return select(Tag).where(Tag.title == tag_title)
+
+    def list_query():
+        query = Post.apply_visibility_filters(select(Post), Post, Role.PAID_USER, user_id)
+        query = Post.filter_by_tags(query, match="any")
+        return query.order_by(Post.id).offset(0).limit(20)
+
+    async def adhoc_list(db):
+        return (await db.execute(list_query(), Post.tag_params(sorted(tag_ids)))).unique().scalars().all()
+
+    def tag_list_query():
+        query = Tag.apply_visibility_filters(select(Tag), Tag, Role.FREE_USER, user_id)
+        return query.order_by(Tag.id).offset(0).limit(100)
+
+    async def adhoc_scalars(db, query):
+        return (await db.execute(query)).unique().scalars().all()
+
+    return [
+        (
+            "login email lookup",
+            email_query,
+            lambda db: adhoc_scalars(db, email_query()),
+            lambda db: User.get_by_email(db, email),
+        ),
+        (
+            "post by id (auto)",
+            post_query,
+            lambda db: adhoc_scalars(db, post_query()),
+            lambda db: Post.get_by_id(db, post_id, load_type="auto", schema=PostPublicExtended),
+        ),
+        (
+            "tag title lookup",
+            title_query,
+            lambda db: adhoc_scalars(db, title_query()),
+            lambda db: Tag.get_by_title(db, tag_title),
+        ),
+        (
+            "paid user post list, tags",
+            list_query,
+            adhoc_list,
+            lambda db: Post.list_visible(db, Role.PAID_USER, user_id, limit=20, tag_ids=tag_ids, load_type="lazy"),
+        ),
+        (
+            "free user tag list",
+            tag_list_query,
+            lambda db: adhoc_scalars(db, tag_list_query()),
+            lambda db: db.execute(Tag.visible_statement(Role.FREE_USER, True), Tag.visible_params(user_id, 0, 100)),
+        ),
+    ]
+
+
+async def timed(db, call, iterations: int) -> float:
+    """Mediana en microsegundos por llamada."""
+    for _ in range(min(50, iterations)):
+        await call(db)
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter_ns()
+        await call(db)
+        samples.append((time.perf_counter_ns() - started) / 1000)
+        db.expunge_all()
+    return statistics.median(samples)
+
+
+async def run(args) -> None:
+    engines = {
+        "prepared": create_async_engine(
+            args.database_url,
+            query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+            connect_args={"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE},
+        ),
+        "no prepare cache": create_async_engine(
+            args.database_url,
+            query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+            connect_args={"prepared_statement_cache_size": 0},
+        ),
+    }
+    try:
+        factory = async_sessionmaker(engines["prepared"], class_=AsyncSession, expire_on_commit=False)
+        async with factory() as db:
+            user = await User.get_by_email(db, email_for(args.prefix, 2))
+            if user is None:
+                raise SystemExit("Dataset not found; run `python -m benchmarks.dataset` first")
+            post_id = (await db.execute(select(Post.id).order_by(Post.id).limit(1))).scalar_one()
+            tags = (await db.execute(select(Tag).order_by(Tag.id).limit(3))).scalars().all()
+        cases = shapes(user.email, post_id, tags[0].title, [tag.id for tag in tags], user.id)
+
+        print(f"{'shape':<28} {'build':>9} " + " ".join(f"{label:>22}" for label in (
+            "adhoc", "cached", "adhoc (no prepare)", "cached (no prepare)")))
+        for name, build, adhoc, cached in cases:
+            started = time.perf_counter_ns()
+            for _ in range(args.iterations):
+                build()._generate_cache_key()
+            build_us = (time.perf_counter_ns() - started) / 1000 / args.iterations
+
+            results = []
+            for engine in engines.values():
+                factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+                async with factory() as db:
+                    results.append(await timed(db, adhoc, args.iterations))
+                    results.append(await timed(db, cached, args.iterations))
+            print(f"{name:<28} {build_us:7.1f}us " + " ".join(f"{value:20.1f}us" for value in results))
+    finally:
+        for engine in engines.values():
+            await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--prefix", default="bench", help="Prefijo del dataset de benchmarks.dataset")
+    parser.add_argument("--iterations", type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
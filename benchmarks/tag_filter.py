@@ -0,0 +1,136 @@
+"""
+Benchmark del filtro de posts por tags (GET /posts/?tags=...&match=any|all).
+
+Genera en el servidor (generate_series) un dataset con ~1M filas en posts_tags
+y mide la latencia de páginas de 100 posts con la consulta que ejecuta el
+router (`Post.list_visible`): filtros de visibilidad + semi-joins por tag +
+cursor por id.
+
+Uso:
+    python -m benchmarks.tag_filter --database-url postgresql+asyncpg://... --seed
+    python -m benchmarks.tag_filter --iterations 200 --explain
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.services import sessionmanager
+from app.models.post import Post
+from app.schemas.user import Role
+
+BENCH_EMAIL = "bench-tags@example.com"
+
+
+async def seed(db, posts: int, tags: int, tags_per_post: int) -> None:
+    await db.execute(text(
+        "INSERT INTO users (email, full_name, password_hash, role) "
+        "VALUES (:email, 'Bench', 'x', 'FREE_USER') ON CONFLICT (email) DO NOTHING"
+    ), {"email": BENCH_EMAIL})
+    owner_id = (await db.execute(text("SELECT id FROM users WHERE email = :email"), {"email": BENCH_EMAIL})).scalar_one()
+
+    await db.execute(text(
+        "INSERT INTO tags (title, owner_id) "
+        "SELECT 'bench-tag-' || g, :owner FROM generate_series(1, :n) g "
+        "ON CONFLICT (title) DO NOTHING"
+    ), {"owner": owner_id, "n": tags})
+    # 1 de cada 10 es de pago y 1 de cada 20 privado, para que la visibilidad filtre algo
+    await db.execute(text(
+        "INSERT INTO posts (title, owner_id, is_paid, is_visible) "
+        "SELECT 'bench-post-' || g, :owner, g % 10 = 0, g % 20 <> 0 FROM generate_series(1, :n) g "
+        "ON CONFLICT (title) DO NOTHING"
+    ), {"owner": owner_id, "n": posts})
+    await db.execute(text(
+        "WITH p AS (SELECT id, row_number() OVER (ORDER BY id) AS n FROM posts WHERE title LIKE 'bench-post-%'), "
+        "t AS (SELECT id, row_number() OVER (ORDER BY id) AS n FROM tags WHERE title LIKE 'bench-tag-%') "
+        "INSERT INTO posts_tags (post_id, tag_id) "
+        "SELECT p.id, t.id FROM p CROSS JOIN generate_series(0, :per_post - 1) k "
+        "JOIN t ON t.n = ((p.n + k * 37) % :tags) + 1 "
+        "ON CONFLICT DO NOTHING"
+    ), {"per_post": tags_per_post, "tags": tags})
+    await db.commit()
+    await db.execute(text("ANALYZE posts"))
+    await db.execute(text("ANALYZE posts_tags"))
+    await db.commit()
+
+
+def list_args(tag_ids, match, role, user_id, after_id=None, limit=100) -> dict:
+    return dict(
+        current_user_role=role, user_id=user_id, limit=limit, tag_ids=tag_ids, match=match,
+        after_id=after_id, load_type="lazy",
+    )
+
+
+async def run(args) -> None:
+    sessionmanager.init(args.database_url)
+    try:
+        async with sessionmanager.session() as db:
+            if args.seed:
+                started = time.perf_counter()
+                await seed(db, args.posts, args.tags, args.tags_per_post)
+                print(f"seed: {time.perf_counter() - started:.1f}s")
+
+            links = (await db.execute(text("SELECT count(*) FROM posts_tags"))).scalar_one()
+            tag_rows = (await db.execute(text(
+                "SELECT id FROM tags WHERE title LIKE 'bench-tag-%' ORDER BY id"
+            ))).scalars().all()
+            if not tag_rows:
+                raise SystemExit("No benchmark tags found, run with --seed first")
+            owner_id = (await db.execute(text("SELECT id FROM users WHERE email = :email"), {"email": BENCH_EMAIL})).scalar_one()
+            middle_id = (await db.execute(text("SELECT percentile_disc(0.5) WITHIN GROUP (ORDER BY id) FROM posts"))).scalar_one()
+            print(f"posts_tags rows: {links}")
+
+            # Tags 1 y 38 coinciden en los mismos posts por construcción del seed
+            scenarios = [
+                ("any 1 tag", [tag_rows[0]], "any", None),
+                ("any 3 tags", tag_rows[:3], "any", None),
+                ("all 2 tags", [tag_rows[0], tag_rows[37 % len(tag_rows)]], "all", None),
+                ("any 1 tag, cursor mid", [tag_rows[0]], "any", middle_id),
+                ("all 2 tags, cursor mid", [tag_rows[0], tag_rows[37 % len(tag_rows)]], "all", middle_id),
+            ]
+            roles = [(Role.FREE_USER, owner_id + 1), (Role.ADMIN, None)]
+
+            for role, user_id in roles:
+                for name, tag_ids, match, after_id in scenarios:
+                    kwargs = list_args(tag_ids, match, role, user_id, after_id)
+                    timings = []
+                    rows = 0
+                    for _ in range(args.iterations):
+                        started = time.perf_counter()
+                        rows = len(await Post.list_visible(db, **kwargs))
+                        timings.append((time.perf_counter() - started) * 1000)
+                        db.expunge_all()
+                    timings.sort()
+                    p95 = timings[int(len(timings) * 0.95) - 1]
+                    print(
+                        f"{role.value:<10} {name:<24} rows={rows:<4} "
+                        f"p50={statistics.median(timings):6.2f}ms p95={p95:6.2f}ms max={timings[-1]:6.2f}ms"
+                    )
+                    if args.explain:
+                        query, params = Post.list_visible_statement(**kwargs)
+                        compiled = query.params(params).compile(
+                            dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}
+                        )
+                        plan = await db.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}"))
+                        print("\n".join("    " + line for line in plan.scalars()))
+    finally:
+        await sessionmanager.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--seed", action="store_true", help="Genera el dataset antes de medir")
+    parser.add_argument("--posts", type=int, default=200_000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--tags-per-post", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--explain", action="store_true", help="Muestra EXPLAIN ANALYZE de cada escenario")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Compara JSON, MessagePack y CBOR sobre una página de posts: tiempo de
+codificación y decodificación y tamaño del payload (también comprimido).
+
+Todos los formatos parten del mismo contenido ya serializado por el esquema
+de respuesta (el paso que FastAPI hace una sola vez), así que solo se mide
+la codificación final. No necesita base de datos.
+
+Uso:
+    python -m benchmarks.wire_formats --page-size 100 --authors 5 --iterations 500
+"""
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.core.wire_formats import CBOR, DECODERS, ENCODERS, JSON, MSGPACK
+from app.schemas.post import PostPublicExtended
+from app.schemas.user import Role
+
+
+def json_encode(content) -> bytes:
+    # Igual que JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def build_page(page_size: int, authors: int, tags_per_post: int, content_size: int) -> list:
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    users = [
+        {
+            "id": i,
+            "email": f"author{i}@example.com",
+            "full_name": f"Author {i}",
+            "role": Role.FREE_USER,
+            "created_at": now - timedelta(days=i),
+            "updated_at": now,
+        }
+        for i in range(1, authors + 1)
+    ]
+    tags = [
+        {
+            "id": i,
+            "owner_id": 1,
+            "title": f"tag-{i}",
+            "description": f"Descripción del tag {i}",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(1, 51)
+    ]
+    posts = []
+    for i in range(1, page_size + 1):
+        user = rng.choice(users)
+        posts.append({
+            "id": i,
+            "owner_id": user["id"],
+            "title": f"Post {i}",
+            "description": "Descripción breve del post",
+            "content": "".join(rng.choice("abcdefghij klmnopqrstuvwxyz") for _ in range(content_size)),
+            "category": rng.choice(["news", "tech", "sports"]),
+            "is_visible": True,
+            "is_paid": rng.random() < 0.2,
+            "is_deleted": False,
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now,
+            "user": user,
+            "tags": rng.sample(tags, tags_per_post),
+        })
+    # Mismo contenido que recibe la respuesta: validado y volcado en modo JSON
+    return [PostPublicExtended.model_validate(p).model_dump(mode="json") for p in posts]
+
+
+def timed(fn, arg, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn(arg)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--authors", type=int, default=5)
+    parser.add_argument("--tags-per-post", type=int, default=3)
+    parser.add_argument("--content-size", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    content = build_page(args.page_size, args.authors, args.tags_per_post, args.content_size)
+    formats = {JSON: (json_encode, json.loads)}
+    for media_type in (MSGPACK, CBOR):
+        if media_type in ENCODERS:
+            formats[media_type] = (ENCODERS[media_type], DECODERS[media_type])
+        else:
+            print(f"{media_type}: no instalado (pip install .[wire-formats])")
+
+    for media_type, (encode, decode) in formats.items():
+        payload = encode(content)
+        assert decode(payload) == content
+        encode_timings = timed(encode, content, args.iterations)
+        decode_timings = timed(decode, payload, args.iterations)
+        print(
+            f"{media_type:<20} bytes={len(payload):<8} gzip_bytes={len(gzip.compress(payload)):<7} "
+            f"encode_p50={statistics.median(encode_timings):6.3f}ms "
+            f"encode_p95={encode_timings[int(len(encode_timings) * 0.95) - 1]:6.3f}ms "
+            f"decode_p50={statistics.median(decode_timings):6.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()